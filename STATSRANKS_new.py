@@ -15,9 +15,11 @@ from discord.ext import commands
 import json
 import os
 import asyncio
+import tempfile
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import math
+import stats_db
 
 # Map and Gametype Configuration
 MAP_GAMETYPES = {
@@ -51,11 +53,16 @@ def get_default_playlist_stats() -> dict:
 # File paths
 GAMESTATS_FILE = "gamestats.json"
 RANKSTATS_FILE = "rankstats.json"
+RANKSTATS_FLUSH_DELAY = 5.0  # Seconds to batch rankstats changes before writing
 XP_CONFIG_FILE = "xp_config.json"
+RANKS_FILE = "ranks.json"  # Written by populate_stats.py - the highest_rank every role sync applies
 
 # Rank icon URLs (for DMs)
 RANK_ICON_BASE = "https://r2-cdn.insignia.live/h2-rank"
 
+# Max concurrent role edits during a rank sync
+ROLE_SYNC_CONCURRENCY = 5
+
 def get_rank_icon_url(level: int) -> str:
     """Get the rank icon URL for a given level"""
     return f"{RANK_ICON_BASE}/{level}.png"
@@ -68,7 +75,7 @@ def load_json_file(filepath: str) -> dict:
     return {}
 
 def save_json_file(filepath: str, data: dict, skip_github: bool = False):
-    """Save data to JSON file and optionally push to GitHub"""
+    """Save data to JSON file and optionally queue a push to GitHub"""
     with open(filepath, 'w') as f:
         json.dump(data, f, indent=2)
     
@@ -149,117 +156,247 @@ def get_xp_config() -> dict:
         save_json_file(XP_CONFIG_FILE, config)
     return config
 
+# Parsed rank thresholds, reused until xp_config.json changes on disk
+_rank_thresholds_cache = {"mtime": None, "thresholds": None}
+
 def get_rank_thresholds() -> dict:
-    """Get rank thresholds from config"""
+    """Get rank thresholds from config (cached until xp_config.json is modified)"""
+    try:
+        mtime = os.path.getmtime(XP_CONFIG_FILE)
+    except OSError:
+        mtime = None
+
+    if mtime is not None and mtime == _rank_thresholds_cache["mtime"]:
+        return _rank_thresholds_cache["thresholds"]
+
     config = get_xp_config()
     thresholds = config.get("rank_thresholds", {})
     # Convert string keys to integers and lists to tuples
-    return {int(k): tuple(v) for k, v in thresholds.items()}
+    thresholds = {int(k): tuple(v) for k, v in thresholds.items()}
 
-def get_player_stats(user_id: int, skip_github: bool = False) -> dict:
-    """Get player stats from rankstats.json"""
-    stats = load_json_file(RANKSTATS_FILE)
-    user_key = str(user_id)
-
-    if user_key not in stats:
-        stats[user_key] = {
-            "xp": 0,
-            "wins": 0,
-            "losses": 0,
-            "series_wins": 0,
-            "series_losses": 0,
-            "total_games": 0,
-            "total_series": 0,
-            "mmr": 1500,  # Default MMR
-            "playlist_stats": get_default_playlist_stats(),
-            "highest_rank": 1
-        }
-        save_json_file(RANKSTATS_FILE, stats, skip_github=skip_github)
-    else:
-        # Ensure existing players have playlist_stats and highest_rank
-        if "playlist_stats" not in stats[user_key]:
-            stats[user_key]["playlist_stats"] = get_default_playlist_stats()
-            stats[user_key]["highest_rank"] = 1
-            save_json_file(RANKSTATS_FILE, stats, skip_github=skip_github)
+    if mtime is not None:
+        _rank_thresholds_cache["mtime"] = mtime
+        _rank_thresholds_cache["thresholds"] = thresholds
+    return thresholds
+
+def get_default_player_stats(mmr: int = 1500) -> dict:
+    """Get default stats for a new player"""
+    return {
+        "xp": 0,
+        "wins": 0,
+        "losses": 0,
+        "series_wins": 0,
+        "series_losses": 0,
+        "total_games": 0,
+        "total_series": 0,
+        "mmr": mmr,
+        "playlist_stats": get_default_playlist_stats(),
+        "highest_rank": 1
+    }
+
+
+class RankStatsStore:
+    """
+    In-memory copy of rankstats.json with write-behind persistence.
+
+    The file is parsed once and commands work on the dict directly. Changed
+    players are tracked as dirty and written out together, atomically, after
+    RANKSTATS_FLUSH_DELAY seconds (or on cog unload). The file is only re-read
+    when populate_stats.py signals new data via the refresh trigger.
+    """
+
+    def __init__(self, filepath: str = RANKSTATS_FILE):
+        self.filepath = filepath
+        self.data = {}
+        self.dirty = set()
+        self.version = 0  # Bumped on every load/change so derived caches can tell they're stale
+        self._loaded = False
+        self._push_github = False
+        self._flush_handle = None
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.reload()
+
+    def reload(self):
+        """Re-read rankstats (SQLite backend if enabled, else rankstats.json).
+        Local changes that haven't been flushed yet are kept."""
+        data = None
+        if stats_db.is_enabled():
+            try:
+                data = stats_db.load_rankstats()
+                if not data:
+                    # First run with the backend - seed it from rankstats.json
+                    data = load_json_file(self.filepath)
+                    if data:
+                        stats_db.save_rankstats(data)
+            except Exception as e:
+                print(f"Error reading rankstats from {stats_db.STATS_DB_PATH}: {e}")
+                data = None
+        if data is None:
+            data = load_json_file(self.filepath)
+        for user_key in self.dirty:
+            if user_key in self.data:
+                data[user_key] = self.data[user_key]
+        self.data = data
+        self._loaded = True
+        self.version += 1
+
+    def all(self) -> dict:
+        """All players (user_id string -> stats). Treat as read-only."""
+        self._ensure_loaded()
+        return self.data
+
+    def get(self, user_id) -> Optional[dict]:
+        """Get a player's stats, or None if they have none"""
+        self._ensure_loaded()
+        return self.data.get(str(user_id))
+
+    def get_or_create(self, user_id) -> dict:
+        """Get a player's stats for updating, creating/upgrading the entry if needed"""
+        self._ensure_loaded()
+        user_key = str(user_id)
+        if user_key not in self.data:
+            self.data[user_key] = get_default_player_stats()
+        elif "playlist_stats" not in self.data[user_key]:
+            self.data[user_key]["playlist_stats"] = get_default_playlist_stats()
+            self.data[user_key]["highest_rank"] = 1
+        return self.data[user_key]
+
+    def set(self, user_id, player_stats: dict, push_github: bool = True):
+        """Replace a player's stats"""
+        self._ensure_loaded()
+        self.data[str(user_id)] = player_stats
+        self.mark_dirty(user_id, push_github=push_github)
+
+    def replace_all(self, data: dict, push_github: bool = False):
+        """Replace every player's stats (e.g. after pulling from GitHub)"""
+        # Players missing from the new data stay dirty too so they get deleted
+        self.dirty = set(self.data.keys()) | set(data.keys())
+        self.data = data
+        self._loaded = True
+        self._push_github = self._push_github or push_github
+        self.version += 1
+        self._schedule_flush()
+
+    def mark_dirty(self, user_id, push_github: bool = True):
+        """Record that a player's stats changed and schedule a flush"""
+        self.dirty.add(str(user_id))
+        self._push_github = self._push_github or push_github
+        self.version += 1
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not inside the bot's event loop - write straight away
+            self.flush()
+            return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(RANKSTATS_FLUSH_DELAY, self.flush)
+
+    def flush(self):
+        """Write rankstats.json now if anything changed"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self.dirty:
+            return
+
+        if stats_db.is_enabled():
+            try:
+                stats_db.save_rankstats(
+                    {k: self.data[k] for k in self.dirty if k in self.data},
+                    removed=[k for k in self.dirty if k not in self.data])
+            except Exception as e:
+                # Leave the entries dirty so the next flush retries them
+                print(f"Error saving rankstats to {stats_db.STATS_DB_PATH}: {e}")
+                return
+
+        try:
+            # rankstats.json is still written - it's what the website and GitHub get
+            # Write to a temp file in the same directory, then swap it in
+            directory = os.path.dirname(os.path.abspath(self.filepath))
+            fd, tmp_path = tempfile.mkstemp(prefix=".rankstats.", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.data, f, indent=2)
+                os.replace(tmp_path, self.filepath)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            print(f"Error saving {self.filepath}: {e}")
+            return
 
-    return stats[user_key]
+        push_github = self._push_github
+        self.dirty.clear()
+        self._push_github = False
+
+        if push_github:
+            try:
+                import github_webhook
+                github_webhook.update_rankstats_on_github()
+            except Exception as e:
+                print(f"GitHub push failed for {self.filepath}: {e}")
+
+
+_rankstats_store = None
+
+def get_rankstats_store() -> RankStatsStore:
+    """Get the shared in-memory rankstats store"""
+    global _rankstats_store
+    if _rankstats_store is None:
+        _rankstats_store = RankStatsStore()
+    return _rankstats_store
+
+def get_player_stats(user_id: int, skip_github: bool = False) -> dict:
+    """Get player stats (defaults for players with no stats yet - nothing is written)"""
+    player_stats = get_rankstats_store().get(user_id)
+    if player_stats is None:
+        return get_default_player_stats()
+    if "playlist_stats" not in player_stats:
+        # Older entries - fill in the missing fields without touching the store
+        player_stats = dict(player_stats, playlist_stats=get_default_playlist_stats(), highest_rank=1)
+    return player_stats
 
 def get_existing_player_stats(user_id: int) -> dict:
     """Get player stats ONLY if they already exist (don't create new entry)"""
-    stats = load_json_file(RANKSTATS_FILE)
-    user_key = str(user_id)
-    
-    if user_key in stats:
-        return stats[user_key]
-    return None
+    return get_rankstats_store().get(user_id)
 
 def update_player_stats(user_id: int, stats_update: dict):
     """Update player stats - XP never goes below 0, recalculates highest_rank"""
-    stats = load_json_file(RANKSTATS_FILE)
-    user_key = str(user_id)
-
-    if user_key not in stats:
-        stats[user_key] = {
-            "xp": 0,
-            "wins": 0,
-            "losses": 0,
-            "series_wins": 0,
-            "series_losses": 0,
-            "total_games": 0,
-            "total_series": 0,
-            "mmr": 1500,
-            "playlist_stats": get_default_playlist_stats(),
-            "highest_rank": 1
-        }
-    elif "playlist_stats" not in stats[user_key]:
-        stats[user_key]["playlist_stats"] = get_default_playlist_stats()
-        stats[user_key]["highest_rank"] = 1
+    store = get_rankstats_store()
+    player_stats = store.get_or_create(user_id)
 
     for key, value in stats_update.items():
-        if key in stats[user_key]:
-            stats[user_key][key] += value
+        if key in player_stats:
+            player_stats[key] += value
         else:
-            stats[user_key][key] = value
+            player_stats[key] = value
 
     # Ensure XP never goes below 0
-    stats[user_key]["xp"] = max(0, stats[user_key]["xp"])
+    player_stats["xp"] = max(0, player_stats["xp"])
 
     # Recalculate highest rank after XP update
-    stats[user_key]["highest_rank"] = calculate_highest_rank(stats[user_key])
+    player_stats["highest_rank"] = calculate_highest_rank(player_stats)
 
-    save_json_file(RANKSTATS_FILE, stats)
+    store.mark_dirty(user_id)
 
 
 def update_playlist_stats(user_id: int, playlist_type: str, stats_update: dict):
     """Update player stats for a specific playlist - XP never goes below 0"""
-    stats = load_json_file(RANKSTATS_FILE)
-    user_key = str(user_id)
-
-    # Initialize player if doesn't exist
-    if user_key not in stats:
-        stats[user_key] = {
-            "xp": 0,
-            "wins": 0,
-            "losses": 0,
-            "series_wins": 0,
-            "series_losses": 0,
-            "total_games": 0,
-            "total_series": 0,
-            "mmr": 1500,
-            "playlist_stats": get_default_playlist_stats(),
-            "highest_rank": 1
-        }
-    elif "playlist_stats" not in stats[user_key]:
-        stats[user_key]["playlist_stats"] = get_default_playlist_stats()
-        stats[user_key]["highest_rank"] = 1
+    store = get_rankstats_store()
+    player = store.get_or_create(user_id)
 
     # Ensure playlist exists in player's playlist_stats
-    if playlist_type not in stats[user_key]["playlist_stats"]:
-        stats[user_key]["playlist_stats"][playlist_type] = {
+    if playlist_type not in player["playlist_stats"]:
+        player["playlist_stats"][playlist_type] = {
             "xp": 0, "wins": 0, "losses": 0, "series_wins": 0, "series_losses": 0
         }
 
-    playlist_stats = stats[user_key]["playlist_stats"][playlist_type]
+    playlist_stats = player["playlist_stats"][playlist_type]
 
     # Update playlist-specific stats
     for key, value in stats_update.items():
@@ -274,23 +411,23 @@ def update_playlist_stats(user_id: int, playlist_type: str, stats_update: dict):
     # Also update global stats for backwards compatibility
     for key in ["xp", "wins", "losses", "series_wins", "series_losses"]:
         if key in stats_update:
-            if key in stats[user_key]:
-                stats[user_key][key] += stats_update[key]
+            if key in player:
+                player[key] += stats_update[key]
             else:
-                stats[user_key][key] = stats_update[key]
-    stats[user_key]["xp"] = max(0, stats[user_key]["xp"])
+                player[key] = stats_update[key]
+    player["xp"] = max(0, player["xp"])
 
     # Increment global counters
     if "wins" in stats_update or "losses" in stats_update:
-        stats[user_key]["total_games"] = stats[user_key].get("total_games", 0) + stats_update.get("wins", 0) + stats_update.get("losses", 0)
+        player["total_games"] = player.get("total_games", 0) + stats_update.get("wins", 0) + stats_update.get("losses", 0)
     if "series_wins" in stats_update or "series_losses" in stats_update:
-        stats[user_key]["total_series"] = stats[user_key].get("total_series", 0) + stats_update.get("series_wins", 0) + stats_update.get("series_losses", 0)
+        player["total_series"] = player.get("total_series", 0) + stats_update.get("series_wins", 0) + stats_update.get("series_losses", 0)
 
     # Recalculate highest rank
-    stats[user_key]["highest_rank"] = calculate_highest_rank(stats[user_key])
+    player["highest_rank"] = calculate_highest_rank(player)
 
-    save_json_file(RANKSTATS_FILE, stats)
-    return stats[user_key]
+    store.mark_dirty(user_id)
+    return player
 
 
 def calculate_playlist_rank(xp: int) -> int:
@@ -401,69 +538,189 @@ def get_rank_role_name(level: int) -> str:
     """Get the role name for a rank level"""
     return f"Level {level}"
 
-async def update_player_rank_role(guild: discord.Guild, user_id: int, new_level: int, send_dm: bool = True):
-    """Update player's rank role with DM notification on rank change"""
-    member = guild.get_member(user_id)
-    if not member:
-        return
+# Per-guild index of the "Level N" roles, rebuilt only when roles change
+# guild_id -> {"by_level": {level: Role}, "by_id": {role_id: level}}
+_level_role_index = {}
+
+def get_level_role_index(guild: discord.Guild) -> dict:
+    """Get the cached level <-> role index for a guild, building it if needed"""
+    index = _level_role_index.get(guild.id)
+    if index is None:
+        index = {"by_level": {}, "by_id": {}}
+        for role in guild.roles:
+            if role.name.startswith("Level "):
+                try:
+                    level = int(role.name.replace("Level ", ""))
+                except ValueError:
+                    continue
+                index["by_level"][level] = role
+                index["by_id"][role.id] = level
+        _level_role_index[guild.id] = index
+    return index
 
-    # Check current level before making changes
-    old_level = None
-    for role in member.roles:
-        if role.name.startswith("Level "):
-            try:
-                old_level = int(role.name.replace("Level ", ""))
-                break
-            except ValueError:
-                pass
+def invalidate_level_role_index(guild_id: int):
+    """Drop a guild's level role index (called on role create/delete/update)"""
+    _level_role_index.pop(guild_id, None)
 
-    # Skip if player already has the correct rank - no changes needed
-    if old_level == new_level:
-        return
 
-    # Remove all level roles (1-50)
-    roles_to_remove = []
-    for role in member.roles:
-        if role.name.startswith("Level "):
-            roles_to_remove.append(role)
+class RoleSyncEngine:
+    """
+    Syncs "Level N" rank roles for many members at once.
+
+    The desired level for every member is diffed against their current roles
+    in memory first, so members that are already correct cost nothing. Only
+    the members that need a change are edited, each with a single
+    member.edit(roles=...) call, through a pool of ROLE_SYNC_CONCURRENCY
+    workers. discord.py already queues requests per rate-limit bucket; if a
+    429 still comes back we wait out retry_after and try again.
+    """
 
-    if roles_to_remove:
-        await member.remove_roles(*roles_to_remove, reason="Rank update")
+    def __init__(self, guild: discord.Guild, concurrency: int = None, max_retries: int = 3):
+        self.guild = guild
+        self.concurrency = concurrency or ROLE_SYNC_CONCURRENCY
+        self.max_retries = max_retries
+
+    def plan(self, desired: Dict[int, int], members: Dict[int, discord.Member] = None) -> dict:
+        """
+        Work out which members need their level role changed.
+
+        Args:
+            desired: user_id -> level they should have
+            members: user_id -> member (defaults to the guild's member cache)
+
+        Returns:
+            dict with "changes" [(member, old_level, new_level, new_roles)],
+            "unchanged", "not_found" and "errors" counts
+        """
+        index = get_level_role_index(self.guild)
+        level_roles = index["by_level"]
+        level_role_ids = index["by_id"]
+        result = {"changes": [], "unchanged": 0, "not_found": 0, "errors": 0}
+        missing_levels = set()
+
+        for user_id, new_level in desired.items():
+            member = members.get(user_id) if members is not None else self.guild.get_member(user_id)
+            if not member:
+                result["not_found"] += 1
+                continue
+
+            target = level_roles.get(new_level)
+            if target is None:
+                missing_levels.add(new_level)
+                result["errors"] += 1
+                continue
+
+            member_roles = member.roles
+            current_level_ids = level_role_ids.keys() & {role.id for role in member_roles}
+            if current_level_ids == {target.id}:
+                result["unchanged"] += 1
+                continue
+
+            # Keep every non-level role (minus @everyone), swap in the target level
+            new_roles = [role for role in member_roles
+                         if role.id not in level_role_ids and not role.is_default()]
+            new_roles.append(target)
+            old_level = max((level_role_ids[role_id] for role_id in current_level_ids), default=None)
+            result["changes"].append((member, old_level, new_level, new_roles))
+
+        for level in sorted(missing_levels):
+            print(f"⚠️ Role '{get_rank_role_name(level)}' not found in guild")
+
+        return result
+
+    async def _apply_change(self, semaphore: asyncio.Semaphore, change) -> bool:
+        member, old_level, new_level, new_roles = change
+        async with semaphore:
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    await member.edit(roles=new_roles, reason=f"Rank update: Level {old_level} -> Level {new_level}")
+                    return True
+                except discord.HTTPException as e:
+                    if e.status == 429 and attempt < self.max_retries:
+                        retry_after = getattr(e, "retry_after", None) or 1.0
+                        await asyncio.sleep(retry_after)
+                        continue
+                    print(f"❌ Error updating rank role for {member.display_name}: {e}")
+                    return False
+                except Exception as e:
+                    print(f"❌ Error updating rank role for {member.display_name}: {e}")
+                    return False
+        return False
 
-    # Add new level role
-    new_role_name = get_rank_role_name(new_level)
-    new_role = discord.utils.get(guild.roles, name=new_role_name)
-    
-    if new_role:
-        await member.add_roles(new_role, reason=f"Reached {new_role_name}")
+    async def sync(self, desired: Dict[int, int], members: Dict[int, discord.Member] = None) -> dict:
+        """
+        Diff and apply level roles.
+
+        Returns:
+            dict with "updated" [(member, old_level, new_level)], "unchanged",
+            "not_found" and "errors" counts
+        """
+        result = self.plan(desired, members)
+        changes = result.pop("changes")
+        result["updated"] = []
+
+        if changes:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            outcomes = await asyncio.gather(*(self._apply_change(semaphore, change) for change in changes))
+            for change, ok in zip(changes, outcomes):
+                member, old_level, new_level, _ = change
+                if ok:
+                    result["updated"].append((member, old_level, new_level))
+                else:
+                    result["errors"] += 1
+
+        return result
+
+
+async def send_rank_change_dm(member: discord.Member, old_level: Optional[int], new_level: int):
+    """DM a player that their rank went up or down"""
+    if old_level is None or old_level == new_level:
+        return
+    try:
+        embed = discord.Embed(color=discord.Color.blue())
+
+        # Add header image
+        embed.set_image(url="https://raw.githubusercontent.com/I2aMpAnT/H2CarnageReport.com/main/MessagefromCarnageReportHEADER.png")
+
+        if new_level > old_level:
+            # Level up
+            embed.set_thumbnail(url=get_rank_icon_url(new_level))
+            embed.description = f"Congratulations, you have ranked up to **Level {new_level}**!"
+            embed.color = discord.Color.green()
+        elif new_level < old_level:
+            # Derank
+            embed.set_thumbnail(url=get_rank_icon_url(new_level))
+            embed.description = f"Sorry, you have deranked to **Level {new_level}**."
+            embed.color = discord.Color.red()
+
+        await member.send(embed=embed)
+        print(f"Sent rank change DM to {member.name}: {old_level} -> {new_level}")
+    except discord.Forbidden:
+        print(f"Could not DM {member.name} - DMs disabled")
+    except Exception as e:
+        print(f"Error sending DM to {member.name}: {e}")
+
+async def get_guild_member_map(guild: discord.Guild) -> Dict[int, discord.Member]:
+    """Warm the member cache with one chunked request and return user_id -> member"""
+    if not guild.chunked:
+        try:
+            await guild.chunk(cache=True)
+        except Exception as e:
+            print(f"⚠️ Could not chunk members for {guild.name}: {e}")
+    return {member.id: member for member in guild.members}
+
+async def sync_rank_roles(guild: discord.Guild, desired: Dict[int, int], send_dm: bool = True,
+                          members: Dict[int, discord.Member] = None) -> dict:
+    """Sync level roles for many players in one pass and DM the ones that changed"""
+    result = await RoleSyncEngine(guild).sync(desired, members)
+    if send_dm:
+        for member, old_level, new_level in result["updated"]:
+            await send_rank_change_dm(member, old_level, new_level)
+    return result
 
-        # Send DM notification if rank changed and send_dm is enabled
-        if send_dm and old_level is not None and old_level != new_level:
-            try:
-                embed = discord.Embed(color=discord.Color.blue())
-
-                # Add header image
-                embed.set_image(url="https://raw.githubusercontent.com/I2aMpAnT/H2CarnageReport.com/main/MessagefromCarnageReportHEADER.png")
-
-                if new_level > old_level:
-                    # Level up
-                    embed.set_thumbnail(url=get_rank_icon_url(new_level))
-                    embed.description = f"Congratulations, you have ranked up to **Level {new_level}**!"
-                    embed.color = discord.Color.green()
-                elif new_level < old_level:
-                    # Derank
-                    embed.set_thumbnail(url=get_rank_icon_url(new_level))
-                    embed.description = f"Sorry, you have deranked to **Level {new_level}**."
-                    embed.color = discord.Color.red()
-
-                await member.send(embed=embed)
-                print(f"Sent rank change DM to {member.name}: {old_level} -> {new_level}")
-            except discord.Forbidden:
-                print(f"Could not DM {member.name} - DMs disabled")
-            except Exception as e:
-                print(f"Error sending DM to {member.name}: {e}")
-    else:
-        print(f"⚠️ Role '{new_role_name}' not found in guild")
+async def update_player_rank_role(guild: discord.Guild, user_id: int, new_level: int, send_dm: bool = True):
+    """Update player's rank role with DM notification on rank change"""
+    await sync_rank_roles(guild, {user_id: new_level}, send_dm=send_dm)
 
 def add_game_stats(match_number: int, game_number: int, map_name: str, gametype: str) -> bool:
     """Add game stats to gamestats.json with timestamp"""
@@ -530,97 +787,240 @@ async def record_manual_match(red_team: List[int], blue_team: List[int], games:
     for i, game in enumerate(games, 1):
         record_game_stat(game["map"], game["gametype"], game["winner"])
 
-    # Refresh ranks for all players from rankstats.json (populated by populate_stats.py)
+    # Refresh ranks for all players from ranks.json (populated by populate_stats.py)
     all_players = red_team + blue_team
     await refresh_all_ranks(guild, all_players, send_dm=True)
 
     match_label = f"#{match_number}" if match_number else ""
     print(f"✅ Manual match {match_label} logged: {series_winner} wins ({red_game_wins}-{blue_game_wins}) - stats via populate_stats.py")
 
-async def refresh_all_ranks(guild: discord.Guild, player_ids: List[int], send_dm: bool = True):
-    """Refresh rank roles for all players in a match - always recalculates highest_rank"""
-    from searchmatchmaking import queue_state
-
-    # Load stats once
-    stats = load_json_file(RANKSTATS_FILE)
-    updated = False
+def load_pipeline_highest_ranks() -> Dict[int, int]:
+    """highest_rank per Discord ID from populate_stats.py's ranks.json - the same
+    values its refresh trigger carries, so full and incremental syncs agree"""
+    try:
+        ranks = load_json_file(RANKS_FILE)
+    except (OSError, ValueError) as e:
+        print(f"Error reading {RANKS_FILE}: {e}")
+        return {}
+    return {int(user_id): int(data.get("highest_rank", 1))
+            for user_id, data in ranks.items() if user_id.isdigit()}
+
+def _desired_pipeline_ranks(player_ids: List[int], skip=()) -> Dict[int, int]:
+    """Target level for each player in ranks.json, mirrored into the store's highest_rank"""
+    highest_ranks = load_pipeline_highest_ranks()
+    store = get_rankstats_store()
+    desired = {}
 
     for user_id in player_ids:
-        if user_id in queue_state.guests:
-            continue  # Skip guests
-
-        user_key = str(user_id)
-        player_stats = stats.get(user_key)
+        if user_id in skip or user_id not in highest_ranks:
+            continue  # Guest, or no ranks yet
+        highest = highest_ranks[user_id]
 
-        if not player_stats:
-            continue  # Skip if no stats
+        # Keep the stored highest_rank (shown by /playerstats) in step
+        player_stats = store.get(user_id)
+        if player_stats and player_stats.get("highest_rank") != highest:
+            player_stats["highest_rank"] = highest
+            store.mark_dirty(user_id, push_github=False)
 
-        # Always recalculate highest rank to ensure accuracy
-        highest = calculate_highest_rank(player_stats)
+        desired[user_id] = highest
+    return desired
 
-        # Update stored highest_rank
-        if stats[user_key].get("highest_rank") != highest:
-            stats[user_key]["highest_rank"] = highest
-            updated = True
-
-        await update_player_rank_role(guild, user_id, highest, send_dm=send_dm)
+async def refresh_all_ranks(guild: discord.Guild, player_ids: List[int], send_dm: bool = True):
+    """Refresh rank roles for all players in a match from ranks.json"""
+    from searchmatchmaking import queue_state
 
-    # Save once at the end if anything changed
-    if updated:
-        save_json_file(RANKSTATS_FILE, stats, skip_github=True)
+    desired = _desired_pipeline_ranks(player_ids, skip=queue_state.guests)
+    await sync_rank_roles(guild, desired, send_dm=send_dm)
 
 
 async def refresh_playlist_ranks(guild: discord.Guild, player_ids: List[int], playlist_type: str, send_dm: bool = True):
-    """Refresh rank roles for players after a playlist match - recalculates and saves highest_rank"""
-    # Load stats once
-    stats = load_json_file(RANKSTATS_FILE)
-    updated = False
+    """Refresh rank roles for players after a playlist match from ranks.json"""
+    desired = _desired_pipeline_ranks(player_ids)
+    await sync_rank_roles(guild, desired, send_dm=send_dm)
+
+# Leaderboard orderings, built once per rankstats store version and xp_config.json
+# (rank thresholds) modification time
+# {"version": (store version, xp_config mtime), "orderings": {(sort_by, playlist): [(user_id, stats), ...]}}
+_leaderboard_cache = {"version": None, "orderings": {}}
+
+LEADERBOARD_SORT_KEYS = {
+    "rank": lambda p: (p["rank"], p["xp"]),
+    "wins": lambda p: p["wins"],
+    "series_wins": lambda p: p["series_wins"],
+    "mmr": lambda p: p.get("mmr", 1500),
+}
 
-    for user_id in player_ids:
-        user_key = str(user_id)
-        player_stats = stats.get(user_key)
+def _build_leaderboard_entries(stats: dict, playlist: Optional[str]) -> List[Tuple[str, dict]]:
+    """Build the display entries for every player (overall or for one playlist)"""
+    players = []
+    for user_id, player_stats in stats.items():
+        if playlist is None:
+            # Copy so the display rank doesn't end up in the store
+            entry = dict(player_stats, rank=calculate_rank(player_stats["xp"]))
+        else:
+            pstats = player_stats.get("playlist_stats", {}).get(playlist)
+            if not pstats or (pstats.get("xp", 0) <= 0 and pstats.get("wins", 0) + pstats.get("losses", 0) == 0):
+                continue  # Hasn't played this playlist
+            wins = pstats.get("wins", 0)
+            losses = pstats.get("losses", 0)
+            entry = {
+                "xp": pstats.get("xp", 0),
+                "wins": wins,
+                "losses": losses,
+                "series_wins": pstats.get("series_wins", 0),
+                "series_losses": pstats.get("series_losses", 0),
+                "total_games": wins + losses,
+                "mmr": player_stats.get("mmr", 1500),
+                "rank": calculate_playlist_rank(pstats.get("xp", 0)),
+            }
+        players.append((user_id, entry))
+    return players
 
-        if not player_stats:
-            continue  # Skip if no stats
+def get_all_players_sorted(sort_by: str = "rank", playlist: Optional[str] = None) -> List[Tuple[str, dict]]:
+    """Get all players sorted by specified criteria (optionally for one playlist).
+    Orderings are cached until rankstats or xp_config.json changes - treat the result as read-only."""
+    store = get_rankstats_store()
+    stats = store.all()
+
+    try:
+        xp_config_mtime = os.path.getmtime(XP_CONFIG_FILE)
+    except OSError:
+        xp_config_mtime = None
+    version = (store.version, xp_config_mtime)
+    if _leaderboard_cache["version"] != version:
+        _leaderboard_cache["version"] = version
+        _leaderboard_cache["orderings"] = {}
+
+    cache_key = (sort_by, playlist)
+    players = _leaderboard_cache["orderings"].get(cache_key)
+    if players is None:
+        players = _build_leaderboard_entries(stats, playlist)
+        sort_key = LEADERBOARD_SORT_KEYS.get(sort_by)
+        if sort_key:
+            players.sort(key=lambda x: sort_key(x[1]), reverse=True)
+        _leaderboard_cache["orderings"][cache_key] = players
 
-        # Recalculate highest rank
-        highest = calculate_highest_rank(player_stats)
+    return players
 
-        # Update stored highest_rank
-        if stats[user_key].get("highest_rank") != highest:
-            stats[user_key]["highest_rank"] = highest
-            updated = True
+async def build_leaderboard_embed(bot, sort_by: str, page: int, playlist: Optional[str] = None) -> Tuple[Optional[discord.Embed], int, int]:
+    """
+    Build one leaderboard page from the cached ordering.
 
-        await update_player_rank_role(guild, user_id, highest, send_dm=send_dm)
+    Returns:
+        (embed, page, total_pages) - embed is None if there are no players
+    """
+    players = get_all_players_sorted(sort_by, playlist)
+    if not players:
+        return None, 1, 0
+
+    # Pagination
+    per_page = 10
+    total_pages = math.ceil(len(players) / per_page)
+    page = max(1, min(page, total_pages))
+
+    start_idx = (page - 1) * per_page
+    end_idx = start_idx + per_page
+    page_players = players[start_idx:end_idx]
+
+    description = f"Sorted by: **{sort_by.replace('_', ' ').title()}**"
+    if playlist:
+        description += f" • Playlist: **{playlist.replace('_', ' ').title()}**"
+
+    # Create embed
+    embed = discord.Embed(
+        title="🏆 Halo 2 Matchmaking Leaderboard",
+        description=description,
+        color=discord.Color.from_rgb(0, 112, 192)
+    )
 
-    # Save once at the end if anything changed
-    if updated:
-        save_json_file(RANKSTATS_FILE, stats, skip_github=True)
+    # Add players
+    leaderboard_text = ""
+    for i, (user_id, stats) in enumerate(page_players, start=start_idx + 1):
+        user = bot.get_user(int(user_id))
+        if user is None:
+            try:
+                user = await bot.fetch_user(int(user_id))
+            except:
+                user = None
+        name = user.name if user else f"User {user_id}"
+
+        rank = stats["rank"]
+        xp = stats["xp"]
+        wins = stats["wins"]
+        losses = stats["losses"]
+        mmr = stats.get("mmr", 1500)
+        win_rate = (wins / stats["total_games"] * 100) if stats["total_games"] > 0 else 0
+
+        if sort_by == "rank":
+            leaderboard_text += f"`{i}.` **{name}** - Level {rank} ({xp} XP)\n"
+        elif sort_by == "wins":
+            leaderboard_text += f"`{i}.` **{name}** - {wins}W / {losses}L ({win_rate:.1f}%)\n"
+        elif sort_by == "series_wins":
+            leaderboard_text += f"`{i}.` **{name}** - {stats['series_wins']}W / {stats['series_losses']}L (Series)\n"
+        elif sort_by == "mmr":
+            leaderboard_text += f"`{i}.` **{name}** - MMR: {mmr}\n"
+
+    embed.description += f"\n\n{leaderboard_text}"
+    embed.set_footer(text=f"Page {page}/{total_pages} • {len(players)} total players")
+    return embed, page, total_pages
+
+def parse_refresh_trigger(content: str) -> Tuple[Optional[int], Optional[Dict[int, Tuple[int, int]]]]:
+    """
+    Parse a populate_stats refresh trigger.
 
-def get_all_players_sorted(sort_by: str = "rank") -> List[Tuple[str, dict]]:
-    """Get all players sorted by specified criteria"""
-    stats = load_json_file(RANKSTATS_FILE)
-    
-    players = []
-    for user_id, player_stats in stats.items():
-        player_stats["rank"] = calculate_rank(player_stats["xp"])
-        players.append((user_id, player_stats))
-    
-    # Sort based on criteria
-    if sort_by == "rank":
-        players.sort(key=lambda x: (x[1]["rank"], x[1]["xp"]), reverse=True)
-    elif sort_by == "wins":
-        players.sort(key=lambda x: x[1]["wins"], reverse=True)
-    elif sort_by == "series_wins":
-        players.sort(key=lambda x: x[1]["series_wins"], reverse=True)
-    elif sort_by == "mmr":
-        players.sort(key=lambda x: x[1].get("mmr", 1500), reverse=True)
-    
-    return players
+        !refresh_ranks_trigger seq=12 changes=<discord_id>:<old>:<new>,...
+        !refresh_ranks_trigger seq=12 full
+        !refresh_ranks_trigger                      (legacy - full sync)
+
+    Returns:
+        (sequence, changes) - changes is user_id -> (old_level, new_level),
+        or None when a full sync is wanted
+    """
+    sequence = None
+    changes = None
+    for part in content.split()[1:]:
+        if part.startswith("seq="):
+            try:
+                sequence = int(part[4:])
+            except ValueError:
+                pass
+        elif part.startswith("changes="):
+            changes = {}
+            for item in filter(None, part[8:].split(",")):
+                try:
+                    user_id, old_level, new_level = item.split(":")
+                    changes[int(user_id)] = (int(old_level), int(new_level))
+                except ValueError:
+                    return sequence, None  # Malformed - play it safe
+    return sequence, changes
 
 class StatsCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Sequence of the last populate_stats run applied (None until the first
+        # trigger after startup, which always does a full sync)
+        self.last_trigger_sequence = None
+
+    async def cog_unload(self):
+        """Write pending stats and push any queued GitHub updates before the cog goes away"""
+        get_rankstats_store().flush()
+        try:
+            import github_webhook
+            await github_webhook.flush_pending_pushes()
+        except Exception as e:
+            print(f"Error flushing GitHub push queue: {e}")
+
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role):
+        invalidate_level_role_index(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        invalidate_level_role_index(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        invalidate_level_role_index(after.guild.id)
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -634,15 +1034,34 @@ class StatsCommands(commands.Cog):
             return
 
         # Check for trigger message
-        if message.content == "!refresh_ranks_trigger":
+        if message.content.startswith("!refresh_ranks_trigger"):
             print("Received rank refresh trigger from populate_stats.py")
             try:
-                # Get all players from rankstats
-                stats = load_json_file(RANKSTATS_FILE)
-                player_ids = [int(uid) for uid in stats.keys() if uid.isdigit()]
-
-                # Refresh all ranks
-                await refresh_all_ranks(message.guild, player_ids, send_dm=False)
+                # New data from populate_stats - re-read rankstats
+                store = get_rankstats_store()
+                store.reload()
+
+                sequence, changes = parse_refresh_trigger(message.content)
+                if (changes is not None and sequence is not None
+                        and self.last_trigger_sequence is not None
+                        and sequence == self.last_trigger_sequence + 1):
+                    # Only the players whose highest rank changed this run
+                    desired = {user_id: new_level for user_id, (old_level, new_level) in changes.items()}
+                    result = await sync_rank_roles(message.guild, desired, send_dm=False)
+                    print(f"Applied {len(changes)} rank changes from run {sequence} "
+                          f"({len(result['updated'])} roles updated)")
+                else:
+                    # Legacy trigger, full rebuild, or we missed a run - sync everyone
+                    if sequence is not None and self.last_trigger_sequence is not None and changes is not None:
+                        print(f"Trigger sequence gap ({self.last_trigger_sequence} -> {sequence}), doing a full refresh")
+                    # Same ranks.json values the changes= path applies
+                    player_ids = list(load_pipeline_highest_ranks())
+
+                    # Refresh all ranks
+                    await refresh_all_ranks(message.guild, player_ids, send_dm=False)
+
+                if sequence is not None:
+                    self.last_trigger_sequence = sequence
 
                 # Delete the trigger message
                 await message.delete()
@@ -854,9 +1273,7 @@ class StatsCommands(commands.Cog):
         await update_player_rank_role(interaction.guild, interaction.user.id, highest, send_dm=True)
 
         # Update local stats to match GitHub
-        local_stats = load_json_file(RANKSTATS_FILE)
-        local_stats[user_id_str] = player_stats
-        save_json_file(RANKSTATS_FILE, local_stats, skip_github=True)
+        get_rankstats_store().set(user_id_str, player_stats, push_github=False)
 
         # Get per-playlist ranks for display
         playlist_stats = player_stats.get("playlist_stats", {})
@@ -897,63 +1314,47 @@ class StatsCommands(commands.Cog):
             )
             return
 
-        updated_count = 0
-        skipped_count = 0
         error_count = 0
         not_found_count = 0
+        members = {}
+        desired = {}
+
+        # One chunked member request up front instead of fetch_member per player
+        guild_members = await get_guild_member_map(guild)
 
         for user_id_str, player_stats in stats.items():
             try:
                 user_id = int(user_id_str)
-                member = guild.get_member(user_id)
-
-                # Try to fetch if not in cache
-                if not member:
-                    try:
-                        member = await guild.fetch_member(user_id)
-                    except (discord.NotFound, discord.HTTPException):
-                        not_found_count += 1
-                        continue
+                member = guild_members.get(user_id)
 
+                # Not in the member list = not in the server (no per-user fetch)
                 if not member:
                     not_found_count += 1
                     continue
 
-                # Get current Discord rank
-                current_rank = None
-                for role in member.roles:
-                    if role.name.startswith("Level "):
-                        try:
-                            current_rank = int(role.name.replace("Level ", ""))
-                            break
-                        except:
-                            pass
-
                 # Use highest_rank from GitHub, fall back to calculating
                 highest = player_stats.get("highest_rank")
                 if highest is None or highest < 1:
                     highest = calculate_highest_rank(player_stats)
                     print(f"  [DEBUG] {member.display_name}: highest_rank missing, calculated {highest} from stats: xp={player_stats.get('xp')}, wins={player_stats.get('wins')}")
 
-                # Skip if already correct
-                if current_rank == highest:
-                    skipped_count += 1
-                    continue
-
-                print(f"  [SYNC] {member.display_name}: Discord={current_rank}, GitHub highest_rank={highest}")
-                await update_player_rank_role(guild, user_id, highest, send_dm=True)
-                updated_count += 1
-                print(f"  Updated {member.display_name}: Level {current_rank} → Level {highest}")
-
-                # Small delay to avoid rate limits
-                await asyncio.sleep(0.3)
+                members[user_id] = member
+                desired[user_id] = highest
 
             except Exception as e:
                 print(f"❌ Error updating user {user_id_str}: {e}")
                 error_count += 1
 
+        # Diff against current roles and apply only the changes
+        result = await sync_rank_roles(guild, desired, send_dm=True, members=members)
+        for member, current_rank, highest in result["updated"]:
+            print(f"  [SYNC] Updated {member.display_name}: Level {current_rank} → Level {highest}")
+        updated_count = len(result["updated"])
+        skipped_count = result["unchanged"]
+        error_count += result["errors"]
+
         # Update local stats to match GitHub
-        save_json_file(RANKSTATS_FILE, stats, skip_github=True)
+        get_rankstats_store().replace_all(stats)
 
         # Summary
         await interaction.followup.send(
@@ -989,63 +1390,47 @@ class StatsCommands(commands.Cog):
             )
             return
 
-        updated_count = 0
-        skipped_count = 0
         error_count = 0
         not_found_count = 0
+        members = {}
+        desired = {}
+
+        # One chunked member request up front instead of fetch_member per player
+        guild_members = await get_guild_member_map(guild)
 
         for user_id_str, player_stats in stats.items():
             try:
                 user_id = int(user_id_str)
-                member = guild.get_member(user_id)
-
-                # Try to fetch if not in cache
-                if not member:
-                    try:
-                        member = await guild.fetch_member(user_id)
-                    except (discord.NotFound, discord.HTTPException):
-                        not_found_count += 1
-                        continue
+                member = guild_members.get(user_id)
 
+                # Not in the member list = not in the server (no per-user fetch)
                 if not member:
                     not_found_count += 1
                     continue
 
-                # Get current Discord rank
-                current_rank = None
-                for role in member.roles:
-                    if role.name.startswith("Level "):
-                        try:
-                            current_rank = int(role.name.replace("Level ", ""))
-                            break
-                        except:
-                            pass
-
                 # Use highest_rank from GitHub, fall back to calculating
                 highest = player_stats.get("highest_rank")
                 if highest is None or highest < 1:
                     highest = calculate_highest_rank(player_stats)
                     print(f"  [DEBUG] {member.display_name}: highest_rank missing, calculated {highest} from stats: xp={player_stats.get('xp')}, wins={player_stats.get('wins')}")
 
-                # Skip if already correct
-                if current_rank == highest:
-                    skipped_count += 1
-                    continue
-
-                print(f"  [SILENT SYNC] {member.display_name}: Discord={current_rank}, GitHub highest_rank={highest}")
-                await update_player_rank_role(guild, user_id, highest, send_dm=False)
-                updated_count += 1
-                print(f"  [SILENT] Updated {member.display_name}: Level {current_rank} → Level {highest}")
-
-                # Small delay to avoid rate limits
-                await asyncio.sleep(0.3)
+                members[user_id] = member
+                desired[user_id] = highest
 
             except Exception as e:
                 print(f"❌ Error updating user {user_id_str}: {e}")
                 error_count += 1
 
+        # Diff against current roles and apply only the changes
+        result = await sync_rank_roles(guild, desired, send_dm=False, members=members)
+        for member, current_rank, highest in result["updated"]:
+            print(f"  [SILENT] Updated {member.display_name}: Level {current_rank} → Level {highest}")
+        updated_count = len(result["updated"])
+        skipped_count = result["unchanged"]
+        error_count += result["errors"]
+
         # Update local stats to match GitHub
-        save_json_file(RANKSTATS_FILE, stats, skip_github=True)
+        get_rankstats_store().replace_all(stats)
 
         # Summary
         await interaction.followup.send(
@@ -1074,27 +1459,10 @@ class StatsCommands(commands.Cog):
             )
             return
         
-        # Get player stats
-        stats = load_json_file(RANKSTATS_FILE)
-        user_key = str(player.id)
-        
-        # Initialize if doesn't exist
-        if user_key not in stats:
-            stats[user_key] = {
-                "xp": 0,
-                "wins": 0,
-                "losses": 0,
-                "series_wins": 0,
-                "series_losses": 0,
-                "total_games": 0,
-                "total_series": 0,
-                "mmr": value
-            }
-        else:
-            stats[user_key]["mmr"] = value
-        
-        # Save
-        save_json_file(RANKSTATS_FILE, stats)
+        # Get player stats (initialized if they don't exist)
+        store = get_rankstats_store()
+        store.get_or_create(player.id)["mmr"] = value
+        store.mark_dirty(player.id)
         
         await interaction.response.send_message(
             f"✅ Set {player.mention}'s MMR to **{value}**",
@@ -1105,78 +1473,40 @@ class StatsCommands(commands.Cog):
     @app_commands.command(name="leaderboard", description="View the matchmaking leaderboard")
     @app_commands.describe(
         sort_by="How to sort the leaderboard",
-        page="Page number to view"
+        page="Page number to view",
+        playlist="Show ranks for a single playlist (optional)"
     )
     @app_commands.choices(sort_by=[
         app_commands.Choice(name="Rank (Default)", value="rank"),
         app_commands.Choice(name="Wins/Losses", value="wins"),
         app_commands.Choice(name="Series Wins/Losses", value="series_wins"),
         app_commands.Choice(name="MMR", value="mmr")
+    ], playlist=[
+        app_commands.Choice(name="MLG 4v4", value="mlg_4v4"),
+        app_commands.Choice(name="Team Hardcore", value="team_hardcore"),
+        app_commands.Choice(name="Double Team", value="double_team"),
+        app_commands.Choice(name="Head to Head", value="head_to_head")
     ])
-    async def leaderboard(self, interaction: discord.Interaction, sort_by: str = "rank", page: int = 1):
+    async def leaderboard(self, interaction: discord.Interaction, sort_by: str = "rank", page: int = 1, playlist: str = None):
         """Show leaderboard"""
-        # Get all players sorted
-        players = get_all_players_sorted(sort_by)
+        embed, page, total_pages = await build_leaderboard_embed(self.bot, sort_by, page, playlist)
         
-        if not players:
+        if embed is None:
             await interaction.response.send_message("No players have stats yet!", ephemeral=True)
             return
         
-        # Pagination
-        per_page = 10
-        total_pages = math.ceil(len(players) / per_page)
-        page = max(1, min(page, total_pages))
-        
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        page_players = players[start_idx:end_idx]
-        
-        # Create embed
-        embed = discord.Embed(
-            title="🏆 Halo 2 Matchmaking Leaderboard",
-            description=f"Sorted by: **{sort_by.replace('_', ' ').title()}**",
-            color=discord.Color.from_rgb(0, 112, 192)
-        )
-        
-        # Add players
-        leaderboard_text = ""
-        for i, (user_id, stats) in enumerate(page_players, start=start_idx + 1):
-            try:
-                user = await self.bot.fetch_user(int(user_id))
-                name = user.name
-            except:
-                name = f"User {user_id}"
-            
-            rank = stats["rank"]
-            xp = stats["xp"]
-            wins = stats["wins"]
-            losses = stats["losses"]
-            mmr = stats.get("mmr", 1500)
-            win_rate = (wins / stats["total_games"] * 100) if stats["total_games"] > 0 else 0
-            
-            if sort_by == "rank":
-                leaderboard_text += f"`{i}.` **{name}** - Level {rank} ({xp} XP)\n"
-            elif sort_by == "wins":
-                leaderboard_text += f"`{i}.` **{name}** - {wins}W / {losses}L ({win_rate:.1f}%)\n"
-            elif sort_by == "series_wins":
-                leaderboard_text += f"`{i}.` **{name}** - {stats['series_wins']}W / {stats['series_losses']}L (Series)\n"
-            elif sort_by == "mmr":
-                leaderboard_text += f"`{i}.` **{name}** - MMR: {mmr}\n"
-        
-        embed.description += f"\n\n{leaderboard_text}"
-        embed.set_footer(text=f"Page {page}/{total_pages} • {len(players)} total players")
-        
         # Add navigation buttons if needed
         if total_pages > 1:
-            view = LeaderboardView(sort_by, page, total_pages, self.bot)
+            view = LeaderboardView(sort_by, page, total_pages, self.bot, playlist)
             await interaction.response.send_message(embed=embed, view=view)
         else:
             await interaction.response.send_message(embed=embed)
 
 class LeaderboardView(discord.ui.View):
-    def __init__(self, sort_by: str, current_page: int, total_pages: int, bot):
+    def __init__(self, sort_by: str, current_page: int, total_pages: int, bot, playlist: str = None):
         super().__init__(timeout=300)
         self.sort_by = sort_by
+        self.playlist = playlist
         self.current_page = current_page
         self.total_pages = total_pages
         self.bot = bot
@@ -1198,49 +1528,12 @@ class LeaderboardView(discord.ui.View):
         await self.update_leaderboard(interaction, new_page)
     
     async def update_leaderboard(self, interaction: discord.Interaction, page: int):
-        # Get all players sorted
-        players = get_all_players_sorted(self.sort_by)
-        
-        # Pagination
-        per_page = 10
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        page_players = players[start_idx:end_idx]
-        
-        # Create embed
-        embed = discord.Embed(
-            title="🏆 Halo 2 Matchmaking Leaderboard",
-            description=f"Sorted by: **{self.sort_by.replace('_', ' ').title()}**",
-            color=discord.Color.from_rgb(0, 112, 192)
-        )
+        embed, page, total_pages = await build_leaderboard_embed(self.bot, self.sort_by, page, self.playlist)
         
-        # Add players
-        leaderboard_text = ""
-        for i, (user_id, stats) in enumerate(page_players, start=start_idx + 1):
-            try:
-                user = await self.bot.fetch_user(int(user_id))
-                name = user.name
-            except:
-                name = f"User {user_id}"
-            
-            rank = stats["rank"]
-            xp = stats["xp"]
-            wins = stats["wins"]
-            losses = stats["losses"]
-            mmr = stats.get("mmr", 1500)
-            win_rate = (wins / stats["total_games"] * 100) if stats["total_games"] > 0 else 0
-            
-            if self.sort_by == "rank":
-                leaderboard_text += f"`{i}.` **{name}** - Level {rank} ({xp} XP)\n"
-            elif self.sort_by == "wins":
-                leaderboard_text += f"`{i}.` **{name}** - {wins}W / {losses}L ({win_rate:.1f}%)\n"
-            elif self.sort_by == "series_wins":
-                leaderboard_text += f"`{i}.` **{name}** - {stats['series_wins']}W / {stats['series_losses']}L (Series)\n"
-            elif self.sort_by == "mmr":
-                leaderboard_text += f"`{i}.` **{name}** - MMR: {mmr}\n"
-        
-        embed.description += f"\n\n{leaderboard_text}"
-        embed.set_footer(text=f"Page {page}/{self.total_pages} • {len(players)} total players")
+        if embed is None:
+            await interaction.response.edit_message(content="No players have stats yet!", embed=None, view=None)
+            return
+        self.total_pages = total_pages
         
         # Update view
         self.current_page = page
@@ -1265,6 +1558,10 @@ __all__ = [
     'record_match_results',
     'refresh_all_ranks',
     'refresh_playlist_ranks',
+    'sync_rank_roles',
+    'get_guild_member_map',
+    'RoleSyncEngine',
+    'get_rankstats_store',
     'get_player_stats',
     'get_existing_player_stats',
     'calculate_rank',
@@ -1274,6 +1571,7 @@ __all__ = [
     'get_playlist_rank',
     'get_all_playlist_ranks',
     'get_xp_config',
+    'get_all_players_sorted',
     'PLAYLIST_TYPES',
     'setup'
 ]
@@ -0,0 +1,164 @@
+"""
+alias_index.py - Alias Lookup Index
+Keeps alias_index.json next to players.json so alias lookups don't have to
+walk every player:
+
+    {
+        "signature": [size, mtime_ns],        # players.json this index matches
+        "aliases": {"casefolded alias": "discord_id"},   # /linkalias aliases
+        "profiles": {"lowercased name": "discord_id"}    # stats_profile, display_name
+                                                         # and aliases (populate_stats)
+    }
+
+The bot updates it in place whenever it edits a player (/linkalias,
+/unlinkalias, Twitch links, identity sync) and saves it with players.json. Anyone else who loads it
+checks the signature first and rebuilds it if players.json was changed by
+something that didn't maintain the index.
+"""
+
+import json
+import os
+import tempfile
+
+ALIAS_INDEX_FILENAME = "alias_index.json"
+
+# In-memory copies keyed by players.json path
+_INDEX_CACHE = {}
+
+
+def normalize_alias(alias: str) -> str:
+    """Key used for alias collision checks"""
+    return alias.strip().casefold()
+
+def get_index_file(players_file: str) -> str:
+    """alias_index.json lives in the same directory as players.json"""
+    return os.path.join(os.path.dirname(os.path.abspath(players_file)), ALIAS_INDEX_FILENAME)
+
+def get_players_signature(players_file: str):
+    """Cheap change detector for players.json: [size, mtime_ns] (None if missing)"""
+    try:
+        st = os.stat(players_file)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def get_player_names(data: dict) -> list:
+    """Lowercased names a player can be resolved by (stats_profile, display_name, aliases)"""
+    names = []
+    stats_profile = data.get('stats_profile', '')
+    if stats_profile:
+        names.append(stats_profile.lower())
+    display_name = data.get('display_name', '')
+    if display_name:
+        names.append(display_name.lower())
+    for alias in data.get('aliases', []):
+        if alias:
+            names.append(alias.lower())
+    return names
+
+def build_alias_index(players: dict) -> dict:
+    """Build the index from scratch from players.json data"""
+    aliases = {}
+    profiles = {}
+    for user_id, data in players.items():
+        for name in get_player_names(data):
+            profiles[name] = user_id
+        for alias in data.get('aliases', []):
+            if alias:
+                aliases[normalize_alias(alias)] = user_id
+    return {"signature": None, "aliases": aliases, "profiles": profiles}
+
+def save_alias_index(index: dict, players_file: str):
+    """Write alias_index.json atomically"""
+    index_file = get_index_file(players_file)
+    fd, tmp_path = tempfile.mkstemp(prefix=".alias_index.", suffix=".tmp",
+                                    dir=os.path.dirname(index_file))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, index_file)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def load_alias_index(players_file: str, players: dict = None) -> dict:
+    """
+    Get the alias index for a players.json file.
+
+    Uses the in-memory copy, then alias_index.json, as long as its signature
+    still matches players.json. Otherwise rebuilds it (from `players` if given,
+    else by reading players.json) and saves it.
+    """
+    signature = get_players_signature(players_file)
+
+    cached = _INDEX_CACHE.get(players_file)
+    if cached is not None and cached.get("signature") == signature:
+        return cached
+
+    index = None
+    try:
+        with open(get_index_file(players_file), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    if not index or index.get("signature") != signature:
+        if players is None:
+            try:
+                with open(players_file, 'r', encoding='utf-8') as f:
+                    players = json.load(f)
+            except (OSError, ValueError):
+                players = {}
+        index = build_alias_index(players)
+        index["signature"] = signature
+        if signature is not None:
+            try:
+                save_alias_index(index, players_file)
+            except OSError as e:
+                print(f"Could not save {ALIAS_INDEX_FILENAME}: {e}")
+
+    _INDEX_CACHE[players_file] = index
+    return index
+
+def get_alias_owner(index: dict, alias: str):
+    """Discord ID an alias is linked to (None if free)"""
+    return index["aliases"].get(normalize_alias(alias))
+
+def add_alias(index: dict, user_id: str, alias: str):
+    """Record a newly linked alias"""
+    index["aliases"][normalize_alias(alias)] = user_id
+    index["profiles"][alias.lower()] = user_id
+
+def remove_alias(index: dict, user_id: str, alias: str, player_data: dict):
+    """Forget an unlinked alias (player_data is the player's entry after removal)"""
+    if index["aliases"].get(normalize_alias(alias)) == user_id:
+        del index["aliases"][normalize_alias(alias)]
+    name = alias.lower()
+    if index["profiles"].get(name) == user_id and name not in get_player_names(player_data):
+        del index["profiles"][name]
+
+def update_player(index: dict, user_id: str, old_data: dict, new_data: dict):
+    """Re-index a player whose entry was replaced, added (old_data None) or removed (new_data None)"""
+    old_data = old_data or {}
+    new_data = new_data or {}
+    for alias in old_data.get('aliases', []):
+        if alias and index["aliases"].get(normalize_alias(alias)) == user_id:
+            del index["aliases"][normalize_alias(alias)]
+    for name in get_player_names(old_data):
+        if index["profiles"].get(name) == user_id:
+            del index["profiles"][name]
+    for alias in new_data.get('aliases', []):
+        if alias:
+            index["aliases"][normalize_alias(alias)] = user_id
+    for name in get_player_names(new_data):
+        index["profiles"][name] = user_id
+
+def commit_alias_index(index: dict, players_file: str):
+    """Stamp the index with players.json's current signature and save it -
+    call right after writing players.json with the change applied"""
+    index["signature"] = get_players_signature(players_file)
+    _INDEX_CACHE[players_file] = index
+    try:
+        save_alias_index(index, players_file)
+    except OSError as e:
+        print(f"Could not save {ALIAS_INDEX_FILENAME}: {e}")
@@ -5,6 +5,7 @@ from discord import app_commands
 from discord.ext import commands
 import random
 from datetime import datetime
+import alias_index
 
 # Admin role configuration
 ADMIN_ROLES = ["Overlord", "Staff", "Server Support"]
@@ -127,7 +128,7 @@ def setup_commands(bot: commands.Bot, PREGAME_LOBBY_ID: int, POSTGAME_LOBBY_ID:
     async def cancel_queue(interaction: discord.Interaction):
         """Cancel match but register games"""
         from searchmatchmaking import queue_state, update_queue_embed
-        from postgame import save_match_history
+        from postgame import save_match_history, publish_match_history
         
         if not queue_state.current_series:
             await interaction.response.send_message("❌ No active match!", ephemeral=True)
@@ -141,6 +142,7 @@ def setup_commands(bot: commands.Bot, PREGAME_LOBBY_ID: int, POSTGAME_LOBBY_ID:
             
             log_action(f"Admin {interaction.user.name} cancelled match - {len(series.games)} games played")
             save_match_history(series, 'CANCELLED')
+            publish_match_history(series.test_mode)
         
         await interaction.response.defer()
         
@@ -299,16 +301,19 @@ def setup_commands(bot: commands.Bot, PREGAME_LOBBY_ID: int, POSTGAME_LOBBY_ID:
         import STATSRANKS
         
         guild = interaction.guild
-        stats = STATSRANKS.load_json_file(STATSRANKS.RANKSTATS_FILE)
+        stats = STATSRANKS.get_rankstats_store().all()
         
-        refreshed = 0
         reset_to_one = 0
+        desired = {}
+        
+        # Load the full member list once (chunked) so every lookup is local
+        guild_members = await STATSRANKS.get_guild_member_map(guild)
         
         # Process all players in the stats file
         for user_id_str, player_stats in stats.items():
             try:
                 user_id = int(user_id_str)
-                member = guild.get_member(user_id)
+                member = guild_members.get(user_id)
                 
                 if not member:
                     continue
@@ -324,28 +329,27 @@ def setup_commands(bot: commands.Bot, PREGAME_LOBBY_ID: int, POSTGAME_LOBBY_ID:
                     # Calculate rank from XP
                     new_level = STATSRANKS.calculate_rank(player_stats.get("xp", 0))
                 
-                # Update role silently (send_dm=False)
-                await STATSRANKS.update_player_rank_role(guild, user_id, new_level, send_dm=False)
-                refreshed += 1
+                desired[user_id] = new_level
                 
             except Exception as e:
                 log_action(f"Error refreshing rank for {user_id_str}: {e}")
                 continue
         
         # Also check all guild members who might not be in stats yet
-        for member in guild.members:
+        for member in guild_members.values():
             if member.bot:
                 continue
             
             user_id_str = str(member.id)
             if user_id_str not in stats:
                 # Not in stats = Level 1
-                try:
-                    await STATSRANKS.update_player_rank_role(guild, member.id, 1, send_dm=False)
-                    reset_to_one += 1
-                    refreshed += 1
-                except:
-                    pass
+                desired[member.id] = 1
+                reset_to_one += 1
+        
+        # Diff against current roles in one pass - only members whose level
+        # actually changes get a role edit (send_dm=False)
+        result = await STATSRANKS.sync_rank_roles(guild, desired, send_dm=False, members=guild_members)
+        refreshed = len(result["updated"])
         
         log_action(f"Admin {interaction.user.name} ran silent rank refresh: {refreshed} players updated, {reset_to_one} reset to Level 1")
         await interaction.followup.send(
@@ -511,33 +515,15 @@ def setup_commands(bot: commands.Bot, PREGAME_LOBBY_ID: int, POSTGAME_LOBBY_ID:
             "logged_by_name": interaction.user.display_name
         }
         
-        # Load or create testmatchhistory.json
+        # Append to the test match log and rebuild testmatchhistory.json from it
+        import match_log
         history_file = 'testmatchhistory.json'
-        if os.path.exists(history_file):
-            try:
-                with open(history_file, 'r') as f:
-                    history = json.load(f)
-            except:
-                history = {"total_test_logs": 0, "matches": []}
-        else:
-            history = {"total_test_logs": 0, "matches": []}
-        
-        # Add match
-        history["total_test_logs"] = history.get("total_test_logs", 0) + 1
-        history["matches"].append(match_entry)
-        
-        # Save
-        with open(history_file, 'w') as f:
-            json.dump(history, f, indent=2)
+        match_log.append_event(history_file, "matches", match_entry, counter="total_test_logs")
         
         log_action(f"{interaction.user.display_name} logged test match with {len(games)} games")
         
-        # Push to GitHub
-        try:
-            import github_webhook
-            github_webhook.update_testmatchhistory_on_github()
-        except Exception as e:
-            log_action(f"Failed to push test match history to GitHub: {e}")
+        from postgame import publish_match_history
+        publish_match_history(test_mode=True)
         
         # Send summary
         await interaction.followup.send(
@@ -705,6 +691,7 @@ def setup_commands(bot: commands.Bot, PREGAME_LOBBY_ID: int, POSTGAME_LOBBY_ID:
             return
         
         players = twitch.load_players()
+        index = alias_index.load_alias_index(twitch.PLAYERS_FILE, players)
         user_id = str(interaction.user.id)
         
         # Initialize player entry if doesn't exist
@@ -715,27 +702,24 @@ def setup_commands(bot: commands.Bot, PREGAME_LOBBY_ID: int, POSTGAME_LOBBY_ID:
         if "aliases" not in players[user_id]:
             players[user_id]["aliases"] = []
         
-        # Check if alias already linked to this user
-        if alias.lower() in [a.lower() for a in players[user_id]["aliases"]]:
+        # Check if alias is already linked (to this user or someone else)
+        owner = alias_index.get_alias_owner(index, alias)
+        if owner == user_id:
             await interaction.response.send_message(
                 f"❌ Alias **{alias}** is already linked to your account.",
                 ephemeral=True
             )
             return
-        
-        # Check if alias is taken by someone else
-        for other_id, other_data in players.items():
-            if other_id != user_id:
-                other_aliases = other_data.get("aliases", [])
-                if alias.lower() in [a.lower() for a in other_aliases]:
-                    await interaction.response.send_message(
-                        f"❌ Alias **{alias}** is already linked to another user.",
-                        ephemeral=True
-                    )
-                    return
+        if owner is not None:
+            await interaction.response.send_message(
+                f"❌ Alias **{alias}** is already linked to another user.",
+                ephemeral=True
+            )
+            return
         
         # Add alias
         players[user_id]["aliases"].append(alias)
+        alias_index.add_alias(index, user_id, alias)
         twitch.save_players(players)
         
         # Show all aliases
@@ -776,7 +760,9 @@ def setup_commands(bot: commands.Bot, PREGAME_LOBBY_ID: int, POSTGAME_LOBBY_ID:
             return
         
         # Remove alias
+        index = alias_index.load_alias_index(twitch.PLAYERS_FILE, players)
         players[user_id]["aliases"].remove(found_alias)
+        alias_index.remove_alias(index, user_id, found_alias, players[user_id])
         twitch.save_players(players)
         
         remaining = players[user_id].get("aliases", [])
@@ -868,7 +854,9 @@ def setup_commands(bot: commands.Bot, PREGAME_LOBBY_ID: int, POSTGAME_LOBBY_ID:
             )
             return
         
+        index = alias_index.load_alias_index(twitch.PLAYERS_FILE, players)
         players[user_id]["aliases"].remove(found_alias)
+        alias_index.remove_alias(index, user_id, found_alias, players[user_id])
         twitch.save_players(players)
         
         await interaction.response.defer()
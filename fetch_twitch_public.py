@@ -2,18 +2,27 @@
 """
 fetch_twitch_public.py - Fetch public VODs and Clips from Twitch using GQL API
 No authentication required for public data.
+
+All usernames are fetched concurrently. TWITCH_GQL_URL can point at a local
+stand-in server for testing.
 """
 
+import os
 import json
 import sys
+import time
+import asyncio
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import urllib.request
 import urllib.error
 
-TWITCH_GQL_URL = "https://gql.twitch.tv/gql"
+TWITCH_GQL_URL = os.environ.get("TWITCH_GQL_URL", "https://gql.twitch.tv/gql")
 CLIENT_ID = "kimne78kx3ncx6brgo4mv6wki5h1ko"  # Twitch's public web client ID
 
+GQL_MAX_CONCURRENCY = 8   # Users fetched at once
+GQL_MAX_RETRIES = 4       # Attempts per request when rate limited (429) or on 5xx
+
 
 def gql_request(query: str, variables: dict = None) -> Optional[dict]:
     """Make a GraphQL request to Twitch"""
@@ -28,21 +37,26 @@ def gql_request(query: str, variables: dict = None) -> Optional[dict]:
         "Content-Type": "application/json"
     }
 
-    try:
-        req = urllib.request.Request(TWITCH_GQL_URL, data=data, headers=headers)
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            return json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        print(f"HTTP Error {e.code}: {e.reason}")
+    for attempt in range(GQL_MAX_RETRIES):
         try:
-            error_body = e.read().decode()
-            print(f"Error body: {error_body[:500]}")
-        except:
-            pass
-        return None
-    except Exception as e:
-        print(f"Error: {e}")
-        return None
+            req = urllib.request.Request(TWITCH_GQL_URL, data=data, headers=headers)
+            with urllib.request.urlopen(req, timeout=15) as resp:
+                return json.loads(resp.read().decode())
+        except urllib.error.HTTPError as e:
+            if (e.code == 429 or e.code >= 500) and attempt < GQL_MAX_RETRIES - 1:
+                time.sleep(min(30, 2 ** attempt))
+                continue
+            print(f"HTTP Error {e.code}: {e.reason}")
+            try:
+                error_body = e.read().decode()
+                print(f"Error body: {error_body[:500]}")
+            except:
+                pass
+            return None
+        except Exception as e:
+            print(f"Error: {e}")
+            return None
+    return None
 
 
 def get_user_videos(username: str, video_type: str = "ARCHIVE", limit: int = 20) -> List[dict]:
@@ -130,6 +144,28 @@ def get_user_clips(username: str, limit: int = 20) -> List[dict]:
     return []
 
 
+async def fetch_users_media(usernames: List[str], video_limit: int = 30,
+                            clip_limit: int = 30) -> Dict[str, dict]:
+    """
+    Fetch every user's VODs and clips concurrently (GQL_MAX_CONCURRENCY
+    requests at a time, each in a worker thread).
+
+    Returns:
+        {username: {"videos": [...], "clips": [...]}}
+    """
+    semaphore = asyncio.Semaphore(GQL_MAX_CONCURRENCY)
+
+    async def run(func, *args):
+        async with semaphore:
+            return await asyncio.to_thread(func, *args)
+
+    fetched = await asyncio.gather(*[
+        asyncio.gather(run(get_user_videos, u, "ARCHIVE", video_limit), run(get_user_clips, u, clip_limit))
+        for u in usernames
+    ])
+    return {u: {"videos": videos, "clips": clips} for u, (videos, clips) in zip(usernames, fetched)}
+
+
 def parse_datetime(date_str: str) -> datetime:
     """Parse datetime string"""
     formats = [
@@ -219,6 +255,8 @@ def main():
     all_vods = []
     all_clips = []
 
+    media = asyncio.run(fetch_users_media(usernames, 30, 30))
+
     for username in usernames:
         print(f"\n{'='*50}")
         print(f"  {username.upper()}")
@@ -228,7 +266,7 @@ def main():
         print("\n  VODs (Past Broadcasts):")
         print("  " + "-" * 40)
 
-        videos = get_user_videos(username, "ARCHIVE", 30)
+        videos = media[username]["videos"]
 
         if not videos:
             print("  No VODs found or user doesn't exist")
@@ -275,7 +313,7 @@ def main():
         print("\n  Clips (Last 7 Days):")
         print("  " + "-" * 40)
 
-        clips = get_user_clips(username, 30)
+        clips = media[username]["clips"]
 
         if not clips:
             print("  No clips found")
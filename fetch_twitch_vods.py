@@ -7,12 +7,22 @@ Usage:
 
 Requires TWITCH_CLIENT_ID and TWITCH_CLIENT_SECRET environment variables.
 Get these from https://dev.twitch.tv/console/apps
+
+The app token and login -> user id lookups are cached in twitch_cache.json, and
+all usernames are fetched concurrently (TwitchClient), so a lookup for a full
+match costs about one round trip. TWITCH_AUTH_URL / TWITCH_API_BASE can point
+at a local stand-in server for testing.
 """
 
 import os
 import sys
+import re
 import json
+import time
+import asyncio
 import argparse
+import calendar
+import tempfile
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import urllib.request
@@ -20,90 +30,351 @@ import urllib.parse
 import urllib.error
 
 # Twitch API endpoints
-TWITCH_AUTH_URL = "https://id.twitch.tv/oauth2/token"
-TWITCH_API_BASE = "https://api.twitch.tv/helix"
-
-
-def get_app_access_token(client_id: str, client_secret: str) -> Optional[str]:
-    """Get an app access token from Twitch"""
-    data = urllib.parse.urlencode({
-        "client_id": client_id,
-        "client_secret": client_secret,
-        "grant_type": "client_credentials"
-    }).encode()
+TWITCH_AUTH_URL = os.environ.get("TWITCH_AUTH_URL", "https://id.twitch.tv/oauth2/token")
+TWITCH_API_BASE = os.environ.get("TWITCH_API_BASE", "https://api.twitch.tv/helix")
 
-    try:
-        req = urllib.request.Request(TWITCH_AUTH_URL, data=data, method="POST")
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            result = json.loads(resp.read().decode())
-            return result.get("access_token")
-    except Exception as e:
-        print(f"Error getting access token: {e}")
-        return None
+# Cached app token and login -> user id map
+TWITCH_CACHE_FILE = os.environ.get("TWITCH_CACHE_FILE", "twitch_cache.json")
 
+TWITCH_MAX_CONCURRENCY = 16  # Requests in flight at once (videos + clips for 8 players)
+TWITCH_MAX_RETRIES = 4       # Attempts per request when rate limited (429) or on 5xx
+TOKEN_EXPIRY_MARGIN = 300    # Refresh the app token this many seconds before it expires
 
-def twitch_api_request(endpoint: str, params: dict, client_id: str, access_token: str) -> Optional[dict]:
-    """Make an authenticated request to Twitch API"""
-    url = f"{TWITCH_API_BASE}/{endpoint}"
-    if params:
-        url += "?" + urllib.parse.urlencode(params)
+# VOD/clip metadata cache (per streamer). Finished archives never change, so
+# they are kept until Twitch would have deleted them; VODs that may still be
+# live expire quickly.
+TWITCH_VOD_CACHE_FILE = os.environ.get("TWITCH_VOD_CACHE_FILE", "twitch_vod_cache.json")
+VOD_LIST_TTL = 300                # Use a streamer's cached VOD list without asking Twitch for this long
+VOD_RECENT_WINDOW = 15 * 60       # A VOD that ended less than this long ago may still be live
+VOD_RECENT_TTL = 120              # ...so it is refetched after this long
+VOD_ARCHIVE_TTL = 60 * 24 * 3600  # Twitch keeps past broadcasts for at most 60 days
+CLIP_OPEN_TTL = 600               # Clip searches whose time window hasn't ended yet
 
-    headers = {
-        "Client-ID": client_id,
-        "Authorization": f"Bearer {access_token}"
-    }
 
+def load_twitch_cache(cache_file: str = TWITCH_CACHE_FILE) -> dict:
+    """Load the token/user id cache: {"token": {"access_token", "expires_at"}, "user_ids": {login: id}}"""
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            cache.setdefault("user_ids", {})
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"token": None, "user_ids": {}}
+
+
+def save_twitch_cache(cache: dict, cache_file: str = TWITCH_CACHE_FILE):
+    """Save the token/user id cache atomically"""
+    directory = os.path.dirname(os.path.abspath(cache_file))
+    fd, tmp_path = tempfile.mkstemp(prefix=".twitch_cache.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, cache_file)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_vod_cache(cache_file: str = TWITCH_VOD_CACHE_FILE) -> dict:
+    """
+    Load the VOD/clip metadata cache:
+        {"streamers": {user_id: {"checked_at", "newest_id", "first", "vods": [{"vod", "expires_at"}]}},
+         "clips": {"user_id|started_at|ended_at|first": {"clips", "expires_at"}}}
+    """
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            cache.setdefault("streamers", {})
+            cache.setdefault("clips", {})
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {"streamers": {}, "clips": {}}
+
+
+def twitch_time_to_epoch(value: str) -> float:
+    """Convert a Twitch UTC timestamp ("2025-11-28T20:50:00Z") to epoch seconds"""
+    return calendar.timegm(time.strptime(value, "%Y-%m-%dT%H:%M:%SZ"))
+
+
+def vod_window_epoch(vod: dict):
+    """(start, end) of a VOD in epoch seconds"""
+    start = twitch_time_to_epoch(vod["created_at"])
+    return start, start + parse_duration_seconds(vod.get("duration", "0s"))
+
+
+def make_vod_cache_entry(vod: dict, now: float) -> dict:
+    """
+    Cache entry for a VOD. One that ended within VOD_RECENT_WINDOW may still
+    be live and growing, so it is "recent" and expires after VOD_RECENT_TTL.
+    Finished archives expire when Twitch would have deleted them.
+    """
+    try:
+        start, end = vod_window_epoch(vod)
+    except (KeyError, ValueError):
+        return {"vod": vod, "expires_at": now + VOD_RECENT_TTL, "recent": True}
+    if now - end < VOD_RECENT_WINDOW:
+        return {"vod": vod, "expires_at": now + VOD_RECENT_TTL, "recent": True}
+    # Twitch still listing an archive older than that means it's kept longer
+    return {"vod": vod, "expires_at": max(start + VOD_ARCHIVE_TTL, now + VOD_LIST_TTL), "recent": False}
+
+
+def http_request(url: str, headers: dict = None, data: bytes = None, method: str = None):
+    """Blocking HTTP request. Returns (status, parsed JSON body or None, response headers)."""
+    req = urllib.request.Request(url, data=data, headers=headers or {}, method=method)
     try:
-        req = urllib.request.Request(url, headers=headers)
         with urllib.request.urlopen(req, timeout=15) as resp:
-            return json.loads(resp.read().decode())
+            return resp.status, json.loads(resp.read().decode()), dict(resp.headers)
     except urllib.error.HTTPError as e:
-        print(f"HTTP Error {e.code}: {e.reason}")
-        return None
-    except Exception as e:
-        print(f"Error: {e}")
-        return None
-
-
-def get_user_id(username: str, client_id: str, access_token: str) -> Optional[str]:
-    """Get Twitch user ID from username"""
-    result = twitch_api_request("users", {"login": username}, client_id, access_token)
-    if result and result.get("data"):
-        return result["data"][0]["id"]
-    return None
+        return e.code, None, dict(e.headers or {})
 
 
-def get_vods(user_id: str, client_id: str, access_token: str, first: int = 20) -> List[dict]:
-    """Get VODs (past broadcasts) for a user"""
-    result = twitch_api_request("videos", {
-        "user_id": user_id,
-        "type": "archive",  # Past broadcasts
-        "first": first
-    }, client_id, access_token)
-
-    if result and result.get("data"):
-        return result["data"]
-    return []
-
+def retry_delay(attempt: int, headers: dict) -> float:
+    """Seconds to wait before retrying a rate limited request (Ratelimit-Reset if given)"""
+    reset = headers.get("Ratelimit-Reset") or headers.get("ratelimit-reset")
+    if reset:
+        try:
+            return max(0.0, min(60.0, float(reset) - time.time()))
+        except ValueError:
+            pass
+    return min(30.0, 2 ** attempt)
+
+
+class TwitchClient:
+    """
+    Async Helix client.
+
+    Blocking urllib calls run in worker threads, at most TWITCH_MAX_CONCURRENCY
+    at a time. The app token is reused until it expires and login -> user id
+    lookups are remembered, both persisted in the cache file. 429s and 5xx
+    responses are retried with backoff.
+    """
+
+    def __init__(self, client_id: str, client_secret: str, cache_file: str = TWITCH_CACHE_FILE,
+                 concurrency: int = TWITCH_MAX_CONCURRENCY):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.cache_file = cache_file
+        self.cache = load_twitch_cache(cache_file)
+        self.concurrency = concurrency
+        # asyncio primitives belong to one event loop - made by _sync_primitives
+        # inside the running loop, so the client can be reused across asyncio.run calls
+        self._loop = None
+        self._semaphore = None
+        self._token_lock = None
+        self.vod_cache_file = TWITCH_VOD_CACHE_FILE
+        self.vod_cache = load_vod_cache(self.vod_cache_file)
+
+    def _sync_primitives(self):
+        """Create the request semaphore and token lock for the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._token_lock = asyncio.Lock()
+
+    def _save_cache(self):
+        try:
+            save_twitch_cache(self.cache, self.cache_file)
+        except OSError as e:
+            print(f"Could not save {self.cache_file}: {e}")
+
+    async def get_token(self, force_refresh: bool = False) -> Optional[str]:
+        """App access token, fetched only when missing or about to expire"""
+        self._sync_primitives()
+        async with self._token_lock:
+            token = self.cache.get("token")
+            if not force_refresh and token and token.get("expires_at", 0) - TOKEN_EXPIRY_MARGIN > time.time():
+                return token["access_token"]
+
+            data = urllib.parse.urlencode({
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "grant_type": "client_credentials"
+            }).encode()
+            try:
+                status, result, _ = await asyncio.to_thread(
+                    http_request, TWITCH_AUTH_URL, None, data, "POST")
+            except Exception as e:
+                print(f"Error getting access token: {e}")
+                return None
+            if status != 200 or not result or not result.get("access_token"):
+                print(f"Error getting access token: HTTP {status}")
+                return None
+
+            self.cache["token"] = {
+                "access_token": result["access_token"],
+                "expires_at": time.time() + result.get("expires_in", 0)
+            }
+            self._save_cache()
+            return result["access_token"]
+
+    async def request(self, endpoint: str, params) -> Optional[dict]:
+        """GET a Helix endpoint (params: dict or list of (key, value) pairs)"""
+        url = f"{TWITCH_API_BASE}/{endpoint}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+
+        refreshed = False
+        for attempt in range(TWITCH_MAX_RETRIES):
+            token = await self.get_token()
+            if not token:
+                return None
+            headers = {"Client-ID": self.client_id, "Authorization": f"Bearer {token}"}
+            try:
+                self._sync_primitives()
+                async with self._semaphore:
+                    status, result, resp_headers = await asyncio.to_thread(http_request, url, headers)
+            except Exception as e:
+                print(f"Error: {e}")
+                return None
+
+            if status == 200:
+                return result
+            if status == 401 and not refreshed:
+                # Token revoked/expired early - get a new one and retry once
+                await self.get_token(force_refresh=True)
+                refreshed = True
+                continue
+            if status == 429 or status >= 500:
+                await asyncio.sleep(retry_delay(attempt, resp_headers))
+                continue
+            print(f"HTTP Error {status} for {endpoint}")
+            return None
+
+        print(f"Giving up on {endpoint} after {TWITCH_MAX_RETRIES} attempts")
+        return None
 
-def get_clips(user_id: str, client_id: str, access_token: str,
-              started_at: Optional[str] = None, ended_at: Optional[str] = None,
-              first: int = 20) -> List[dict]:
-    """Get clips for a user within a time range"""
-    params = {
-        "broadcaster_id": user_id,
-        "first": first
-    }
-    if started_at:
-        params["started_at"] = started_at
-    if ended_at:
-        params["ended_at"] = ended_at
+    async def get_user_ids(self, usernames: List[str]) -> Dict[str, Optional[str]]:
+        """Map logins to user ids - cached ones are free, the rest cost one batched request"""
+        user_ids = self.cache["user_ids"]
+        missing = sorted({u.lower() for u in usernames if u.lower() not in user_ids})
+        # Helix allows up to 100 logins per /users request
+        batches = [missing[i:i + 100] for i in range(0, len(missing), 100)]
+        results = await asyncio.gather(*[
+            self.request("users", [("login", login) for login in batch]) for batch in batches
+        ])
+        found = False
+        for result in results:
+            for user in (result or {}).get("data", []):
+                user_ids[user["login"].lower()] = user["id"]
+                found = True
+        if found:
+            self._save_cache()
+        return {u: user_ids.get(u.lower()) for u in usernames}
+
+    def save_vod_cache(self):
+        """Drop expired entries and write the VOD/clip cache"""
+        now = time.time()
+        for entry in self.vod_cache["streamers"].values():
+            # Expired recent entries stay so the next lookup knows to refetch
+            entry["vods"] = [v for v in entry["vods"] if v["expires_at"] > now or v.get("recent")]
+        self.vod_cache["clips"] = {key: entry for key, entry in self.vod_cache["clips"].items()
+                                   if entry["expires_at"] > now}
+        try:
+            save_twitch_cache(self.vod_cache, self.vod_cache_file)
+        except OSError as e:
+            print(f"Could not save {self.vod_cache_file}: {e}")
+
+    async def get_vods(self, user_id: str, first: int = 20, use_cache: bool = True) -> Optional[List[dict]]:
+        """
+        A user's recent VODs (past broadcasts), served from the VOD cache when possible.
+
+        Within VOD_LIST_TTL of the last check the cached list is used as-is.
+        After that a one-video request checks whether the newest VOD id has
+        changed; only if it has (or a cached VOD that may have been live has
+        expired) is the full list fetched again. use_cache=False always
+        fetches the full list (and refreshes the cache with it).
+
+        Returns:
+            List of VODs (newest first), or None if Twitch couldn't be reached
+            and nothing is cached
+        """
+        now = time.time()
+        entry = self.vod_cache["streamers"].get(user_id)
+        if use_cache and entry and entry.get("first", 0) >= first:
+            # Expired archives are simply gone from Twitch; an expired recent
+            # VOD may have grown, so that needs a full refetch
+            vods = [v for v in entry["vods"] if v["expires_at"] > now]
+            if not any(v.get("recent") for v in entry["vods"] if v["expires_at"] <= now):
+                entry["vods"] = vods
+                if now - entry["checked_at"] < VOD_LIST_TTL:
+                    return [v["vod"] for v in vods][:first]
+
+                probe = await self.request("videos", {"user_id": user_id, "type": "archive", "first": 1})
+                if probe is not None:
+                    newest = (probe.get("data") or [{}])[0].get("id")
+                    if newest == entry.get("newest_id"):
+                        entry["checked_at"] = now
+                        return [v["vod"] for v in vods][:first]
+
+        result = await self.request("videos", {"user_id": user_id, "type": "archive", "first": first})
+        if result is None:
+            return [v["vod"] for v in entry["vods"]][:first] if entry else None
+
+        vods = result.get("data") or []
+        self.vod_cache["streamers"][user_id] = {
+            "checked_at": now,
+            "newest_id": vods[0]["id"] if vods else None,
+            "first": first,
+            "vods": [make_vod_cache_entry(v, now) for v in vods]
+        }
+        return vods
+
+    async def get_clips(self, user_id: str, started_at: str, ended_at: str,
+                        first: int = 20, use_cache: bool = True) -> List[dict]:
+        """Clips in a time window, cached - for good once the window has passed
+        (clips are dated when they are made), briefly while it's still open.
+        use_cache=False always asks Twitch (and refreshes the cache)."""
+        now = time.time()
+        key = f"{user_id}|{started_at}|{ended_at}|{first}"
+        entry = self.vod_cache["clips"].get(key)
+        if use_cache and entry and entry["expires_at"] > now:
+            return entry["clips"]
+
+        result = await self.request("clips", {"broadcaster_id": user_id, "first": first,
+                                              "started_at": started_at, "ended_at": ended_at})
+        if result is None:
+            return entry["clips"] if entry else []
+
+        clips = result.get("data") or []
+        window_end = twitch_time_to_epoch(ended_at)
+        self.vod_cache["clips"][key] = {
+            "clips": clips,
+            "expires_at": now + (VOD_ARCHIVE_TTL if window_end < now else CLIP_OPEN_TTL)
+        }
+        return clips
+
+    async def fetch_match_media(self, usernames: List[str], match_time: datetime,
+                                match_end: datetime, first: int = 50) -> Dict[str, dict]:
+        """
+        Fetch every user's VODs and clips around a match concurrently.
+
+        Returns:
+            {username: {"user_id", "vods" (all recent), "clips"}}
+        """
+        user_ids = await self.get_user_ids(usernames)
+
+        # Clips can be created a while after the match
+        clip_start = (match_time - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        clip_end = (match_end + timedelta(days=2)).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    result = twitch_api_request("clips", params, client_id, access_token)
+        found = [u for u in usernames if user_ids.get(u)]
+        fetched = await asyncio.gather(*[
+            asyncio.gather(self.get_vods(user_ids[u], first=first),
+                           self.get_clips(user_ids[u], clip_start, clip_end, first=first))
+            for u in found
+        ])
+        self.save_vod_cache()
 
-    if result and result.get("data"):
-        return result["data"]
-    return []
+        results = {u: {"user_id": user_ids.get(u), "vods": [], "clips": []} for u in usernames}
+        for username, (vods, clips) in zip(found, fetched):
+            results[username]["vods"] = vods or []
+            results[username]["clips"] = clips
+        return results
 
 
 def parse_datetime(date_str: str) -> datetime:
@@ -124,29 +395,29 @@ def parse_datetime(date_str: str) -> datetime:
     raise ValueError(f"Could not parse date: {date_str}")
 
 
+def parse_duration_seconds(duration_str: str) -> int:
+    """Parse a Helix duration ("3h20m15s", "20m15s" or "45s") into seconds"""
+    total_seconds = 0
+    hours = re.search(r"(\d+)h", duration_str)
+    minutes = re.search(r"(\d+)m", duration_str)
+    seconds = re.search(r"(\d+)s", duration_str)
+
+    if hours:
+        total_seconds += int(hours.group(1)) * 3600
+    if minutes:
+        total_seconds += int(minutes.group(1)) * 60
+    if seconds:
+        total_seconds += int(seconds.group(1))
+    return total_seconds
+
+
 def vod_covers_time(vod: dict, target_start: datetime, target_end: datetime) -> bool:
     """Check if a VOD covers the target time period"""
     try:
         # Parse VOD start time
         vod_start = datetime.strptime(vod["created_at"], "%Y-%m-%dT%H:%M:%SZ")
 
-        # Parse duration (format: "3h20m15s" or "20m15s" or "45s")
-        duration_str = vod.get("duration", "0s")
-        total_seconds = 0
-
-        import re
-        hours = re.search(r"(\d+)h", duration_str)
-        minutes = re.search(r"(\d+)m", duration_str)
-        seconds = re.search(r"(\d+)s", duration_str)
-
-        if hours:
-            total_seconds += int(hours.group(1)) * 3600
-        if minutes:
-            total_seconds += int(minutes.group(1)) * 60
-        if seconds:
-            total_seconds += int(seconds.group(1))
-
-        vod_end = vod_start + timedelta(seconds=total_seconds)
+        vod_end = vod_start + timedelta(seconds=parse_duration_seconds(vod.get("duration", "0s")))
 
         # Check if there's any overlap between VOD and target period
         # VOD covers target if: vod_start <= target_end AND vod_end >= target_start
@@ -219,34 +490,34 @@ def main():
     print(f"Match time: {match_time} - {match_end} ({args.duration} min)")
     print()
 
-    # Get access token
+    # Fetch everyone's VODs and clips at once (token/user ids come from the cache when possible)
+    client = TwitchClient(client_id, client_secret)
+
+    async def fetch():
+        if not await client.get_token():
+            return None
+        return await client.fetch_match_media(usernames, match_time, match_end)
+
     print("Authenticating with Twitch...")
-    access_token = get_app_access_token(client_id, client_secret)
-    if not access_token:
+    results = asyncio.run(fetch())
+    if results is None:
         print("Failed to authenticate with Twitch API")
         sys.exit(1)
-    print("Authenticated successfully!")
     print()
 
-    results = {}
-
     for username in usernames:
         print(f"=== {username} ===")
-        results[username] = {"vods": [], "clips": [], "user_id": None}
 
-        # Get user ID
-        user_id = get_user_id(username, client_id, access_token)
+        user_id = results[username]["user_id"]
         if not user_id:
             print(f"  Could not find user: {username}")
             print()
             continue
 
-        results[username]["user_id"] = user_id
         print(f"  User ID: {user_id}")
 
-        # Get VODs
-        print(f"  Fetching VODs...")
-        vods = get_vods(user_id, client_id, access_token, first=50)
+        # VODs
+        vods = results[username]["vods"]
         matching_vods = []
 
         for vod in vods:
@@ -270,16 +541,8 @@ def main():
                 for vod in vods[:3]:
                     print(f"    - {vod['title']} ({vod['created_at'][:10]})")
 
-        # Get Clips
-        print(f"  Fetching Clips...")
-        # Search for clips around the match time (expand window by a day since clips can be created later)
-        clip_start = (match_time - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
-        clip_end = (match_end + timedelta(days=2)).strftime("%Y-%m-%dT%H:%M:%SZ")
-
-        clips = get_clips(user_id, client_id, access_token,
-                         started_at=clip_start, ended_at=clip_end, first=50)
-
-        results[username]["clips"] = clips
+        # Clips (searched from an hour before the match to two days after, since clips can be created later)
+        clips = results[username]["clips"]
 
         if clips:
             print(f"  Found {len(clips)} clip(s):")
@@ -3,16 +3,47 @@ github_webhook.py - Automatic GitHub Updates
 Pushes all JSON data files to GitHub whenever they're updated
 """
 
+import asyncio
 import requests
 import json
-import base64
+import hashlib
 import os
+import time
 from datetime import datetime
 
 # GitHub Configuration
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')  # Personal Access Token
 GITHUB_REPO = "I2aMpAnT/CarnageReport.com"
 GITHUB_BRANCH = "main"
+# API base URL - override to point at a local stand-in server for testing
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+GITHUB_TIMEOUT = 30  # seconds per request
+GITHUB_MAX_ATTEMPTS = 3  # ref update retries if the branch moves mid-push
+
+# Shared session so pushes reuse pooled connections
+_session = None
+
+# Push queue - repeated pushes of the same file within the debounce window
+# collapse into one, and everything pending goes out in a single commit
+PUSH_DEBOUNCE_SECONDS = 5.0
+PUSH_MAX_RETRIES = 3
+
+_push_pending = {}   # github path -> {"local_file", "queued_at", "attempts"}
+_push_wakeup = None  # asyncio.Event signalled when something is queued
+_push_worker = None  # background worker task
+_push_inflight = None  # flush currently running, if any
+_push_loop = None    # event loop the worker runs on
+_push_metrics = {
+    "enqueued": 0,
+    "coalesced": 0,
+    "flushes": 0,
+    "files_pushed": 0,
+    "failures": 0,
+    "max_queue_depth": 0,
+    "last_latency": 0.0,
+    "max_latency": 0.0,
+    "total_latency": 0.0,
+}
 
 # JSON files to sync (local filename -> GitHub path)
 # Does NOT include matchmakingstate.json (internal bot state only)
@@ -31,6 +62,189 @@ def log_github_action(message: str):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print(f"[GITHUB] [{timestamp}] {message}")
 
+def _get_session() -> requests.Session:
+    """Return the shared, connection-pooled session for GitHub API calls"""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update({
+            "Authorization": f"token {GITHUB_TOKEN}",
+            "Accept": "application/vnd.github.v3+json"
+        })
+    return _session
+
+def _repo_url(path: str) -> str:
+    """Build a GitHub API URL for this repo"""
+    return f"{GITHUB_API_URL}/repos/{GITHUB_REPO}/{path}"
+
+def git_blob_sha(content: bytes) -> str:
+    """Compute the git blob SHA of some content (same as `git hash-object`)"""
+    header = f"blob {len(content)}\0".encode('utf-8')
+    return hashlib.sha1(header + content).hexdigest()
+
+def _list_tree(session, tree_sha: str) -> dict:
+    """List one tree level: name -> (type, sha)"""
+    response = session.get(_repo_url(f"git/trees/{tree_sha}"), timeout=GITHUB_TIMEOUT)
+    response.raise_for_status()
+    return {entry["path"]: (entry["type"], entry["sha"]) for entry in response.json().get("tree", [])}
+
+def _get_remote_blob_sha(session, root_tree: str, github_path: str, cache: dict):
+    """
+    Look up the blob SHA of a path on the branch (None if it doesn't exist).
+
+    Walks down from the root tree one directory at a time so only the
+    directories we actually publish to are fetched - the site repo is too
+    big to list recursively on every push. `cache` maps tree sha -> listing.
+    """
+    tree_sha = root_tree
+    parts = github_path.split('/')
+    for depth, name in enumerate(parts):
+        if tree_sha not in cache:
+            cache[tree_sha] = _list_tree(session, tree_sha)
+        entry = cache[tree_sha].get(name)
+        if entry is None:
+            return None
+        entry_type, entry_sha = entry
+        if depth == len(parts) - 1:
+            return entry_sha if entry_type == "blob" else None
+        if entry_type != "tree":
+            return None
+        tree_sha = entry_sha
+    return None
+
+def _publish_contents(contents: dict, commit_message: str) -> dict:
+    """
+    Commit several files to the branch in a single commit.
+
+    Blob SHAs are computed locally and compared against the branch tree, so
+    files that are already up to date are skipped without uploading them.
+    All changed files go into one tree -> commit -> ref update. If the branch
+    moved underneath us the ref update is rejected and we rebuild on the new
+    head.
+
+    Args:
+        contents: GitHub path -> file content (bytes)
+        commit_message: Git commit message
+
+    Returns:
+        dict: GitHub path -> "updated", "unchanged" or "failed"
+    """
+    session = _get_session()
+
+    for attempt in range(1, GITHUB_MAX_ATTEMPTS + 1):
+        try:
+            # Current head of the branch and its tree
+            response = session.get(_repo_url(f"git/ref/heads/{GITHUB_BRANCH}"), timeout=GITHUB_TIMEOUT)
+            response.raise_for_status()
+            head_sha = response.json()["object"]["sha"]
+
+            response = session.get(_repo_url(f"git/commits/{head_sha}"), timeout=GITHUB_TIMEOUT)
+            response.raise_for_status()
+            base_tree = response.json()["tree"]["sha"]
+
+            # Skip files whose blob already matches what's on the branch
+            tree_cache = {}
+            changed = {}
+            for github_path, content in contents.items():
+                remote_sha = _get_remote_blob_sha(session, base_tree, github_path, tree_cache)
+                if remote_sha != git_blob_sha(content):
+                    changed[github_path] = content
+
+            if not changed:
+                return {path: "unchanged" for path in contents}
+
+            tree = [
+                {"path": path, "mode": "100644", "type": "blob", "content": content.decode('utf-8')}
+                for path, content in changed.items()
+            ]
+            response = session.post(_repo_url("git/trees"),
+                                    json={"base_tree": base_tree, "tree": tree},
+                                    timeout=GITHUB_TIMEOUT)
+            response.raise_for_status()
+            new_tree = response.json()["sha"]
+
+            response = session.post(_repo_url("git/commits"),
+                                    json={"message": commit_message, "tree": new_tree, "parents": [head_sha]},
+                                    timeout=GITHUB_TIMEOUT)
+            response.raise_for_status()
+            new_commit = response.json()["sha"]
+
+            response = session.patch(_repo_url(f"git/refs/heads/{GITHUB_BRANCH}"),
+                                     json={"sha": new_commit, "force": False},
+                                     timeout=GITHUB_TIMEOUT)
+            if response.status_code in (409, 422) and attempt < GITHUB_MAX_ATTEMPTS:
+                # Someone else pushed in between - rebuild on top of the new head
+                log_github_action(f"Branch moved during push, retrying ({attempt}/{GITHUB_MAX_ATTEMPTS})")
+                continue
+            response.raise_for_status()
+
+            return {path: ("updated" if path in changed else "unchanged") for path in contents}
+
+        except Exception as e:
+            log_github_action(f"❌ Exception during GitHub push: {e}")
+            return {path: "failed" for path in contents}
+
+    return {path: "failed" for path in contents}
+
+def push_files_to_github(files: dict, commit_message: str = None) -> dict:
+    """
+    Push several local files to GitHub in one commit
+
+    Args:
+        files: Local filename -> path in the GitHub repo
+        commit_message: Git commit message (auto-generated if None)
+
+    Returns:
+        dict: Local filename -> True if up to date on GitHub, False otherwise
+    """
+    results = {local_file: False for local_file in files}
+
+    if not GITHUB_TOKEN:
+        log_github_action("⚠️ GITHUB_TOKEN not set in .env file")
+        return results
+
+    contents = {}
+    local_for_path = {}
+    for local_file, github_path in files.items():
+        if not os.path.exists(local_file):
+            log_github_action(f"⚠️ {local_file} not found")
+            continue
+        try:
+            with open(local_file, 'rb') as f:
+                content = f.read()
+            # Verify it's valid JSON
+            json.loads(content)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            log_github_action(f"⚠️ Invalid JSON in {local_file}: {e}")
+            continue
+        except OSError as e:
+            log_github_action(f"❌ Could not read {local_file}: {e}")
+            continue
+        contents[github_path] = content
+        local_for_path[github_path] = local_file
+
+    if not contents:
+        return results
+
+    # Auto-generate commit message if not provided
+    if commit_message is None:
+        names = ", ".join(local_for_path.values())
+        commit_message = f"Auto-update: {names} {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+
+    statuses = _publish_contents(contents, commit_message)
+
+    for github_path, status in statuses.items():
+        local_file = local_for_path[github_path]
+        if status == "updated":
+            log_github_action(f"✅ Pushed {local_file} to GitHub")
+        elif status == "unchanged":
+            log_github_action(f"{local_file} already up to date on GitHub")
+        else:
+            log_github_action(f"❌ Failed to push {local_file}")
+        results[local_file] = status != "failed"
+
+    return results
+
 def push_file_to_github(local_file: str, github_path: str, commit_message: str = None) -> bool:
     """
     Push a local file to GitHub repo
@@ -43,111 +257,162 @@ def push_file_to_github(local_file: str, github_path: str, commit_message: str =
     Returns:
         bool: True if successful, False otherwise
     """
-    if not GITHUB_TOKEN:
-        log_github_action("⚠️ GITHUB_TOKEN not set in .env file")
-        return False
-    
-    if not os.path.exists(local_file):
-        log_github_action(f"⚠️ {local_file} not found")
-        return False
-    
-    # GitHub API endpoint
-    api_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/{github_path}"
-    
-    # Headers
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
+    return push_files_to_github({local_file: github_path}, commit_message)[local_file]
+
+
+def _ensure_push_worker(loop):
+    """Start the push worker on this event loop if it isn't running"""
+    global _push_wakeup, _push_worker, _push_loop
+    if _push_loop is not loop or _push_worker is None or _push_worker.done():
+        _push_loop = loop
+        _push_wakeup = asyncio.Event()
+        _push_worker = loop.create_task(_push_worker_loop())
+
+async def _push_worker_loop():
+    """Wait for queued files, let the debounce window fill, then flush"""
+    while True:
+        await _push_wakeup.wait()
+        await asyncio.sleep(PUSH_DEBOUNCE_SECONDS)
+        await _run_flush()
+
+async def _run_flush():
+    """Run one flush as its own task so a shutdown can't cancel it half-way"""
+    global _push_inflight
+    if _push_inflight is None or _push_inflight.done():
+        _push_inflight = asyncio.get_running_loop().create_task(_flush_pending())
+    await asyncio.shield(_push_inflight)
+
+async def _flush_pending():
+    """Push everything currently queued as one commit (off the event loop)"""
+    if not _push_pending:
+        _push_wakeup.clear()
+        return
+
+    batch = dict(_push_pending)
+    _push_pending.clear()
+    _push_wakeup.clear()
+
+    files = {entry["local_file"]: github_path for github_path, entry in batch.items()}
+    loop = asyncio.get_running_loop()
     try:
-        # Read local file
-        with open(local_file, 'r') as f:
-            content = f.read()
-        
-        # Verify it's valid JSON
-        json.loads(content)
-        
-        # Get current file SHA (needed for updates)
-        response = requests.get(api_url, headers=headers)
-        
-        if response.status_code == 200:
-            current_sha = response.json()["sha"]
+        results = await loop.run_in_executor(None, push_files_to_github, files)
+    except Exception as e:
+        log_github_action(f"❌ Exception flushing push queue: {e}")
+        results = {local_file: False for local_file in files}
+
+    done = time.monotonic()
+    _push_metrics["flushes"] += 1
+    for github_path, entry in batch.items():
+        if results.get(entry["local_file"]):
+            latency = done - entry["queued_at"]
+            _push_metrics["files_pushed"] += 1
+            _push_metrics["last_latency"] = latency
+            _push_metrics["max_latency"] = max(_push_metrics["max_latency"], latency)
+            _push_metrics["total_latency"] += latency
+            continue
+
+        _push_metrics["failures"] += 1
+        if entry["attempts"] < PUSH_MAX_RETRIES and github_path not in _push_pending:
+            # Retry on the next flush (a newer queue entry already covers it otherwise)
+            entry["attempts"] += 1
+            _push_pending[github_path] = entry
+            _push_wakeup.set()
         else:
-            current_sha = None  # File doesn't exist yet
-        
-        # Encode content to base64
-        content_bytes = content.encode('utf-8')
-        content_base64 = base64.b64encode(content_bytes).decode('utf-8')
-        
-        # Auto-generate commit message if not provided
-        if commit_message is None:
-            commit_message = f"Auto-update: {local_file} {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        
-        # Prepare payload
-        payload = {
-            "message": commit_message,
-            "content": content_base64,
-            "branch": GITHUB_BRANCH
+            log_github_action(f"❌ Giving up on {entry['local_file']} after {entry['attempts']} attempts")
+
+def queue_file_push(local_file: str, github_path: str) -> bool:
+    """
+    Queue a file to be pushed to GitHub by the background worker
+
+    Safe to call from async command handlers - it never waits on GitHub.
+    The file is read when the queue flushes, so the latest content wins.
+    With no running event loop (scripts, threads) it pushes immediately.
+
+    Returns:
+        bool: True if queued (or pushed successfully when run synchronously)
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return push_file_to_github(local_file, github_path)
+
+    _ensure_push_worker(loop)
+
+    _push_metrics["enqueued"] += 1
+    if github_path in _push_pending:
+        _push_metrics["coalesced"] += 1
+        _push_pending[github_path]["local_file"] = local_file
+    else:
+        _push_pending[github_path] = {
+            "local_file": local_file,
+            "queued_at": time.monotonic(),
+            "attempts": 1,
         }
-        
-        # Add SHA if file exists (for updates)
-        if current_sha:
-            payload["sha"] = current_sha
-        
-        # Push to GitHub
-        response = requests.put(api_url, headers=headers, json=payload)
-        
-        if response.status_code in [200, 201]:
-            log_github_action(f"✅ Pushed {local_file} to GitHub")
-            return True
-        else:
-            log_github_action(f"❌ Failed to push {local_file}: {response.status_code}")
-            return False
-    
-    except json.JSONDecodeError as e:
-        log_github_action(f"⚠️ Invalid JSON in {local_file}: {e}")
-        return False
-    except Exception as e:
-        log_github_action(f"❌ Exception pushing {local_file}: {e}")
-        return False
+    _push_metrics["max_queue_depth"] = max(_push_metrics["max_queue_depth"], len(_push_pending))
+    _push_wakeup.set()
+    return True
+
+async def flush_pending_pushes():
+    """Push anything still queued right now - call on shutdown/cog unload"""
+    if _push_loop is not asyncio.get_running_loop():
+        return
+    if _push_worker is not None and not _push_worker.done():
+        _push_worker.cancel()
+        try:
+            await _push_worker
+        except asyncio.CancelledError:
+            pass
+    # Failed files are re-queued once per flush; give them their retries now
+    for _ in range(PUSH_MAX_RETRIES + 1):
+        await _run_flush()
+        if not _push_pending:
+            break
+
+def get_push_queue_stats() -> dict:
+    """Queue depth and push latency metrics for the background publisher"""
+    pushed = _push_metrics["files_pushed"]
+    now = time.monotonic()
+    return {
+        **_push_metrics,
+        "queue_depth": len(_push_pending),
+        "oldest_pending_age": max((now - e["queued_at"] for e in _push_pending.values()), default=0.0),
+        "avg_latency": _push_metrics["total_latency"] / pushed if pushed else 0.0,
+        "worker_running": _push_worker is not None and not _push_worker.done(),
+    }
 
 
 # Convenience functions for each file type
 def update_matchhistory_on_github():
-    """Push matchhistory.json to GitHub"""
-    return push_file_to_github("matchhistory.json", "matchhistory.json")
+    """Queue matchhistory.json to be pushed to GitHub"""
+    return queue_file_push("matchhistory.json", "matchhistory.json")
 
 def update_testmatchhistory_on_github():
-    """Push testmatchhistory.json to GitHub"""
-    return push_file_to_github("testmatchhistory.json", "testmatchhistory.json")
+    """Queue testmatchhistory.json to be pushed to GitHub"""
+    return queue_file_push("testmatchhistory.json", "testmatchhistory.json")
 
 def update_rankstats_on_github():
-    """Push rankstats.json to GitHub"""
-    return push_file_to_github("rankstats.json", "rankstats.json")
+    """Queue rankstats.json to be pushed to GitHub"""
+    return queue_file_push("rankstats.json", "rankstats.json")
 
 def update_gamestats_on_github():
-    """Push gamestats.json to GitHub"""
-    return push_file_to_github("gamestats.json", "gamestats.json")
+    """Queue gamestats.json to be pushed to GitHub"""
+    return queue_file_push("gamestats.json", "gamestats.json")
 
 def update_players_on_github():
-    """Push players.json to GitHub"""
-    return push_file_to_github("players.json", "players.json")
+    """Queue players.json to be pushed to GitHub"""
+    return queue_file_push("players.json", "players.json")
 
 def update_queue_config_on_github():
-    """Push queue_config.json to GitHub"""
-    return push_file_to_github("queue_config.json", "queue_config.json")
+    """Queue queue_config.json to be pushed to GitHub"""
+    return queue_file_push("queue_config.json", "queue_config.json")
 
 def update_xp_config_on_github():
-    """Push xp_config.json to GitHub"""
-    return push_file_to_github("xp_config.json", "xp_config.json")
+    """Queue xp_config.json to be pushed to GitHub"""
+    return queue_file_push("xp_config.json", "xp_config.json")
 
 def update_all_on_github():
-    """Push all JSON files to GitHub"""
-    results = {}
-    for local_file, github_path in JSON_FILES.items():
-        results[local_file] = push_file_to_github(local_file, github_path)
-    return results
+    """Push all JSON files to GitHub (one commit)"""
+    return push_files_to_github(JSON_FILES)
 
 
 # Legacy function for backwards compatibility
@@ -157,33 +422,9 @@ def push_to_github(file_content: str, commit_message: str = "Update match histor
         log_github_action("⚠️ GITHUB_TOKEN not set in .env file")
         return False
     
-    api_url = f"https://api.github.com/repos/{GITHUB_REPO}/contents/matchhistory.json"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-        "Accept": "application/vnd.github.v3+json"
-    }
-    
-    try:
-        response = requests.get(api_url, headers=headers)
-        current_sha = response.json()["sha"] if response.status_code == 200 else None
-        
-        content_base64 = base64.b64encode(file_content.encode('utf-8')).decode('utf-8')
-        payload = {
-            "message": commit_message,
-            "content": content_base64,
-            "branch": GITHUB_BRANCH
-        }
-        if current_sha:
-            payload["sha"] = current_sha
-        
-        response = requests.put(api_url, headers=headers, json=payload)
-        
-        if response.status_code in [200, 201]:
-            log_github_action(f"✅ Successfully pushed to GitHub: {commit_message}")
-            return True
-        else:
-            log_github_action(f"❌ GitHub push failed: {response.status_code}")
-            return False
-    except Exception as e:
-        log_github_action(f"❌ Exception during GitHub push: {e}")
-        return False
+    statuses = _publish_contents({"matchhistory.json": file_content.encode('utf-8')}, commit_message)
+    if statuses["matchhistory.json"] != "failed":
+        log_github_action(f"✅ Successfully pushed to GitHub: {commit_message}")
+        return True
+    log_github_action(f"❌ GitHub push failed: {commit_message}")
+    return False
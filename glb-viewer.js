@@ -18,6 +18,8 @@ const CONFIG = {
     followCameraHeight: 4,
     defaultSpeed: 1,
     skipSeconds: 5,
+    telemetryWindowMs: 30000,        // Full-rate telemetry is fetched in windows this long
+    telemetryHeaderPrefetch: 65536,  // First Range request for a .bin header (refetched if longer)
 
     // Movement settings
     moveSpeed: 30,
@@ -154,6 +156,9 @@ let gamepadConnected = false;
 // URL parameters
 let mapName = '';
 let telemetryFile = '';
+let telemetryBinFile = '';  // Columnar copy of telemetryFile (theater_bin.py), if available
+let telemetryLevels = [];   // Downsampled copies of telemetryBinFile ({bucket_ms, file})
+let telemetryStream = null; // Full-rate .bin being fetched window by window ({url, header, windows})
 let gameInfo = {};
 
 // Timeline dragging
@@ -203,6 +208,8 @@ async function parseUrlParams() {
                 if (game) {
                     mapName = game.map || 'Unknown';
                     telemetryFile = game.theater || '';
+                    telemetryBinFile = game.theater_bin || '';
+                    telemetryLevels = game.theater_levels || [];
                     gameInfo = {
                         map: mapName,
                         gameType: game.gametype || '',
@@ -231,6 +238,8 @@ async function parseUrlParams() {
                 if (foundGame) {
                     mapName = foundGame.map || 'Unknown';
                     telemetryFile = foundGame.theater || '';
+                    telemetryBinFile = foundGame.theater_bin || '';
+                    telemetryLevels = foundGame.theater_levels || [];
                     gameInfo = {
                         map: mapName,
                         gameType: foundGame.gametype || '',
@@ -1603,7 +1612,7 @@ async function loadMapAndTelemetry() {
         if (telemetryFile) {
             loadingText.textContent = 'Loading telemetry data...';
             loadingProgress.textContent = '0%';
-            await loadTelemetry(telemetryFile);
+            await loadTelemetry(telemetryFile, telemetryBinFile, telemetryLevels);
             loadingProgress.textContent = '30%';
         } else {
             console.warn('No telemetry file specified');
@@ -1707,7 +1716,29 @@ async function loadSpartanModel() {
     });
 }
 
-async function loadTelemetry(filename) {
+async function loadTelemetry(filename, binFilename = '', levels = []) {
+    // Prefer the columnar .bin (much smaller, no text parsing); fall back to the CSV
+    telemetryStream = null;
+    if (binFilename && levels.length) {
+        // Coarsest level first, full-rate windows streamed in during playback
+        const overview = levels.reduce((a, b) => (b.bucket_ms > a.bucket_ms ? b : a));
+        try {
+            await loadTelemetryProgressive(binFilename, overview.file);
+            return;
+        } catch (e) {
+            console.warn(`Could not load ${overview.file}, loading ${binFilename} in full:`, e);
+        }
+    }
+    if (binFilename) {
+        try {
+            const response = await fetch(`${CONFIG.telemetryPath}${binFilename}`);
+            if (!response.ok) throw new Error(response.statusText);
+            parseTelemetryBin(await response.arrayBuffer());
+            return;
+        } catch (e) {
+            console.warn(`Could not load ${binFilename}, using CSV:`, e);
+        }
+    }
     const response = await fetch(`${CONFIG.telemetryPath}${filename}`);
     if (!response.ok) throw new Error(`Failed to load telemetry: ${response.statusText}`);
     parseTelemetryCSV(await response.text());
@@ -1833,6 +1864,238 @@ function parseTelemetryCSV(csvText) {
         maxTime = Math.max(maxTime, row.gameTimeMs);
     }
 
+    finishTelemetryLoad(playerSet, minTime, maxTime);
+}
+
+// Columnar telemetry written by theater_bin.py: "CRTB", uint32 header length,
+// JSON header, then one little-endian typed array per column (4-byte aligned).
+// The downsampled level files (gameindex theater_levels) have the same layout.
+const BIN_ARRAY_TYPES = {
+    uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array,
+    int16: Int16Array, int32: Int32Array, float32: Float32Array
+};
+
+function readTelemetryBinHeader(buffer) {
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'CRTB') throw new Error('Not a theater .bin file');
+    const headerLength = new DataView(buffer).getUint32(4, true);
+    if (8 + headerLength > buffer.byteLength) return null;  // Header not fully fetched yet
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+    if (header.version !== 2) throw new Error(`Unsupported theater .bin version: ${header.version}`);
+    return header;
+}
+
+function parseTelemetryBin(buffer) {
+    const header = readTelemetryBinHeader(buffer);
+    if (!header) throw new Error('Truncated theater .bin file');
+
+    const columns = {};
+    header.columns.forEach(col => {
+        const ArrayType = BIN_ARRAY_TYPES[col.type];
+        if (!ArrayType) throw new Error(`Unknown column type: ${col.type}`);
+        columns[col.name] = { ...col, data: new ArrayType(buffer, col.offset, col.bytes / ArrayType.BYTES_PER_ELEMENT) };
+    });
+
+    telemetryData = decodeTelemetryBinRows(header, columns, header.rows);
+    const playerSet = new Set();
+    let minTime = Infinity, maxTime = 0;
+    telemetryData.forEach(row => {
+        playerSet.add(row.playerName);
+        minTime = Math.min(minTime, row.gameTimeMs);
+        maxTime = Math.max(maxTime, row.gameTimeMs);
+    });
+
+    // Level files cover the full game's time range, not just their own samples
+    if (header.game_time_ms) [minTime, maxTime] = header.game_time_ms;
+    finishTelemetryLoad(playerSet, minTime, maxTime);
+    return header;
+}
+
+// Turn `count` rows of decoded columns (each typed array starts at the first row wanted) into row objects
+function decodeTelemetryBinRows(header, columns, count) {
+    if (!columns.player) throw new Error('Missing required column: player');
+    if (!columns.GameTimeMs) throw new Error('Missing required column: GameTimeMs');
+
+    // Same fallbacks as parseTelemetryCSV - returns a reader for row i, or null
+    const getCol = (...names) => {
+        for (const name of names) {
+            const col = columns[name];
+            if (col) return col.values ? (i => col.values[col.data[i]]) : (i => col.data[i]);
+        }
+        return null;
+    };
+    const getFlag = (name) => {
+        const bit = (header.flags || []).indexOf(name);
+        if (bit >= 0 && columns.flags) return i => (columns.flags.data[i] & (1 << bit)) !== 0;
+        const read = getCol(name);
+        return read ? (i => read(i) === 'True') : (() => false);
+    };
+    const getAttr = (p, ...names) => {
+        for (const name of names) {
+            if (p[name] !== undefined) return p[name];
+        }
+        return undefined;
+    };
+
+    const x = getCol('PosX', 'X'), y = getCol('PosY', 'Y'), z = getCol('PosZ', 'Z');
+    if (!x || !y || !z) throw new Error('Missing required column: X/Y/Z');
+    const yaw = getCol('Yaw', 'FacingYaw'), pitch = getCol('Pitch', 'FacingPitch');
+    const yawDeg = getCol('YawDeg'), pitchDeg = getCol('PitchDeg');
+    const health = getCol('Health'), shield = getCol('Shield');
+    const currentWeapon = getCol('CurrentWeapon'), event = getCol('Event');
+    const kills = getCol('Kills'), deaths = getCol('Deaths'), assists = getCol('Assists');
+    const isCrouching = getFlag('IsCrouching'), isAirborne = getFlag('IsAirborne'), isDead = getFlag('IsDead');
+
+    // Per-player fields are stored once per player in the header
+    const playerInfo = header.players.map(p => ({
+        playerName: getAttr(p, 'PlayerName') || '',
+        team: getAttr(p, 'Team') || 'none',
+        emblemForeground: parseInt(getAttr(p, 'EmblemFg', 'EmblemForeground')) || 0,
+        emblemBackground: parseInt(getAttr(p, 'EmblemBg', 'EmblemBackground')) || 0,
+        primaryColor: parseInt(getAttr(p, 'ColorPrimary', 'PrimaryColor')) || 0,
+        secondaryColor: parseInt(getAttr(p, 'ColorSecondary', 'SecondaryColor')) || 0,
+        tertiaryColor: parseInt(getAttr(p, 'ColorTertiary', 'TertiaryColor')) || 0,
+        quaternaryColor: parseInt(getAttr(p, 'ColorQuaternary', 'QuaternaryColor')) || 0
+    }));
+
+    const rows = [];
+    const playerIndex = columns.player.data;
+    const times = columns.GameTimeMs.data;
+
+    for (let i = 0; i < count; i++) {
+        const gameTimeMs = times[i];
+
+        let facingYaw = 0, facingPitch = 0;
+        if (yawDeg) {
+            facingYaw = (parseFloat(yawDeg(i)) || 0) * Math.PI / 180;
+            facingPitch = (pitchDeg ? parseFloat(pitchDeg(i)) || 0 : 0) * Math.PI / 180;
+        } else if (yaw) {
+            facingYaw = parseFloat(yaw(i)) || 0;
+            facingPitch = pitch ? parseFloat(pitch(i)) || 0 : 0;
+        }
+
+        rows.push({
+            ...playerInfo[playerIndex[i]],
+            gameTimeMs: gameTimeMs,
+            x: -(parseFloat(x(i)) || 0),  // Invert X axis for correct positioning
+            y: parseFloat(y(i)) || 0,
+            z: parseFloat(z(i)) || 0,
+            facingYaw: facingYaw,
+            facingPitch: facingPitch,
+            isCrouching: isCrouching(i),
+            isAirborne: isAirborne(i),
+            isDead: isDead(i),
+            health: health ? parseFloat(health(i)) || 1 : 1,
+            shield: shield ? parseFloat(shield(i)) || 1 : 1,
+            currentWeapon: currentWeapon ? (currentWeapon(i) || 'Unknown') : 'Unknown',
+            kills: kills ? (parseInt(kills(i)) || 0) : 0,
+            deaths: deaths ? (parseInt(deaths(i)) || 0) : 0,
+            assists: assists ? (parseInt(assists(i)) || 0) : 0,
+            event: event ? event(i) : ''
+        });
+    }
+    return rows;
+}
+
+// ===== Progressive telemetry (overview level first, full rate around the playhead) =====
+
+// Fetch bytes [start, end] of a file. `buffer` is null if the server ignored the
+// Range header and sent the whole file - that comes back as `full` instead.
+async function fetchRange(url, start, end) {
+    const response = await fetch(url, { headers: { Range: `bytes=${start}-${end}` } });
+    if (!response.ok) throw new Error(`Failed to load ${url}: ${response.statusText}`);
+    const buffer = await response.arrayBuffer();
+    return response.status === 206 ? { buffer, full: null } : { buffer: null, full: buffer };
+}
+
+// Rows [first, last) of player's samples between startMs and endMs (theater_bin.window_rows)
+function telemetryWindowRows(timeIndex, player, startMs, endMs) {
+    const entry = timeIndex.players[player];
+    const chunks = entry.chunks;
+    if (!chunks.length) return [entry.start, entry.start];
+    const chunkMs = timeIndex.chunk_ms;
+    const lo = Math.min(Math.max(Math.floor(startMs / chunkMs) - entry.first_chunk, 0), chunks.length - 1);
+    const hi = Math.min(Math.max(Math.floor(endMs / chunkMs) - entry.first_chunk + 1, 0), chunks.length - 1);
+    return [chunks[lo], Math.max(chunks[lo], chunks[hi])];
+}
+
+async function loadTelemetryProgressive(binFilename, overviewFile) {
+    // Overview level: whole timeline, legend and camera fit from a few KB
+    const response = await fetch(`${CONFIG.telemetryPath}${overviewFile}`);
+    if (!response.ok) throw new Error(`Failed to load telemetry: ${response.statusText}`);
+    parseTelemetryBin(await response.arrayBuffer());
+    telemetryStream = null;
+
+    // Full-rate file: just its header (with the time index) for now
+    const url = `${CONFIG.telemetryPath}${binFilename}`;
+    try {
+        let { buffer, full } = await fetchRange(url, 0, CONFIG.telemetryHeaderPrefetch - 1);
+        if (full) {
+            // Server ignored the Range request and sent everything - use it
+            parseTelemetryBin(full);
+            return;
+        }
+        let header = readTelemetryBinHeader(buffer);
+        if (!header) {
+            const headerLength = new DataView(buffer).getUint32(4, true);
+            ({ buffer } = await fetchRange(url, 0, 8 + headerLength - 1));
+            header = readTelemetryBinHeader(buffer);
+        }
+        if (!header || !header.time_index) throw new Error('No time index in full-rate telemetry');
+        telemetryStream = { url, header, windows: new Map() };
+        ensureTelemetryWindow(currentTimeMs);
+    } catch (e) {
+        console.warn('Full-rate telemetry unavailable, playing the overview level:', e);
+    }
+}
+
+// Make sure the full-rate window at timeMs (and the next one) is loaded or on its way
+function ensureTelemetryWindow(timeMs) {
+    if (!telemetryStream) return;
+    const current = Math.floor(timeMs / CONFIG.telemetryWindowMs);
+    for (const w of [current, current + 1]) {
+        if (w >= 0 && !telemetryStream.windows.has(w)) {
+            telemetryStream.windows.set(w, loadTelemetryWindow(telemetryStream, w));
+        }
+    }
+}
+
+async function loadTelemetryWindow(stream, w) {
+    const { url, header } = stream;
+    const startMs = w * CONFIG.telemetryWindowMs;
+    const endMs = startMs + CONFIG.telemetryWindowMs - 1;
+    try {
+        const perPlayer = await Promise.all(header.players.map(async (_, p) => {
+            const [first, last] = telemetryWindowRows(header.time_index, p, startMs, endMs);
+            if (last <= first) return [];
+            // One small Range request per column for this player's row range
+            const columns = {};
+            await Promise.all(header.columns.map(async col => {
+                const ArrayType = BIN_ARRAY_TYPES[col.type];
+                const size = ArrayType.BYTES_PER_ELEMENT;
+                const { buffer } = await fetchRange(url, col.offset + first * size, col.offset + last * size - 1);
+                if (!buffer) throw new Error('Range request not honoured');
+                columns[col.name] = { ...col, data: new ArrayType(buffer) };
+            }));
+            return decodeTelemetryBinRows(header, columns, last - first);
+        }));
+        if (telemetryStream !== stream) return;  // Another game was loaded meanwhile
+
+        // Replace the overview samples in this window with the full-rate ones
+        const rows = perPlayer.flat().filter(row => row.gameTimeMs >= startMs && row.gameTimeMs <= endMs);
+        telemetryData = telemetryData
+            .filter(row => row.gameTimeMs < startMs || row.gameTimeMs > endMs)
+            .concat(rows)
+            .sort((a, b) => a.gameTimeMs - b.gameTimeMs);
+    } catch (e) {
+        console.warn(`Could not load full-rate telemetry for ${startMs}-${endMs} ms:`, e);
+        stream.windows.delete(w);
+        if (telemetryStream === stream) telemetryStream = null;  // Stay on the overview level
+    }
+}
+
+// Shared by the CSV and .bin loaders once telemetryData is filled in
+function finishTelemetryLoad(playerSet, minTime, maxTime) {
     telemetryData.sort((a, b) => a.gameTimeMs - b.gameTimeMs);
 
     players = [];
@@ -2138,6 +2401,7 @@ function loadEmblemImage(url) {
 }
 
 function updatePlayerPositions() {
+    ensureTelemetryWindow(currentTimeMs);
     const playerPositions = {};
     let startIdx = 0;
 
@@ -2603,6 +2867,9 @@ async function selectMap(selectedMapName) {
     // Update state
     mapName = selectedMapName;
     telemetryFile = ''; // Free look mode - no telemetry
+    telemetryBinFile = '';
+    telemetryLevels = [];
+    telemetryStream = null;
     gameInfo = { map: selectedMapName, gameType: 'Free Look', date: '', variant: '' };
 
     // Update UI
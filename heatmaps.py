@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+heatmaps.py - Precomputed Positional Heatmaps
+
+Usage:
+    python heatmaps.py             # add theater files that arrived since the last run
+    python heatmaps.py --rebuild   # start over from every theater file
+
+Reads the theater files listed in stats/telemetry_index.json, looks up each
+game's map (and the players' teams) in gameindex.json, and counts X/Y samples
+into a fixed grid per map - all players, per team and per player. Samples are
+~100 ms apart, so a cell's count is roughly time spent there.
+
+Output (heatmaps/):
+
+    index.json                  {"cell_size", "updated", "maps": {map: {"file", "players_file", "origin", "width", "height", "games", "samples"}}}
+    <map>.json                  {"map", "cell_size", "origin", "width", "height", "games", "samples", "sources", "all": grid, "teams": {team: grid}}
+    <map>_players.json          {"map", "cell_size", "origin", "width", "height", "sources", "players": {name: grid}}
+
+A grid is base64 of little-endian uint32 counts, width * height, row-major
+(row = Y cell, column = X cell). Cell (0, 0) starts at world (origin[0], origin[1])
+and every cell is cell_size units square. A map's grid only ever grows (by
+whole cells), so existing counts stay put and new games are just added on.
+
+"sources" lists the theater files counted into a map, saved together with
+the counts. <map>_players.json is written before <map>.json; if the two
+don't list the same sources (a run died in between) or the cell size has
+changed, the map is recounted from scratch.
+"""
+
+import argparse
+import base64
+import json
+import math
+import os
+import sys
+import tempfile
+from array import array
+from datetime import datetime
+
+import theater_bin
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Inputs
+TELEMETRY_INDEX_FILE = 'stats/telemetry_index.json'
+GAMEINDEX_FILE = 'gameindex.json'
+# Theater files are looked for here, in order (VPS, then local checkout)
+THEATER_DIRS = ['/home/carnagereport/stats/theater', 'stats']
+
+# Output
+HEATMAP_DIR = 'heatmaps'
+
+# Grid resolution in world units
+HEATMAP_CELL_SIZE = 0.5
+# Extra cells added around the data whenever a map's grid has to grow
+HEATMAP_GROW_MARGIN = 8
+
+
+def load_json(filepath, default):
+    """Load a JSON file, or return default if missing/invalid"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(filepath, data):
+    """Write a JSON file atomically"""
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".heatmap.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.chmod(tmp_path, 0o644)  # Served as a static file
+        os.replace(tmp_path, filepath)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def encode_grid(grid: array) -> str:
+    """uint32 counts -> base64 (little-endian)"""
+    if sys.byteorder != 'little':
+        grid = array('I', grid)
+        grid.byteswap()
+    return base64.b64encode(grid.tobytes()).decode('ascii')
+
+
+def decode_grid(data: str) -> array:
+    """base64 (little-endian) -> uint32 counts"""
+    grid = array('I')
+    grid.frombytes(base64.b64decode(data))
+    if sys.byteorder != 'little':
+        grid.byteswap()
+    return grid
+
+
+def get_map_files(map_name: str):
+    """(<map>.json, <map>_players.json) paths"""
+    return (os.path.join(HEATMAP_DIR, f"{map_name}.json"),
+            os.path.join(HEATMAP_DIR, f"{map_name}_players.json"))
+
+
+def normalize_team(team: str) -> str:
+    """'_game_team_red' / 'Red' -> 'Red'; '' for free-for-all"""
+    team = (team or '').strip()
+    if team.lower().startswith('_game_team_'):
+        team = team[len('_game_team_'):]
+    team = team.capitalize()
+    return '' if team in ('', 'None') else team
+
+
+class MapHeatmap:
+    """Count grids for one map: 'all', per team and per player, all the same shape"""
+
+    def __init__(self, map_name: str):
+        self.map_name = map_name
+        self.origin_cell = (0, 0)   # Cell coordinates of grid cell (0, 0)
+        self.width = 0
+        self.height = 0
+        self.games = 0
+        self.samples = 0
+        self.sources = []           # Theater files counted so far
+        self.all = array('I')
+        self.teams = {}
+        self.players = {}
+
+    @classmethod
+    def load(cls, map_name: str):
+        """Load a map's saved grids (empty heatmap if none, or if they have to be recounted)"""
+        heatmap = cls(map_name)
+        map_file, players_file = get_map_files(map_name)
+        data = load_json(map_file, None)
+        players = load_json(players_file, {})
+        if not data:
+            return heatmap
+        if data.get('cell_size') != HEATMAP_CELL_SIZE or players.get('sources') != data.get('sources'):
+            print(f"  {map_name}: saved heatmap is out of date, recounting")
+            return heatmap
+        heatmap.origin_cell = (round(data['origin'][0] / HEATMAP_CELL_SIZE),
+                               round(data['origin'][1] / HEATMAP_CELL_SIZE))
+        heatmap.width = data['width']
+        heatmap.height = data['height']
+        heatmap.games = data.get('games', 0)
+        heatmap.samples = data.get('samples', 0)
+        heatmap.sources = data.get('sources', [])
+        heatmap.all = decode_grid(data['all'])
+        heatmap.teams = {team: decode_grid(g) for team, g in data.get('teams', {}).items()}
+        heatmap.players = {name: decode_grid(g) for name, g in players.get('players', {}).items()}
+        return heatmap
+
+    def empty_grid(self) -> array:
+        return array('I', bytes(4 * self.width * self.height))
+
+    def ensure_bounds(self, min_cx: int, max_cx: int, min_cy: int, max_cy: int):
+        """Grow every grid (keeping existing counts in place) to cover the given cells"""
+        ox, oy = self.origin_cell
+        if (self.width and min_cx >= ox and max_cx < ox + self.width
+                and min_cy >= oy and max_cy < oy + self.height):
+            return
+        if self.width:
+            min_cx, min_cy = min(min_cx, ox), min(min_cy, oy)
+            max_cx, max_cy = max(max_cx, ox + self.width - 1), max(max_cy, oy + self.height - 1)
+        new_ox, new_oy = min_cx - HEATMAP_GROW_MARGIN, min_cy - HEATMAP_GROW_MARGIN
+        new_width = max_cx - new_ox + 1 + HEATMAP_GROW_MARGIN
+        new_height = max_cy - new_oy + 1 + HEATMAP_GROW_MARGIN
+
+        def regrid(grid):
+            new = array('I', bytes(4 * new_width * new_height))
+            dx, dy = ox - new_ox, oy - new_oy
+            for y in range(self.height):
+                start = (y + dy) * new_width + dx
+                new[start:start + self.width] = grid[y * self.width:(y + 1) * self.width]
+            return new
+
+        self.all = regrid(self.all)
+        self.teams = {team: regrid(g) for team, g in self.teams.items()}
+        self.players = {name: regrid(g) for name, g in self.players.items()}
+        self.origin_cell = (new_ox, new_oy)
+        self.width, self.height = new_width, new_height
+
+    def add_game(self, source: str, xs, ys, player_rows, player_names: list, player_teams: list):
+        """
+        Count one game's samples.
+
+        Args:
+            source: Theater filename (recorded in sources)
+            xs, ys: Sample positions (world units; NaN samples are skipped)
+            player_rows: Per-sample index into player_names/player_teams
+            player_names: Player name for each index
+            player_teams: Team for each index ('' = no team)
+        """
+        if NUMPY_AVAILABLE:
+            add_game_numpy(self, xs, ys, player_rows, player_names, player_teams)
+        else:
+            add_game_python(self, xs, ys, player_rows, player_names, player_teams)
+        self.games += 1
+        self.sources.append(source)
+
+    def save(self):
+        """Write <map>.json and <map>_players.json; returns this map's index.json entry"""
+        map_file, players_file = get_map_files(self.map_name)
+        shape = {
+            'map': self.map_name,
+            'cell_size': HEATMAP_CELL_SIZE,
+            'origin': [self.origin_cell[0] * HEATMAP_CELL_SIZE, self.origin_cell[1] * HEATMAP_CELL_SIZE],
+            'width': self.width,
+            'height': self.height,
+            'sources': self.sources
+        }
+        # <map>.json last - its sources are what counts as done
+        save_json(players_file, dict(shape, players={name: encode_grid(g) for name, g in sorted(self.players.items())}))
+        save_json(map_file, dict(shape, games=self.games, samples=self.samples, all=encode_grid(self.all),
+                                 teams={team: encode_grid(g) for team, g in sorted(self.teams.items())}))
+        return {
+            'file': os.path.basename(map_file),
+            'players_file': os.path.basename(players_file),
+            'origin': shape['origin'],
+            'width': self.width,
+            'height': self.height,
+            'games': self.games,
+            'samples': self.samples
+        }
+
+
+def add_game_numpy(heatmap, xs, ys, player_rows, player_names, player_teams):
+    """MapHeatmap.add_game with one bincount per layer instead of a Python loop"""
+    xs = np.frombuffer(xs, dtype=np.float32) if isinstance(xs, array) else np.asarray(xs, dtype=np.float64)
+    ys = np.frombuffer(ys, dtype=np.float32) if isinstance(ys, array) else np.asarray(ys, dtype=np.float64)
+    players = np.asarray(player_rows, dtype=np.int64)
+    valid = np.isfinite(xs) & np.isfinite(ys)
+    if not valid.any():
+        return
+    cx = np.floor(xs[valid] / HEATMAP_CELL_SIZE).astype(np.int64)
+    cy = np.floor(ys[valid] / HEATMAP_CELL_SIZE).astype(np.int64)
+    players = players[valid]
+
+    heatmap.ensure_bounds(int(cx.min()), int(cx.max()), int(cy.min()), int(cy.max()))
+    cell_count = heatmap.width * heatmap.height
+    cells = (cy - heatmap.origin_cell[1]) * heatmap.width + (cx - heatmap.origin_cell[0])
+
+    # (player, cell) counts in one pass - every other layer is a sum of player rows
+    per_player = np.bincount(players * cell_count + cells,
+                             minlength=len(player_names) * cell_count).reshape(len(player_names), cell_count)
+
+    def add(grid, counts):
+        view = np.frombuffer(grid, dtype=np.uint32)
+        view += counts.astype(np.uint32)
+
+    add(heatmap.all, per_player.sum(axis=0))
+    for team in set(t for t in player_teams if t):
+        rows = [i for i, t in enumerate(player_teams) if t == team]
+        add(heatmap.teams.setdefault(team, heatmap.empty_grid()), per_player[rows].sum(axis=0))
+    for i, name in enumerate(player_names):
+        if per_player[i].any():
+            add(heatmap.players.setdefault(name, heatmap.empty_grid()), per_player[i])
+    heatmap.samples += int(valid.sum())
+
+
+def add_game_python(heatmap, xs, ys, player_rows, player_names, player_teams):
+    """MapHeatmap.add_game without numpy"""
+    samples = []
+    for x, y, p in zip(xs, ys, player_rows):
+        if math.isfinite(x) and math.isfinite(y):
+            samples.append((math.floor(x / HEATMAP_CELL_SIZE), math.floor(y / HEATMAP_CELL_SIZE), p))
+    if not samples:
+        return
+    heatmap.ensure_bounds(min(s[0] for s in samples), max(s[0] for s in samples),
+                          min(s[1] for s in samples), max(s[1] for s in samples))
+    ox, oy = heatmap.origin_cell
+    for cx, cy, p in samples:
+        cell = (cy - oy) * heatmap.width + (cx - ox)
+        heatmap.all[cell] += 1
+        if player_teams[p]:
+            heatmap.teams.setdefault(player_teams[p], heatmap.empty_grid())[cell] += 1
+        heatmap.players.setdefault(player_names[p], heatmap.empty_grid())[cell] += 1
+    heatmap.samples += len(samples)
+
+
+def find_theater_file(filename: str):
+    """Full path of a theater CSV, or None if it isn't on this machine"""
+    for directory in THEATER_DIRS:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_theater_games() -> dict:
+    """gameindex.json by theater file: {filename: {"map", "teams": {player: team}}}"""
+    games = {}
+    for game in load_json(GAMEINDEX_FILE, {}).values():
+        if game.get('theater') and game.get('map'):
+            games[game['theater']] = {
+                'map': game['map'],
+                'teams': {name: normalize_team(p.get('team', '')) for name, p in game.get('players', {}).items()}
+            }
+    return games
+
+
+def read_game_samples(csv_path: str, teams: dict):
+    """
+    Positions from a theater file (via its columnar .bin, converted if needed).
+
+    Returns:
+        (xs, ys, player_rows, player_names, player_teams) or None if unreadable
+    """
+    bin_file = theater_bin.convert_if_stale(csv_path)
+    if not bin_file:
+        return None
+    header, columns = theater_bin.read_columnar_file(os.path.join(os.path.dirname(csv_path), bin_file))
+    xs = columns.get('PosX', columns.get('X'))
+    ys = columns.get('PosY', columns.get('Y'))
+    if xs is None or ys is None:
+        print(f"  Warning: {os.path.basename(csv_path)} has no X/Y columns")
+        return None
+
+    # The .bin stores a player entry per (name, team, emblem...) - merge them by name
+    player_names = []
+    name_index = {}
+    entry_to_player = []
+    for p in header['players']:
+        name = p.get('PlayerName', '')
+        if name not in name_index:
+            name_index[name] = len(player_names)
+            player_names.append(name)
+        entry_to_player.append(name_index[name])
+    player_teams = [''] * len(player_names)
+    for p in header['players']:
+        name = p.get('PlayerName', '')
+        # Site teams (gameindex) first, the theater file's own Team otherwise
+        player_teams[name_index[name]] = teams.get(name) or normalize_team(p.get('Team', ''))
+    player_rows = [entry_to_player[i] for i in columns['player']]
+    return xs, ys, player_rows, player_names, player_teams
+
+
+def update_heatmaps(rebuild: bool = False) -> int:
+    """
+    Add new theater files to the heatmaps.
+
+    Returns:
+        Number of theater files added
+    """
+    index = {} if rebuild else load_json(os.path.join(HEATMAP_DIR, 'index.json'), {})
+    index_maps = index.get('maps', {}) if index.get('cell_size') == HEATMAP_CELL_SIZE else {}
+
+    theater_files = load_json(TELEMETRY_INDEX_FILE, [])
+    games = load_theater_games()
+    files_by_map = {}
+    for filename in theater_files:
+        game = games.get(filename)
+        if game:  # Not in gameindex yet - map unknown, try again next run
+            files_by_map.setdefault(game['map'], []).append(filename)
+    print(f"Found {len(theater_files)} theater files on {len(files_by_map)} maps")
+
+    added = 0
+    for map_name, files in sorted(files_by_map.items()):
+        heatmap = MapHeatmap(map_name) if rebuild else MapHeatmap.load(map_name)
+        counted = set(heatmap.sources)
+        new_files = 0
+        for filename in files:
+            if filename in counted:
+                continue
+            csv_path = find_theater_file(filename)
+            if not csv_path:
+                print(f"  Warning: {filename} not found")
+                continue
+            samples = read_game_samples(csv_path, games[filename]['teams'])
+            if samples is None:
+                continue
+            heatmap.add_game(filename, *samples)
+            new_files += 1
+        if not new_files:
+            continue
+        index_maps[map_name] = heatmap.save()
+        added += new_files
+        print(f"  {map_name}: +{new_files} games ({heatmap.games} total), {heatmap.samples} samples, "
+              f"{heatmap.width}x{heatmap.height} grid, {len(heatmap.players)} players")
+
+    save_json(os.path.join(HEATMAP_DIR, 'index.json'),
+              {'cell_size': HEATMAP_CELL_SIZE, 'updated': datetime.now().isoformat(), 'maps': index_maps})
+
+    print(f"Added {added} theater files to heatmaps")
+    return added
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build per-map/team/player position heatmaps from theater files")
+    parser.add_argument("--rebuild", action="store_true", help="Recount every theater file from scratch")
+    args = parser.parse_args()
+    update_heatmaps(rebuild=args.rebuild)
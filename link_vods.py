@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+link_vods.py - Link Twitch VODs to every game in the playlist matches files
+
+Usage:
+    python link_vods.py
+
+populate_stats.py also runs it after each stats update (when the Twitch
+credentials are set) and publishes vod_links.json with the other JSON files;
+the match pages' Twitch tab reads it instead of looking up VODs themselves.
+
+Reads every playlist's matches file (from playlists.json), works out which
+players in each game stream (twitch_name in players.json, or ranks.json),
+fetches each of those streamers' VOD list once, and writes vod_links.json:
+
+    {
+        "games": {
+            "<source_file>": [
+                {"player": "name", "twitch_name": "login", "vod_id": "123",
+                 "offset": 3723, "url": "https://www.twitch.tv/videos/123?t=1h2m3s"}
+            ]
+        },
+        "streamers": {
+            "<login>": {"fetched_at": "...", "vods": [{"id", "url", "title", "created_at", "duration"}]}
+        },
+        "updated": "..."
+    }
+
+Each streamer's VODs are kept in a sorted interval index, so every game is
+matched with a binary search instead of scanning all VODs. Games already in
+vod_links.json are only looked at again when one of their streamers has a
+new (or longer) VOD.
+
+Requires TWITCH_CLIENT_ID and TWITCH_CLIENT_SECRET (see fetch_twitch_vods.py).
+"""
+
+import os
+import sys
+import json
+import asyncio
+import bisect
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pytz
+
+import alias_index
+from fetch_twitch_vods import TwitchClient, parse_duration_seconds, get_vod_timestamp_url
+
+# Inputs
+PLAYLISTS_FILE = 'playlists.json'
+PLAYERS_FILE = '/home/carnagereport/bot/players.json'
+RANKS_FILE = 'ranks.json'
+
+# Output
+VOD_LINKS_FILE = 'vod_links.json'
+
+# Game timestamps in the matches files are in this timezone
+GAME_TIMEZONE = 'US/Eastern'
+
+# Videos requested per streamer (Helix maximum)
+VODS_PER_STREAMER = 100
+
+TWITCH_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def load_json(filepath, default):
+    """Load a JSON file, or return default if missing/invalid"""
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_vod_links(data):
+    """Write vod_links.json atomically"""
+    directory = os.path.dirname(os.path.abspath(VOD_LINKS_FILE))
+    fd, tmp_path = tempfile.mkstemp(prefix=".vod_links.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, VOD_LINKS_FILE)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def parse_game_time(ts):
+    """Parse a matches-file timestamp (local GAME_TIMEZONE) into naive UTC, or None"""
+    if not ts:
+        return None
+    formats = [
+        '%m/%d/%Y %I:%M %p',   # 12/5/2025 1:45 AM
+        '%m/%d/%Y %H:%M',      # 11/28/2025 20:03
+        '%m/%d/%Y %I:%M%p',    # 12/5/2025 1:45AM
+        '%Y-%m-%d %H:%M:%S',   # 2025-12-09 19:05:00
+        '%Y-%m-%d %H:%M',      # 2025-12-09 19:05
+    ]
+    for fmt in formats:
+        try:
+            local = datetime.strptime(ts, fmt)
+        except ValueError:
+            continue
+        utc = pytz.timezone(GAME_TIMEZONE).localize(local).astimezone(pytz.UTC)
+        return utc.replace(tzinfo=None)
+    return None
+
+
+def parse_game_duration(duration):
+    """Game duration ("18:14" or "1:02:03") in seconds"""
+    try:
+        seconds = 0
+        for part in str(duration).split(':'):
+            seconds = seconds * 60 + int(part)
+        return seconds
+    except ValueError:
+        return 0
+
+
+def load_games():
+    """
+    All games from the playlist matches files.
+
+    Returns:
+        List of {"source_file", "start", "end" (naive UTC), "players": [names]}
+    """
+    playlists = load_json(PLAYLISTS_FILE, {}).get('playlists', [])
+    games = []
+    for playlist in playlists:
+        matches_file = playlist.get('matches_file')
+        if not matches_file:
+            continue
+        for match in load_json(matches_file, {}).get('matches', []):
+            source_file = match.get('source_file')
+            start = parse_game_time(match.get('timestamp'))
+            if not source_file or start is None:
+                continue
+            players = [p.get('name') for p in match.get('player_stats', []) if p.get('name')]
+            if not players:
+                players = match.get('red_team', []) + match.get('blue_team', [])
+            games.append({
+                "source_file": source_file,
+                "start": start,
+                "end": start + timedelta(seconds=parse_game_duration(match.get('duration', 0))),
+                "players": players
+            })
+    return games
+
+
+def build_streamer_lookup():
+    """Map lowercased in-game names to Twitch logins"""
+    players = load_json(PLAYERS_FILE, {})
+    ranks = load_json(RANKS_FILE, {})
+
+    twitch_by_user = {}
+    for user_id, data in ranks.items():
+        if data.get('twitch_name'):
+            twitch_by_user[user_id] = data['twitch_name']
+    for user_id, data in players.items():
+        if data.get('twitch_name'):
+            twitch_by_user[user_id] = data['twitch_name']
+
+    # Maintained by the bot; only rebuilt if players.json changed behind its back
+    profiles = alias_index.load_alias_index(PLAYERS_FILE, players)["profiles"]
+    lookup = {name: twitch_by_user[user_id].lower()
+              for name, user_id in profiles.items() if user_id in twitch_by_user}
+    # Names shown on the site (ranks.json discord_name) too
+    for user_id, data in ranks.items():
+        name = str(data.get('discord_name') or '').lower()
+        if name and user_id in twitch_by_user:
+            lookup.setdefault(name, twitch_by_user[user_id].lower())
+    return lookup
+
+
+def vod_window(vod):
+    """(start, end) of a VOD as naive UTC datetimes"""
+    start = datetime.strptime(vod["created_at"], TWITCH_TIME_FORMAT)
+    return start, start + timedelta(seconds=parse_duration_seconds(vod.get("duration", "0s")))
+
+
+class VodIndex:
+    """A streamer's VODs sorted by start time. A streamer is only live once at
+    a time, so the VOD covering a moment is the last one starting before it."""
+
+    def __init__(self, vods):
+        windows = []
+        for vod in vods:
+            try:
+                start, end = vod_window(vod)
+            except (KeyError, ValueError):
+                continue
+            windows.append((start, end, vod))
+        windows.sort(key=lambda w: w[0])
+        self.starts = [w[0] for w in windows]
+        self.windows = windows
+
+    def find(self, game_start, game_end):
+        """VOD overlapping [game_start, game_end], or None"""
+        i = bisect.bisect_right(self.starts, game_end) - 1
+        # Normally only the last VOD starting before the game ends can cover it;
+        # check one earlier too in case two archives overlap
+        for j in (i, i - 1):
+            if j >= 0 and self.windows[j][1] >= game_start:
+                return self.windows[j][2]
+        return None
+
+
+def merge_vods(old_vods, new_vods):
+    """
+    Merge a fresh VOD list into the stored one.
+
+    Returns:
+        (merged list, list of VODs that are new or got longer)
+    """
+    merged = {v["id"]: v for v in old_vods}
+    changed = []
+    for vod in new_vods:
+        previous = merged.get(vod["id"])
+        if previous is None or previous.get("duration") != vod.get("duration"):
+            changed.append(vod)
+        merged[vod["id"]] = {
+            "id": vod["id"],
+            "url": vod.get("url", f"https://www.twitch.tv/videos/{vod['id']}"),
+            "title": vod.get("title", ""),
+            "created_at": vod["created_at"],
+            "duration": vod.get("duration", "0s")
+        }
+    return sorted(merged.values(), key=lambda v: v["created_at"]), changed
+
+
+async def fetch_streamer_vods(client, logins):
+    """
+    Fetch every streamer's VOD list concurrently: {login: [vods] or None on failure}
+
+    These are the streamers in new games, whose latest VOD may have started or
+    grown since the cached list was taken - so the VOD cache is bypassed.
+    """
+    user_ids = await client.get_user_ids(logins)
+    found = [login for login in logins if user_ids.get(login)]
+    results = await asyncio.gather(*[
+        client.get_vods(user_ids[login], first=VODS_PER_STREAMER, use_cache=False) for login in found
+    ])
+    client.save_vod_cache()
+    vods = {login: None for login in logins}
+    vods.update(zip(found, results))
+    return vods
+
+
+def link_vods(client):
+    """
+    Update vod_links.json with VODs for new games (and older games a
+    streamer has new VODs for).
+
+    Returns:
+        Number of games with at least one VOD link
+    """
+    state = load_json(VOD_LINKS_FILE, {})
+    state.setdefault("games", {})
+    state.setdefault("streamers", {})
+
+    games = load_games()
+    lookup = build_streamer_lookup()
+
+    # Streamers in each game
+    game_streamers = {}
+    for game in games:
+        streamers = {}
+        for name in game["players"]:
+            login = lookup.get(name.lower())
+            if login:
+                streamers[login] = name
+        game_streamers[game["source_file"]] = streamers
+
+    new_games = [g for g in games if g["source_file"] not in state["games"]]
+    logins = sorted({login for g in new_games for login in game_streamers[g["source_file"]]})
+    print(f"Found {len(games)} games ({len(new_games)} new), {len(logins)} streamers to check")
+
+    # One VOD list request per streamer
+    fetched = asyncio.run(fetch_streamer_vods(client, logins)) if logins else {}
+
+    now = datetime.now(timezone.utc).strftime(TWITCH_TIME_FORMAT)
+    changed_windows = {}
+    failed = set()
+    for login, vods in fetched.items():
+        if vods is None:
+            failed.add(login)
+            continue
+        stored = state["streamers"].get(login, {})
+        merged, changed = merge_vods(stored.get("vods", []), vods)
+        state["streamers"][login] = {"fetched_at": now, "vods": merged}
+        if changed:
+            changed_windows[login] = [vod_window(v) for v in changed]
+
+    # Games to (re)link: new ones, plus old ones that overlap a new or longer VOD
+    to_link = list(new_games)
+    for game in games:
+        if game["source_file"] not in state["games"]:
+            continue
+        for login in game_streamers[game["source_file"]]:
+            if any(start <= game["end"] and end >= game["start"]
+                   for start, end in changed_windows.get(login, [])):
+                to_link.append(game)
+                break
+
+    indexes = {login: VodIndex(data.get("vods", [])) for login, data in state["streamers"].items()}
+    written = 0
+    for game in to_link:
+        if failed & set(game_streamers[game["source_file"]]):
+            # Leave it out so the next run tries again
+            continue
+        links = []
+        for login, name in sorted(game_streamers[game["source_file"]].items()):
+            index = indexes.get(login)
+            vod = index.find(game["start"], game["end"]) if index else None
+            if vod:
+                links.append({
+                    "player": name,
+                    "twitch_name": login,
+                    "vod_id": vod["id"],
+                    "offset": max(0, int((game["start"] - vod_window(vod)[0]).total_seconds())),
+                    "url": get_vod_timestamp_url(vod, game["start"])
+                })
+        state["games"][game["source_file"]] = links
+        written += 1
+
+    state["updated"] = now
+    save_vod_links(state)
+
+    linked = sum(1 for links in state["games"].values() if links)
+    skipped = len(to_link) - written
+    print(f"Linked {written} games - {linked} games have VODs"
+          + (f" ({skipped} left for the next run, streamer fetch failed)" if skipped else ""))
+    return linked
+
+
+def main():
+    client_id = os.environ.get("TWITCH_CLIENT_ID")
+    client_secret = os.environ.get("TWITCH_CLIENT_SECRET")
+    if not client_id or not client_secret:
+        print("ERROR: Missing Twitch API credentials (TWITCH_CLIENT_ID / TWITCH_CLIENT_SECRET)")
+        sys.exit(1)
+
+    link_vods(TwitchClient(client_id, client_secret))
+
+
+if __name__ == "__main__":
+    main()
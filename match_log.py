@@ -0,0 +1,120 @@
+"""
+match_log.py - Append-only Match History Log
+Game and series results are appended as one JSON line each to a .jsonl log
+next to the history file (matchhistory.json -> matchhistory.jsonl), so logging
+a game costs a single line write no matter how long the history is. With the
+SQLite backend enabled (stats_db.py) each entry is also stored in its match_log table.
+
+The JSON snapshot the website reads is rebuilt from the log by compact_history(),
+which only replays lines added since the last compaction (tracked by the
+snapshot's "log_offset") and swaps the new snapshot in atomically.
+"""
+
+import json
+import os
+import tempfile
+
+import stats_db
+
+
+def get_log_file(history_file: str) -> str:
+    """Get the .jsonl log path for a history snapshot file"""
+    base, _ = os.path.splitext(history_file)
+    return f"{base}.jsonl"
+
+def append_event(history_file: str, section: str, entry: dict, counter: str = None):
+    """
+    Append one entry to a history file's log.
+
+    Args:
+        history_file: Snapshot file the entry belongs to (e.g. matchhistory.json)
+        section: List in the snapshot the entry goes in ("matches" or "games")
+        entry: The match/game entry
+        counter: Snapshot counter to increment for this entry (optional)
+    """
+    record = {"section": section, "entry": entry}
+    if counter:
+        record["counter"] = counter
+
+    line = json.dumps(record, separators=(',', ':')) + "\n"
+    with open(get_log_file(history_file), 'a', encoding='utf-8') as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+    if stats_db.is_enabled():
+        try:
+            stats_db.record_match_event(history_file, section, entry, counter)
+        except Exception as e:
+            # The log line is already safe on disk - the DB copy is best effort
+            print(f"Could not record {section} entry in {stats_db.STATS_DB_PATH}: {e}")
+
+def load_snapshot(history_file: str) -> dict:
+    """Load the compacted JSON snapshot (empty history if missing/corrupt)"""
+    if os.path.exists(history_file):
+        try:
+            with open(history_file, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+            if isinstance(history, dict):
+                return history
+        except (OSError, ValueError):
+            pass
+    return {"matches": []}
+
+def compact_history(history_file: str) -> int:
+    """
+    Fold log lines added since the last compaction into the JSON snapshot.
+
+    The log is never truncated; the snapshot records how far into it has been
+    applied, so running this again (or after a crash) never double-counts.
+    A trailing partial line is left for the next compaction.
+
+    Returns:
+        int: Number of log entries applied (0 if the snapshot was up to date)
+    """
+    log_file = get_log_file(history_file)
+    if not os.path.exists(log_file):
+        return 0
+
+    history = load_snapshot(history_file)
+    offset = history.get("log_offset", 0)
+    if os.path.getsize(log_file) < offset:
+        # Log was replaced by a fresh one - start from its beginning
+        offset = 0
+
+    applied = 0
+    with open(log_file, 'rb') as f:
+        f.seek(offset)
+        for raw_line in f:
+            if not raw_line.endswith(b"\n"):
+                break  # Partial write - pick it up next time
+            offset += len(raw_line)
+            try:
+                record = json.loads(raw_line)
+            except ValueError:
+                continue
+            history.setdefault(record["section"], []).append(record["entry"])
+            counter = record.get("counter")
+            if counter:
+                history[counter] = history.get(counter, 0) + 1
+            applied += 1
+
+    if applied == 0 and history.get("log_offset") == offset:
+        return 0
+
+    history["log_offset"] = offset
+
+    # Write to a temp file in the same directory, then swap it in
+    directory = os.path.dirname(os.path.abspath(history_file))
+    fd, tmp_path = tempfile.mkstemp(prefix=".history.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(history, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, history_file)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+    return applied
@@ -9,11 +9,18 @@ Supports multiple playlists based on active matches from the Discord bot:
 
 import pandas as pd
 import json
+import hashlib
 import os
 import requests
 import subprocess
+import tempfile
+import threading
+import time
 import pytz
 from datetime import datetime
+import alias_index
+import stats_db
+import theater_bin
 
 # File paths - VPS stats directories (the only source for game files)
 STATS_PUBLIC_DIR = '/home/carnagereport/stats/public'
@@ -27,12 +34,16 @@ CUSTOMGAMES_FILE = 'customgames.json'
 XP_CONFIG_FILE = 'xp_config.json'
 PLAYERS_FILE = '/home/carnagereport/bot/players.json'
 EMBLEMS_FILE = 'emblems.json'
+EMBLEM_INDEX_FILE = 'emblem_index.json'  # Last-seen emblem per player, persisted between runs
 ACTIVE_MATCHES_FILE = 'active_matches.json'
 RANKHISTORY_FILE = 'rankhistory.json'
 MANUAL_PLAYLISTS_FILE = 'manual_playlists.json'
 PROCESSED_STATE_FILE = 'processed_state.json'
 SERIES_FILE = 'series.json'
 GAMEINDEX_FILE = 'gameindex.json'
+CHANGES_FILE = 'changes.json'  # Per-run delta feed for the bot and website
+VOD_LINKS_FILE = 'vod_links.json'  # Twitch VOD per game and streamer (link_vods.py)
+CHANGES_FEED_LIMIT = 100  # Number of runs kept in the feed before older entries are dropped
 
 # Bot match history files (on VPS at /home/carnagereport/bot/)
 BOT_DIR = '/home/carnagereport/bot'
@@ -49,6 +60,7 @@ STATS_BASE_URL = 'https://carnagereport.com/stats'
 # Discord webhook for triggering bot rank refresh
 DISCORD_REFRESH_WEBHOOK = 'https://discord.com/api/webhooks/1445741545318780958/Vp-tbL32JhMu36j7qxG704GbWcgrJE9-JIdhUrpMMfAx3fpsGv82Sxi5F3r0lepor4fq'
 DISCORD_TRIGGER_CHANNEL_ID = 1427929973125156924
+DISCORD_MESSAGE_LIMIT = 2000  # Longer triggers fall back to a full refresh
 
 # Default playlist name for 4v4 games (fallback)
 PLAYLIST_NAME = 'MLG 4v4'
@@ -204,6 +216,25 @@ def get_base_gametype(game_type_field):
     }
     return mapping.get(gt, game_type_field)
 
+def write_json_file(filepath, data):
+    """
+    Write data to a JSON file, skipping the write if the file already holds
+    identical content (so unchanged outputs keep their mtime).
+
+    Returns:
+        bool: True if the file content changed
+    """
+    content = json.dumps(data, indent=2)
+    try:
+        with open(filepath, 'r') as f:
+            if f.read() == content:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    with open(filepath, 'w') as f:
+        f.write(content)
+    return True
+
 def get_playlist_files(playlist_name):
     """Get the matches, stats, and embeds filenames for a playlist."""
     return {
@@ -224,8 +255,7 @@ def load_playlist_matches(playlist_name):
 def save_playlist_matches(playlist_name, matches_data):
     """Save matches for a playlist."""
     files = get_playlist_files(playlist_name)
-    with open(files['matches'], 'w') as f:
-        json.dump(matches_data, f, indent=2)
+    write_json_file(files['matches'], matches_data)
 
 def load_playlist_stats(playlist_name):
     """Load existing stats for a playlist."""
@@ -239,8 +269,7 @@ def load_playlist_stats(playlist_name):
 def save_playlist_stats(playlist_name, stats_data):
     """Save stats for a playlist."""
     files = get_playlist_files(playlist_name)
-    with open(files['stats'], 'w') as f:
-        json.dump(stats_data, f, indent=2)
+    write_json_file(files['stats'], stats_data)
 
 def load_custom_games():
     """Load existing custom games."""
@@ -252,14 +281,12 @@ def load_custom_games():
 
 def save_custom_games(data):
     """Save custom games."""
-    with open(CUSTOMGAMES_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    write_json_file(CUSTOMGAMES_FILE, data)
 
 def save_playlist_embeds(playlist_name, embeds_data):
     """Save embeds JSON for a playlist (for Discord embeds)."""
     files = get_playlist_files(playlist_name)
-    with open(files['embeds'], 'w') as f:
-        json.dump(embeds_data, f, indent=2)
+    write_json_file(files['embeds'], embeds_data)
 
 def build_game_entry_for_embed(game, get_display_name_func, ingame_to_discord_id):
     """
@@ -417,6 +444,8 @@ def generate_game_index():
         game_num = i + 1  # Website game number (1-indexed)
         source = game.get('source_file', '')
         theater_file = source.replace('.xlsx', '_theater.csv') if source else None
+        theater_bin_file = None
+        theater_levels = []
         # Only check file existence if stats dir exists (on VPS)
         if theater_file and can_check_files:
             theater_path = os.path.join(STATS_THEATER_DIR, theater_file)
@@ -424,6 +453,11 @@ def generate_game_index():
                 theater_file = None  # File doesn't exist
             else:
                 theater_count += 1
+                # Columnar binary copy for the viewer (only rebuilt when the CSV changes)
+                theater_bin_file = theater_bin.convert_if_stale(theater_path)
+                if theater_bin_file:
+                    theater_levels = [{'bucket_ms': ms, 'file': os.path.basename(theater_bin.get_level_path(theater_path, ms))}
+                                      for ms in theater_bin.LOD_LEVELS]
         elif theater_file:
             theater_count += 1  # Assume exists for local dev
 
@@ -444,6 +478,8 @@ def generate_game_index():
         index[str(game_num)] = {
             'map': game.get('map'),
             'theater': theater_file,
+            'theater_bin': theater_bin_file,
+            'theater_levels': theater_levels,
             'gametype': game.get('gametype', ''),
             'timestamp': game.get('timestamp', ''),
             'red_score': game.get('red_score', 0),
@@ -456,8 +492,7 @@ def generate_game_index():
         print(f"  {theater_count} games indexed (theater file check skipped - not on VPS)")
 
     # Save index
-    with open(GAMEINDEX_FILE, 'w') as f:
-        json.dump(index, f, indent=2)
+    write_json_file(GAMEINDEX_FILE, index)
 
     return len(index)
 
@@ -585,6 +620,13 @@ def load_xp_config():
 
 def load_rankstats():
     """Load existing rankstats.json."""
+    if stats_db.is_enabled():
+        try:
+            data = stats_db.load_rankstats()
+            if data:
+                return data
+        except Exception as e:
+            print(f"WARNING: could not read rankstats from {stats_db.STATS_DB_PATH}: {e}")
     try:
         with open(RANKSTATS_FILE, 'r') as f:
             return json.load(f)
@@ -593,6 +635,15 @@ def load_rankstats():
 
 def load_players():
     """Load players.json which contains MAC addresses and stats_profile mappings."""
+    if stats_db.is_enabled():
+        try:
+            data = stats_db.load_players()
+            if data:
+                print(f"Successfully loaded players from {stats_db.STATS_DB_PATH}")
+                print(f"  Found {len(data)} players")
+                return data
+        except Exception as e:
+            print(f"WARNING: could not read players from {stats_db.STATS_DB_PATH}: {e}")
     try:
         with open(PLAYERS_FILE, 'r') as f:
             data = json.load(f)
@@ -622,6 +673,103 @@ def load_rankhistory():
     except:
         return {}
 
+def load_emblem_index():
+    """
+    Load emblem_index.json - the most recent emblem seen for each player.
+
+    Format:
+    {
+        "discord_id": {
+            "timestamp": "11/28/2025 20:03",   # Start Time of the game it came from
+            "emblem_url": "https://carnagereport.com/emblems/...",
+            "player_name": "in-game name",
+            "source_file": "game.xlsx"
+        }
+    }
+    """
+    try:
+        with open(EMBLEM_INDEX_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return {}
+
+def save_emblem_index(emblem_index):
+    """Save the emblem index to file"""
+    write_json_file(EMBLEM_INDEX_FILE, emblem_index)
+
+def make_temp_id(player_name):
+    """
+    Stand-in ID for a player that could not be resolved to a Discord ID.
+    Derived from the name with a fixed hash (Python's hash() changes every
+    run), so the same player gets the same ID in every run.
+    """
+    digest = hashlib.sha256(player_name.encode('utf-8')).hexdigest()
+    return str(int(digest, 16) % 10**18)
+
+def prune_emblem_index(emblem_index, player_to_id):
+    """
+    Drop entries for IDs no player maps to any more. An entry whose player
+    name now resolves to another ID (a stand-in ID for a player who has since
+    been linked to their Discord account) is moved to that ID, unless it
+    already has an emblem from a game at least as recent.
+
+    Returns:
+        set of discord IDs that were given a moved entry, number of entries removed
+    """
+    current_ids = set(player_to_id.values())
+    stale = [user_id for user_id in emblem_index if user_id not in current_ids]
+    moved = set()
+    for user_id in stale:
+        entry = emblem_index.pop(user_id)
+        new_id = player_to_id.get(entry.get('player_name', ''))
+        if not new_id:
+            continue
+        current = emblem_index.get(new_id)
+        if (current and parse_game_timestamp(current.get('timestamp', ''))
+                >= parse_game_timestamp(entry.get('timestamp', ''))):
+            continue
+        emblem_index[new_id] = entry
+        moved.add(new_id)
+    return moved, len(stale) - len(moved)
+
+def update_emblem_index(emblem_index, games, player_to_id):
+    """
+    Fold the emblems from the given games into the index.
+
+    A player's entry is only replaced by an emblem from a game that started at
+    the same time or later, so games can be fed in any order and history never
+    has to be rescanned - an incremental run passes just its new games.
+    Emblems are in detailed_stats (from Game Statistics sheet), not players.
+
+    Returns:
+        set of discord IDs whose entry changed
+    """
+    updated = set()
+    for game in games:
+        timestamp = game['details'].get('Start Time', '')
+        game_time = parse_game_timestamp(timestamp)
+        for stat in game.get('detailed_stats', []):
+            emblem_url = stat.get('emblem_url')
+            if not emblem_url:
+                continue
+            player_name = stat.get('player', '')
+            user_id = player_to_id.get(player_name)
+            if not user_id:
+                continue
+            current = emblem_index.get(user_id)
+            if current and parse_game_timestamp(current.get('timestamp', '')) > game_time:
+                continue
+            entry = {
+                'timestamp': timestamp,
+                'emblem_url': emblem_url,
+                'player_name': player_name,
+                'source_file': game.get('source_file', '')
+            }
+            if current != entry:
+                emblem_index[user_id] = entry
+                updated.add(user_id)
+    return updated
+
 def load_active_matches():
     """
     Load active and completed matches from per-playlist match history files.
@@ -694,12 +842,10 @@ def load_processed_state():
 
 def save_processed_state(state):
     """Save processed state to file"""
-    with open(PROCESSED_STATE_FILE, 'w') as f:
-        json.dump(state, f, indent=2)
+    write_json_file(PROCESSED_STATE_FILE, state)
 
 def get_manual_playlists_hash(manual_playlists):
     """Get a hash of manual_playlists to detect changes"""
-    import hashlib
     content = json.dumps(manual_playlists, sort_keys=True)
     return hashlib.md5(content.encode()).hexdigest()
 
@@ -738,6 +884,165 @@ def check_for_changes(stats_files, manual_playlists, processed_state):
     return needs_full_rebuild, new_files, changed_playlists
 
 
+def load_changes_feed():
+    """
+    Load changes.json - the per-run delta feed for downstream consumers.
+
+    Format:
+    {
+        "latest_sequence": 12,
+        "changes": [
+            {"sequence": 11, ...},
+            {"sequence": 12, ...}   # newest last
+        ]
+    }
+
+    Consumers remember the last sequence they applied. If the next sequence they
+    need has already dropped out of the feed, they fall back to a full reload.
+    """
+    try:
+        with open(CHANGES_FILE, 'r') as f:
+            feed = json.load(f)
+        if isinstance(feed, dict) and 'changes' in feed:
+            return feed
+    except:
+        pass
+    return {"latest_sequence": 0, "changes": []}
+
+def save_changes_feed(feed):
+    """Save the changes feed, keeping only the most recent CHANGES_FEED_LIMIT runs."""
+    feed['changes'] = feed.get('changes', [])[-CHANGES_FEED_LIMIT:]
+    write_json_file(CHANGES_FILE, feed)
+
+def load_previous_outputs():
+    """
+    Load the outputs of the previous run (ranks, emblems, series) before they are
+    overwritten, so the changes feed can be computed against them.
+    """
+    previous = {}
+    for key, filename, default in [('ranks', RANKS_FILE, {}),
+                                   ('emblems', EMBLEMS_FILE, {}),
+                                   ('series', SERIES_FILE, [])]:
+        try:
+            with open(filename, 'r') as f:
+                previous[key] = json.load(f)
+        except:
+            previous[key] = default
+    return previous
+
+def get_series_key(series):
+    """Stable key for a series - the source file of its first game.
+    series_id is a per-playlist counter and can shift between runs."""
+    games = series.get('games', [])
+    return games[0].get('source_file', '') if games else series.get('series_id', '')
+
+def build_changes_entry(sequence, previous, previous_games, all_games, ranks_data, emblems, all_series, full_rebuild=False):
+    """
+    Build one changes feed entry describing what this run changed.
+
+    Args:
+        sequence: Monotonically increasing run number
+        previous: Outputs of the previous run (from load_previous_outputs)
+        previous_games: Game filenames processed by the previous run
+        all_games: All parsed games from this run
+        ranks_data: ranks.json data written by this run
+        emblems: emblems.json data written by this run
+        all_series: series.json data written by this run
+        full_rebuild: True if this run recalculated everything from scratch
+
+    Returns:
+        dict with new_matches, rank_changes, new_series and emblems_updated
+    """
+    # New match ids (game source files not seen by the previous run)
+    new_matches = []
+    for game in all_games:
+        source_file = game.get('source_file', '')
+        if source_file and source_file not in previous_games:
+            new_matches.append({
+                'source_file': source_file,
+                'playlist': game.get('playlist'),
+                'timestamp': game.get('details', {}).get('Start Time', '')
+            })
+
+    # Players whose rank or XP changed
+    old_ranks = previous.get('ranks', {})
+    rank_changes = {}
+    for user_id, data in ranks_data.items():
+        old = old_ranks.get(user_id, {})
+        if (old.get('rank') != data.get('rank') or
+                old.get('highest_rank') != data.get('highest_rank') or
+                old.get('xp') != data.get('xp')):
+            rank_changes[user_id] = {
+                'discord_name': data.get('discord_name', ''),
+                'old_rank': old.get('rank'),
+                'new_rank': data.get('rank', 1),
+                'old_highest_rank': old.get('highest_rank'),
+                'new_highest_rank': data.get('highest_rank', 1),
+                'old_xp': old.get('xp'),
+                'new_xp': data.get('xp', 0)
+            }
+
+    # New series
+    old_series_keys = {get_series_key(s) for s in previous.get('series', [])}
+    new_series = []
+    for series in all_series:
+        series_key = get_series_key(series)
+        if series_key not in old_series_keys:
+            new_series.append({
+                'series_id': series.get('series_id'),
+                'playlist': series.get('playlist'),
+                'first_game': series_key,
+                'games': len(series.get('games', []))
+            })
+
+    # Updated emblems
+    old_emblems = previous.get('emblems', {})
+    emblems_updated = sorted(
+        user_id for user_id, data in emblems.items()
+        if old_emblems.get(user_id, {}).get('emblem_url') != data.get('emblem_url')
+    )
+
+    return {
+        'sequence': sequence,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'full_rebuild': full_rebuild,
+        'new_matches': new_matches,
+        'rank_changes': rank_changes,
+        'new_series': new_series,
+        'emblems_updated': emblems_updated
+    }
+
+def build_refresh_trigger(changes_entry, discord_ids):
+    """
+    Build the Discord trigger message for the bot's rank refresh.
+
+    Carries the run's sequence and the players whose highest rank changed:
+        !refresh_ranks_trigger seq=12 changes=<discord_id>:<old>:<new>,...
+    A full rebuild (or a manifest too long for one message) asks for a full sync:
+        !refresh_ranks_trigger seq=12 full
+
+    Only players in discord_ids (the players.json keys) are listed - stand-in
+    IDs from make_temp_id look like Discord IDs but have no account behind them.
+    """
+    sequence = changes_entry['sequence']
+    if changes_entry.get('full_rebuild'):
+        return f"!refresh_ranks_trigger seq={sequence} full"
+
+    changes = []
+    for user_id, change in changes_entry.get('rank_changes', {}).items():
+        if user_id not in discord_ids:
+            continue  # Unresolved player (stand-in ID)
+        old_highest = change.get('old_highest_rank')
+        new_highest = change.get('new_highest_rank', 1)
+        if old_highest == new_highest:
+            continue
+        changes.append(f"{user_id}:{old_highest or 0}:{new_highest}")
+
+    message = f"!refresh_ranks_trigger seq={sequence} changes={','.join(changes)}"
+    if len(message) > DISCORD_MESSAGE_LIMIT:
+        return f"!refresh_ranks_trigger seq={sequence} full"
+    return message
+
 def load_player_state_from_processed(processed_state):
     """
     Load saved player XP/rank state from processed_state.json.
@@ -1258,28 +1563,14 @@ def build_profile_lookup(players):
     Uses stats_profile field from players.json (populated by the bot from identity XLSX files).
     The bot parses identity files to get MAC -> profile_name, then stores stats_profile
     for each user based on their mac_addresses.
-    Also includes aliases from the /linkalias command.
-    """
-    profile_to_user = {}
-
-    for user_id, data in players.items():
-        # Primary: use stats_profile (in-game name from identity files)
-        stats_profile = data.get('stats_profile', '')
-        if stats_profile:
-            profile_to_user[stats_profile.lower()] = user_id
+    Also includes display names and aliases from the /linkalias command.
 
-        # Also include display_name as alias
-        display_name = data.get('display_name', '')
-        if display_name:
-            profile_to_user[display_name.lower()] = user_id
-
-        # Include aliases from /linkalias command
-        aliases = data.get('aliases', [])
-        for alias in aliases:
-            if alias:
-                profile_to_user[alias.lower()] = user_id
-
-    return profile_to_user
+    The map is kept in alias_index.json next to players.json (maintained by the bot
+    on link/unlink) and is only rebuilt here if players.json changed without it.
+    """
+    if os.path.exists(PLAYERS_FILE):
+        return alias_index.load_alias_index(PLAYERS_FILE, players)["profiles"]
+    return alias_index.build_alias_index(players)["profiles"]
 
 
 def resolve_player_to_discord(player_name, identity_name_to_mac, mac_to_discord, profile_lookup, rankstats):
@@ -1649,6 +1940,99 @@ def find_player_by_name(rankstats, name, profile_lookup=None):
 
     return None
 
+def get_uncommitted_files(files, branch='main'):
+    """
+    Files whose content on disk differs from the tip of `branch` (including
+    files not in it yet). Compares blob hashes, so files left uncommitted by
+    an earlier failed or interrupted run are picked up again.
+    """
+    files = [f for f in files if os.path.exists(f)]
+    if not files:
+        return []
+    disk_shas = subprocess.run(['git', 'hash-object', '--', *files], capture_output=True,
+                               text=True, check=True).stdout.split()
+    tree = subprocess.run(['git', 'ls-tree', '-z', f'refs/heads/{branch}', '--', *files], capture_output=True,
+                          text=True, check=True).stdout.split('\0')
+    committed = {}
+    for line in filter(None, tree):
+        info, path = line.split('\t', 1)
+        committed[path] = info.split()[2]
+    return [f for f, sha in zip(files, disk_shas) if committed.get(f) != sha]
+
+def git_commit_files(files, message, branch='main'):
+    """
+    Build a single commit on `branch` containing only `files`.
+
+    Uses git plumbing against a temporary index seeded from the branch tip, so
+    nothing has to be checked out or staged and unrelated paths are untouched.
+    The branch ref is moved with a compare-and-swap on the old tip.
+
+    Args:
+        files: Paths (relative to the repository root) whose current content to commit
+        message: Commit message
+        branch: Branch to commit onto
+
+    Returns:
+        The new commit SHA, or None if the files already match the branch tip
+    """
+    def git(*args, stdin=None, env=None):
+        result = subprocess.run(['git'] + list(args), input=stdin, env=env,
+                                capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+
+    parent = git('rev-parse', '--verify', f'refs/heads/{branch}')
+    blob_shas = git('hash-object', '-w', '--', *files).splitlines()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index_env = dict(os.environ, GIT_INDEX_FILE=os.path.join(tmp_dir, 'index'))
+        git('read-tree', parent, env=index_env)
+        index_info = ''.join(f"100644 {sha}\t{path}\n" for sha, path in zip(blob_shas, files))
+        git('update-index', '--index-info', stdin=index_info, env=index_env)
+        tree = git('write-tree', env=index_env)
+
+    if tree == git('rev-parse', f'{parent}^{{tree}}'):
+        return None
+
+    commit = git('commit-tree', tree, '-p', parent, '-m', message)
+    git('update-ref', f'refs/heads/{branch}', commit, parent)
+
+    # If the branch is checked out, sync the real index for these paths so
+    # `git status` stays clean
+    head = subprocess.run(['git', 'symbolic-ref', '-q', 'HEAD'], capture_output=True, text=True)
+    if head.stdout.strip() == f'refs/heads/{branch}':
+        git('reset', '-q', '--', *files)
+
+    return commit
+
+
+def push_in_background(branch='main', max_retries=4):
+    """
+    Push `branch` to origin on a background thread with exponential backoff.
+
+    The thread is non-daemon, so the process waits for the push to finish
+    before exiting, but the caller is not blocked.
+    """
+    def push():
+        for attempt in range(max_retries):
+            try:
+                # Force push - this script is authoritative for stats
+                subprocess.run(['git', 'push', 'origin', branch, '--force'],
+                               check=True, timeout=60, capture_output=True)
+                print("  Pushed to GitHub successfully!")
+                return
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                if attempt < max_retries - 1:
+                    wait_time = 2 ** (attempt + 1)  # 2, 4, 8 seconds
+                    print(f"  Push failed, retrying in {wait_time}s...")
+                    time.sleep(wait_time)
+                else:
+                    print(f"  Error: Failed to push after {max_retries} attempts: {e}")
+
+    thread = threading.Thread(target=push, name='git-push')
+    thread.start()
+    return thread
+
+
 def main():
     # Check for debug mode via environment variable
     debug_mode = os.environ.get('POPSTATS_DEBUG', '').lower() in ('1', 'true', 'yes')
@@ -1744,6 +2128,10 @@ def main():
         for f, change in list(changed_playlists.items())[:3]:
             print(f"    - {f}: {change['old']} -> {change['new']}")
 
+    # Snapshot the previous run's outputs for the changes feed (before they get overwritten)
+    previous_outputs = load_previous_outputs()
+    previous_games = set(processed_state.get("games", {}).keys())
+
     # Determine processing mode
     incremental_mode = not needs_full_rebuild and len(new_files) > 0
     saved_player_state = load_player_state_from_processed(processed_state) if incremental_mode else {}
@@ -1893,9 +2281,12 @@ def main():
     all_player_names = set()
     player_to_id = {}  # {player_name: discord_id}
 
-    # In incremental mode, restore previous player name -> ID mappings
+    # In incremental mode, restore previous player name -> ID mappings.
+    # Only real Discord IDs (players.json) - unresolved players get another
+    # chance to resolve, in case they have been linked since the last run.
     if incremental_mode:
-        saved_name_to_id = processed_state.get("player_name_to_id", {})
+        saved_name_to_id = {name: user_id for name, user_id in processed_state.get("player_name_to_id", {}).items()
+                            if user_id in players}
         if saved_name_to_id:
             player_to_id.update(saved_name_to_id)
             print(f"  Restored {len(saved_name_to_id)} player name->ID mappings from saved state")
@@ -1940,7 +2331,7 @@ def main():
                 # Only set alias if player has explicitly set one (not from in-game names)
             else:
                 # Create new entry for unmatched player
-                temp_id = str(abs(hash(player_name)) % 10**18)
+                temp_id = make_temp_id(player_name)
                 player_to_id[player_name] = temp_id
                 rankstats[temp_id] = {
                     'xp': 0,
@@ -1989,6 +2380,21 @@ def main():
                     player_playlist_losses[player_name] = {}
                     player_playlist_games[player_name] = {}
 
+    # Record the latest emblem for each player as games are ingested.
+    # Incremental runs only fold in the new games; a full rebuild (or a first run
+    # without an index yet) starts over from every game.
+    if incremental_mode and os.path.exists(EMBLEM_INDEX_FILE):
+        emblem_index = load_emblem_index()
+        emblem_games = [g for g in all_games if g.get('source_file') in new_files]
+    else:
+        emblem_index = {}
+        emblem_games = all_games
+    emblems_touched = update_emblem_index(emblem_index, emblem_games, player_to_id)
+    emblems_moved, emblems_pruned = prune_emblem_index(emblem_index, player_to_id)
+    emblems_touched |= emblems_moved
+    print(f"  Emblem index: {len(emblems_touched)} player emblems updated from {len(emblem_games)} games, "
+          f"{len(emblems_moved)} moved to linked accounts, {emblems_pruned} stale entries removed")
+
     # Track current rank per player per playlist
     player_playlist_rank = {}  # {player_name: {playlist: rank}}
     # Track highest rank achieved per player per playlist
@@ -2427,8 +2833,7 @@ def main():
                 'games': pl_data.get('games', 0)
             }
 
-    with open(RANKS_FILE, 'w') as f:
-        json.dump(ranks_data, f, indent=2)
+    write_json_file(RANKS_FILE, ranks_data)
     print(f"  Saved {RANKS_FILE} ({len(ranks_data)} players)")
 
     # Save per-playlist matches and stats
@@ -2776,31 +3181,23 @@ def main():
     if game_count:
         print(f"    Saved {GAMEINDEX_FILE} ({game_count} games indexed)")
 
-    # Extract and save player emblems (most recent emblem for each player)
+    # Save player emblems (most recent emblem for each player) from the emblem index
     # Maps discord_id to their emblem_url
-    # Emblems are in detailed_stats (from Game Statistics sheet), not players
-    emblems = {}
-    for game in all_games:
-        for stat in game.get('detailed_stats', []):
-            emblem_url = stat.get('emblem_url')
-            if emblem_url:
-                player_name = stat.get('player', '')
-                # Get discord ID for this player
-                user_id = player_to_id.get(player_name)
-                if user_id:
-                    emblems[user_id] = {
-                        'emblem_url': emblem_url,
-                        'player_name': player_name,
-                        'discord_name': rankstats.get(user_id, {}).get('discord_name', player_name)
-                    }
+    save_emblem_index(emblem_index)
+    emblems = {
+        user_id: {
+            'emblem_url': entry['emblem_url'],
+            'player_name': entry['player_name'],
+            'discord_name': rankstats.get(user_id, {}).get('discord_name', entry['player_name'])
+        }
+        for user_id, entry in emblem_index.items()
+    }
 
-    with open(EMBLEMS_FILE, 'w') as f:
-        json.dump(emblems, f, indent=2)
+    write_json_file(EMBLEMS_FILE, emblems)
     print(f"  Saved {EMBLEMS_FILE} ({len(emblems)} player emblems)")
 
     # Save rank history (for pre-game rank lookups on the website)
-    with open(RANKHISTORY_FILE, 'w') as f:
-        json.dump(rankhistory, f, indent=2)
+    write_json_file(RANKHISTORY_FILE, rankhistory)
     print(f"  Saved {RANKHISTORY_FILE} ({len(rankhistory)} players with history)")
 
     # Detect and save series data (for manual playlists)
@@ -2821,8 +3218,7 @@ def main():
             all_series.append(series)
 
     # Save series data as flat list for bot (bot handles winner determination)
-    with open(SERIES_FILE, 'w') as f:
-        json.dump(all_series, f, indent=2)
+    write_json_file(SERIES_FILE, all_series)
     print(f"  Saved {SERIES_FILE} ({len(all_series)} series)")
 
     # Print summary
@@ -2915,13 +3311,35 @@ def main():
     save_processed_state(new_processed_state)
     print(f"  Saved {PROCESSED_STATE_FILE} ({len(new_player_state)} players, {len(all_games)} games)")
 
+    # Mirror this run into the SQLite backend (ranks.json etc. above stay the website's source)
+    if stats_db.is_enabled():
+        try:
+            stats_db.save_pipeline_run(ranks_data, rankhistory, all_games)
+            print(f"  Saved run to {stats_db.STATS_DB_PATH}")
+        except Exception as e:
+            print(f"  Warning: could not save run to {stats_db.STATS_DB_PATH}: {e}")
+
+    # Append this run to the changes feed (delta for the bot and website)
+    changes_feed = load_changes_feed()
+    sequence = changes_feed.get('latest_sequence', 0) + 1
+    changes_entry = build_changes_entry(
+        sequence, previous_outputs, previous_games, all_games,
+        ranks_data, emblems, all_series, full_rebuild=not incremental_mode
+    )
+    changes_feed['latest_sequence'] = sequence
+    changes_feed['changes'].append(changes_entry)
+    save_changes_feed(changes_feed)
+    print(f"  Saved {CHANGES_FILE} (sequence {sequence}: {len(changes_entry['new_matches'])} new matches, "
+          f"{len(changes_entry['rank_changes'])} rank changes, {len(changes_entry['new_series'])} new series, "
+          f"{len(changes_entry['emblems_updated'])} emblems updated)")
+
     print("\nDone!")
 
     # Trigger Discord bot to refresh ranks
     print("\nTriggering Discord bot rank refresh...")
     try:
         response = requests.post(DISCORD_REFRESH_WEBHOOK, json={
-            "content": "!refresh_ranks_trigger"
+            "content": build_refresh_trigger(changes_entry, set(players))
         })
         if response.status_code == 204:
             print("  Discord webhook sent successfully!")
@@ -2930,12 +3348,23 @@ def main():
     except Exception as e:
         print(f"  Error sending webhook: {e}")
 
+    # Link streamers' Twitch VODs to the games (vod_links.json, read by the match pages)
+    if os.environ.get("TWITCH_CLIENT_ID") and os.environ.get("TWITCH_CLIENT_SECRET"):
+        print("\nLinking Twitch VODs...")
+        try:
+            import link_vods
+            from fetch_twitch_vods import TwitchClient
+            link_vods.link_vods(TwitchClient(os.environ["TWITCH_CLIENT_ID"], os.environ["TWITCH_CLIENT_SECRET"]))
+        except Exception as e:
+            print(f"  Warning: could not link VODs: {e}")
+
     # Push JSON files to GitHub for website updates
     print("\nPushing stats to GitHub...")
     # Base files
     json_files = [
-        RANKS_FILE, RANKHISTORY_FILE, EMBLEMS_FILE,
-        PROCESSED_STATE_FILE, PLAYLISTS_FILE, SERIES_FILE
+        RANKS_FILE, RANKHISTORY_FILE, EMBLEMS_FILE, EMBLEM_INDEX_FILE,
+        PROCESSED_STATE_FILE, PLAYLISTS_FILE, SERIES_FILE, CHANGES_FILE,
+        VOD_LINKS_FILE
     ]
     # Add per-playlist files that were saved
     json_files.extend(playlist_files_saved)
@@ -2945,41 +3374,22 @@ def main():
         script_dir = os.path.dirname(os.path.abspath(__file__))
         os.chdir(script_dir)
 
-        # Ensure we're on main branch before committing
-        subprocess.run(['git', 'checkout', 'main'], check=True)
-
-        # Add all JSON files (filter out any that don't exist)
-        existing_files = [f for f in json_files if os.path.exists(f)]
-        subprocess.run(['git', 'add'] + existing_files, check=True)
+        # Only commit files that differ from what is committed
+        changed_files = get_uncommitted_files(json_files)
 
-        # Check if there are changes to commit
-        result = subprocess.run(['git', 'diff', '--cached', '--quiet'], capture_output=True)
-        if result.returncode == 0:
+        if not changed_files:
             print("  No changes to commit")
         else:
-            # Commit and push
             commit_msg = f"Update stats ({len(all_games)} games, {len(rankstats)} players)"
-            subprocess.run(['git', 'commit', '-m', commit_msg], check=True)
-            print(f"  Committed: {commit_msg}")
-
-            # Push to origin main with force (this script is authoritative for stats)
-            max_retries = 4
-            for attempt in range(max_retries):
-                try:
-                    subprocess.run(['git', 'push', 'origin', 'main', '--force'], check=True, timeout=60)
-                    print("  Pushed to GitHub successfully!")
-                    break
-                except subprocess.CalledProcessError as e:
-                    if attempt < max_retries - 1:
-                        wait_time = 2 ** (attempt + 1)  # 2, 4, 8, 16 seconds
-                        print(f"  Push failed, retrying in {wait_time}s...")
-                        import time
-                        time.sleep(wait_time)
-                    else:
-                        print(f"  Error: Failed to push after {max_retries} attempts")
-                        raise
+            commit = git_commit_files(changed_files, commit_msg)
+            if commit is None:
+                print("  No changes to commit")
+            else:
+                print(f"  Committed {len(changed_files)} changed file(s): {commit_msg}")
+                # Push off the critical path - ranks are already on disk and announced
+                push_in_background()
     except subprocess.CalledProcessError as e:
-        print(f"  Git error: {e}")
+        print(f"  Git error: {e} {e.stderr or ''}")
     except Exception as e:
         print(f"  Error pushing to GitHub: {e}")
 
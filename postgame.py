@@ -4,6 +4,7 @@ import discord
 from discord.ui import View, Button
 from typing import List
 from datetime import datetime
+import match_log
 
 # Will be imported from bot.py
 POSTGAME_LOBBY_ID = None
@@ -17,9 +18,7 @@ def log_action(message: str):
     queue_log(message)
 
 def save_match_history(series, winner: str):
-    """Save match results to matchhistory.json with comprehensive data"""
-    import json
-    import os
+    """Save match results to the matchhistory.json log with comprehensive data"""
     from datetime import datetime
     
     timestamp = datetime.now().isoformat()
@@ -83,39 +82,37 @@ def save_match_history(series, winner: str):
     # Save to different files based on match type
     if match_type == "RANKED":
         history_file = 'matchhistory.json'
+        counter = "total_ranked_matches"
     else:
         history_file = 'testmatchhistory.json'
+        counter = "total_test_matches"
     
-    # Load existing history or create new
-    if os.path.exists(history_file):
-        try:
-            with open(history_file, 'r') as f:
-                history = json.load(f)
-        except:
-            if match_type == "RANKED":
-                history = {"total_ranked_matches": 0, "matches": []}
-            else:
-                history = {"total_test_matches": 0, "matches": []}
-    else:
-        if match_type == "RANKED":
-            history = {"total_ranked_matches": 0, "matches": []}
-        else:
-            history = {"total_test_matches": 0, "matches": []}
-    
-    # Update counters
-    if match_type == "RANKED":
-        history["total_ranked_matches"] = history.get("total_ranked_matches", 0) + 1
-    else:
-        history["total_test_matches"] = history.get("total_test_matches", 0) + 1
+    # Append to the match log (one line) - the snapshot is rebuilt by compact_history
+    match_log.append_event(history_file, "matches", match_entry, counter=counter)
     
-    # Add new match
-    history["matches"].append(match_entry)
+    log_action(f"Saved {match_type} match {series.series_number} to {history_file}")
+
+def publish_match_history(test_mode: bool):
+    """Compact the match log into the history snapshot and push it to GitHub"""
+    history_file = 'testmatchhistory.json' if test_mode else 'matchhistory.json'
+    try:
+        applied = match_log.compact_history(history_file)
+    except Exception as e:
+        log_action(f"Failed to compact {history_file}: {e}")
+        return
     
-    # Save back to file
-    with open(history_file, 'w') as f:
-        json.dump(history, f, indent=2)
+    if not applied:
+        return
     
-    log_action(f"Saved {match_type} match {series.series_number} to {history_file}")
+    # Push to GitHub - correct file based on test mode
+    try:
+        import github_webhook
+        if test_mode:
+            github_webhook.update_testmatchhistory_on_github()
+        else:
+            github_webhook.update_matchhistory_on_github()
+    except Exception as e:
+        log_action(f"Failed to push to GitHub: {e}")
 
 def load_gamestats():
     """Load gamestats.json if available"""
@@ -185,9 +182,7 @@ async def record_game_winner(series_view, winner: str, channel: discord.TextChan
         await end_series(series_view, channel)
 
 def log_individual_game(series, game_number: int, winner: str):
-    """Log individual game result to JSON immediately"""
-    import json
-    import os
+    """Log individual game result to the match log immediately"""
     from datetime import datetime
     
     timestamp = datetime.now().isoformat()
@@ -196,10 +191,8 @@ def log_individual_game(series, game_number: int, winner: str):
     # Determine file
     if series.test_mode:
         history_file = 'testmatchhistory.json'
-        key = 'total_test_matches'
     else:
         history_file = 'matchhistory.json'
-        key = 'total_ranked_matches'
     
     game_entry = {
         "type": "GAME",
@@ -216,36 +209,10 @@ def log_individual_game(series, game_number: int, winner: str):
         }
     }
     
-    # Load or create file
-    if os.path.exists(history_file):
-        try:
-            with open(history_file, 'r') as f:
-                history = json.load(f)
-        except:
-            history = {key: 0, "games": [], "matches": []}
-    else:
-        history = {key: 0, "games": [], "matches": []}
-    
-    # Ensure games array exists
-    if "games" not in history:
-        history["games"] = []
-    
-    history["games"].append(game_entry)
+    # Append to the match log - one line per game, pushed with the series at the end
+    match_log.append_event(history_file, "games", game_entry)
     
-    with open(history_file, 'w') as f:
-        json.dump(history, f, indent=2)
-    
-    log_action(f"Logged individual game {game_number} to {history_file}")
-    
-    # Push to GitHub
-    try:
-        import github_webhook
-        if series.test_mode:
-            github_webhook.update_testmatchhistory_on_github()
-        else:
-            github_webhook.update_matchhistory_on_github()
-    except Exception as e:
-        log_action(f"Failed to push game to GitHub: {e}")
+    log_action(f"Logged individual game {game_number} to {match_log.get_log_file(history_file)}")
 
 async def end_series(series_view, channel: discord.TextChannel):
     """End series, record stats, cleanup VCs, move players"""
@@ -270,15 +237,8 @@ async def end_series(series_view, channel: discord.TextChannel):
     log_action(f"Series ended - Winner: {winner} ({red_wins}-{blue_wins}) in Match #{series.match_number}")
     save_match_history(series, winner)
     
-    # Push to GitHub - correct file based on test mode
-    try:
-        import github_webhook
-        if series.test_mode:
-            github_webhook.update_testmatchhistory_on_github()
-        else:
-            github_webhook.update_matchhistory_on_github()
-    except Exception as e:
-        log_action(f"Failed to push to GitHub: {e}")
+    # Rebuild the history snapshot from the log and push it
+    publish_match_history(series.test_mode)
     
     # Record series results if not test mode
     if not series.test_mode and winner != 'TIE':
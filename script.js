@@ -155,6 +155,39 @@ function findVodForTime(vods, gameStartTime, gameDurationMinutes = 15) {
     return null;
 }
 
+// VOD links worked out by link_vods.py: {games: {source_file: [links]}, streamers: {login: {vods}}}
+let vodLinksCache = null;
+
+async function fetchVodLinks() {
+    if (vodLinksCache !== null) {
+        return vodLinksCache;
+    }
+
+    try {
+        const response = await fetch('vod_links.json');
+        if (response.ok) {
+            vodLinksCache = await response.json();
+            return vodLinksCache;
+        }
+    } catch (e) {
+        console.log('Failed to load vod_links.json');
+    }
+
+    vodLinksCache = {};
+    return vodLinksCache;
+}
+
+// Same shape as findVodForTime, from a game's vod_links.json entries
+function findLinkedVod(vodLinks, gameLinks, twitchName) {
+    const login = twitchName.toLowerCase();
+    const link = gameLinks.find(l => l.twitch_name === login);
+    if (!link) return null;
+
+    const stored = (vodLinks.streamers?.[login]?.vods || []).find(v => v.id === link.vod_id);
+    // Add small buffer for lobby time (20 seconds), as findVodForTime does
+    return { vod: { id: link.vod_id, title: stored?.title || '' }, timestampSeconds: link.offset + 20 };
+}
+
 // Format seconds to Twitch timestamp format (1h23m45s)
 function formatTwitchTimestamp(seconds) {
     const h = Math.floor(seconds / 3600);
@@ -3294,7 +3327,7 @@ function renderTwitch(game) {
     // Async load VODs after render
     if (linkedPlayers.length > 0) {
         setTimeout(() => {
-            loadTwitchVodsForGame(gameId, linkedPlayers, gameStartTime, durationMinutes);
+            loadTwitchVodsForGame(gameId, linkedPlayers, gameStartTime, durationMinutes, game.source_file);
         }, 100);
     }
 
@@ -3302,18 +3335,27 @@ function renderTwitch(game) {
 }
 
 // Async function to load and display VOD and clip embeds
-async function loadTwitchVodsForGame(gameId, linkedPlayers, gameStartTime, durationMinutes) {
+async function loadTwitchVodsForGame(gameId, linkedPlayers, gameStartTime, durationMinutes, sourceFile = null) {
     const container = document.getElementById(`${gameId}-vods`);
     if (!container) return;
 
+    // Games already linked by link_vods.py don't need a VOD list per streamer
+    const vodLinks = await fetchVodLinks();
+    const gameLinks = sourceFile ? vodLinks.games?.[sourceFile] : undefined;
+
     const vodEmbeds = [];
     const clipEmbeds = [];
 
     for (const { player, twitchData } of linkedPlayers) {
         try {
-            // Fetch VODs
-            const vods = await fetchTwitchVods(twitchData.name);
-            const result = findVodForTime(vods, gameStartTime, durationMinutes);
+            let result;
+            if (gameLinks) {
+                result = findLinkedVod(vodLinks, gameLinks, twitchData.name);
+            } else {
+                // Fetch VODs
+                const vods = await fetchTwitchVods(twitchData.name);
+                result = findVodForTime(vods, gameStartTime, durationMinutes);
+            }
 
             if (result) {
                 const { vod, timestampSeconds } = result;
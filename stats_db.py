@@ -0,0 +1,313 @@
+"""
+stats_db.py - Optional SQLite Storage Backend
+Shared SQLite database (WAL mode) for the bot and populate_stats.py. When
+STATS_DB_PATH is set, players, rankstats, per-playlist ranks, games, rank
+history and match log entries are read and written here in transactions, so
+the bot and the pipeline can use it at the same time without clobbering each
+other's files. The JSON files are still written as exports for the website.
+
+Leave STATS_DB_PATH unset to keep using the JSON files only.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import alias_index
+
+# Database location - the backend is off unless this is set
+STATS_DB_PATH = os.getenv("STATS_DB_PATH", "")
+
+# Seconds to wait for the other process's write lock before giving up
+STATS_DB_TIMEOUT = 30.0
+
+# Keys per "IN (...)" query (SQLite's default variable limit is 999)
+STATS_DB_IN_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias_key TEXT PRIMARY KEY,
+    alias TEXT NOT NULL,
+    user_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_aliases_user ON aliases(user_id);
+CREATE TABLE IF NOT EXISTS macs (
+    mac TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_macs_user ON macs(user_id);
+CREATE TABLE IF NOT EXISTS rankstats (
+    user_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS playlist_ranks (
+    user_id TEXT NOT NULL,
+    playlist TEXT NOT NULL,
+    rank INTEGER,
+    highest_rank INTEGER,
+    xp INTEGER,
+    wins INTEGER,
+    losses INTEGER,
+    games INTEGER,
+    PRIMARY KEY (user_id, playlist)
+);
+CREATE INDEX IF NOT EXISTS idx_playlist_ranks_xp ON playlist_ranks(playlist, xp DESC);
+CREATE TABLE IF NOT EXISTS games (
+    source_file TEXT PRIMARY KEY,
+    playlist TEXT,
+    timestamp TEXT,
+    map TEXT,
+    gametype TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_games_playlist ON games(playlist, timestamp);
+CREATE TABLE IF NOT EXISTS rank_history (
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    timestamp TEXT,
+    source_file TEXT,
+    map TEXT,
+    gametype TEXT,
+    playlist TEXT,
+    xp_change INTEGER,
+    xp_total INTEGER,
+    rank_before INTEGER,
+    rank_after INTEGER,
+    result TEXT,
+    PRIMARY KEY (user_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_rank_history_source ON rank_history(source_file);
+CREATE TABLE IF NOT EXISTS match_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    history_file TEXT NOT NULL,
+    section TEXT NOT NULL,
+    counter TEXT,
+    entry TEXT NOT NULL,
+    logged_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_match_log_file ON match_log(history_file, section);
+"""
+
+_connection = None
+_lock = threading.RLock()
+
+
+def is_enabled() -> bool:
+    """True when STATS_DB_PATH is configured"""
+    return bool(STATS_DB_PATH)
+
+def get_connection() -> sqlite3.Connection:
+    """Open (once) the shared connection and make sure the schema exists"""
+    global _connection
+    with _lock:
+        if _connection is None:
+            directory = os.path.dirname(os.path.abspath(STATS_DB_PATH))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(STATS_DB_PATH, timeout=STATS_DB_TIMEOUT,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            conn.commit()
+            _connection = conn
+        return _connection
+
+@contextmanager
+def transaction():
+    """
+    Run a block of statements as one write transaction.
+
+    BEGIN IMMEDIATE takes the write lock up front, so a concurrent writer in
+    the other process waits (up to STATS_DB_TIMEOUT) instead of failing halfway.
+    """
+    with _lock:
+        conn = get_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+def close():
+    """Close the shared connection (reopened on next use)"""
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def normalize_mac(mac: str) -> str:
+    """MACs are stored lowercase without separators (same as populate_stats)"""
+    return mac.replace(':', '').replace('-', '').lower()
+
+def _sync_table(conn, table: str, key_columns: tuple, value_columns: tuple, rows: dict,
+                scope_column: str = None, scope=None, stamp: str = None):
+    """
+    Make `table` hold exactly `rows` ({key tuple: value tuple}), writing only
+    the difference: new or changed rows are upserted, rows that are gone are
+    deleted. Only rows whose scope_column is in `scope` are considered, if given.
+    `stamp` is written to updated_at on upserted rows (not compared).
+
+    Returns:
+        (rows upserted, rows deleted)
+    """
+    columns = key_columns + value_columns
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if scope is None:
+        existing = conn.execute(query).fetchall()
+    else:
+        scope = list(dict.fromkeys(scope))
+        existing = []
+        for i in range(0, len(scope), STATS_DB_IN_CHUNK):
+            chunk = scope[i:i + STATS_DB_IN_CHUNK]
+            existing.extend(conn.execute(
+                f"{query} WHERE {scope_column} IN ({', '.join('?' * len(chunk))})", chunk).fetchall())
+    current = {tuple(row[:len(key_columns)]): tuple(row[len(key_columns):]) for row in existing}
+
+    upserts = [key + values for key, values in rows.items() if current.get(key) != values]
+    deletes = [key for key in current if key not in rows]
+
+    if upserts:
+        insert_columns = columns + (('updated_at',) if stamp else ())
+        updates = ', '.join(f"{c} = excluded.{c}" for c in insert_columns if c not in key_columns)
+        conn.executemany(
+            f"INSERT INTO {table} ({', '.join(insert_columns)}) "
+            f"VALUES ({', '.join('?' * len(insert_columns))}) "
+            f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {updates}",
+            [row + ((stamp,) if stamp else ()) for row in upserts])
+    if deletes:
+        conn.executemany(
+            f"DELETE FROM {table} WHERE {' AND '.join(f'{c} = ?' for c in key_columns)}", deletes)
+    return len(upserts), len(deletes)
+
+
+# ============ PLAYERS ============
+
+def load_players() -> dict:
+    """All players (user_id -> players.json entry)"""
+    with _lock:
+        rows = get_connection().execute("SELECT user_id, data FROM players").fetchall()
+    return {user_id: json.loads(data) for user_id, data in rows}
+
+def save_players(players: dict, user_ids):
+    """
+    Store the players in `user_ids` that the caller changed: each one is
+    upserted from `players`, or deleted if it is no longer there, with its
+    aliases and MACs brought in step in the same transaction. Every other row
+    is left alone, so a stale in-memory copy can't undo another process's
+    changes to other players.
+    """
+    user_ids = [str(user_id) for user_id in user_ids]
+    player_rows = {}
+    alias_rows = {}
+    mac_rows = {}
+    for user_id in user_ids:
+        data = players.get(user_id)
+        if data is None:
+            continue  # Removed - its rows are deleted
+        player_rows[(user_id,)] = (json.dumps(data, ensure_ascii=False),)
+        for alias in data.get('aliases', []):
+            if alias:
+                alias_rows[(alias_index.normalize_alias(alias),)] = (alias, user_id)
+        for mac in data.get('mac_addresses', []):
+            if mac:
+                mac_rows[(normalize_mac(mac),)] = (user_id,)
+
+    if not user_ids:
+        return
+    with transaction() as conn:
+        _sync_table(conn, "players", ("user_id",), ("data",), player_rows, "user_id", user_ids, stamp=_now())
+        _sync_table(conn, "aliases", ("alias_key",), ("alias", "user_id"), alias_rows, "user_id", user_ids)
+        _sync_table(conn, "macs", ("mac",), ("user_id",), mac_rows, "user_id", user_ids)
+
+
+# ============ RANKSTATS (bot) ============
+
+def load_rankstats() -> dict:
+    """All rankstats entries (user_id -> stats)"""
+    with _lock:
+        rows = get_connection().execute("SELECT user_id, data FROM rankstats").fetchall()
+    return {user_id: json.loads(data) for user_id, data in rows}
+
+def save_rankstats(entries: dict, removed=()):
+    """Upsert the given rankstats entries (and delete `removed` user_ids) in one transaction"""
+    now = _now()
+    with transaction() as conn:
+        conn.executemany(
+            "INSERT INTO rankstats (user_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            [(str(user_id), json.dumps(stats), now) for user_id, stats in entries.items()])
+        conn.executemany("DELETE FROM rankstats WHERE user_id = ?",
+                         [(str(user_id),) for user_id in removed])
+
+
+# ============ PIPELINE OUTPUT (populate_stats) ============
+
+def save_pipeline_run(ranks_data: dict, rankhistory: dict, games: list, user_ids=None):
+    """
+    Store a populate_stats.py run: per-playlist rank state from ranks.json,
+    rank history, and the games that were processed - all in one transaction.
+    Only rows that differ from what is stored are written.
+
+    Args:
+        ranks_data: ranks.json contents
+        rankhistory: rankhistory.json contents
+        games: Processed games (dicts with 'source_file' and 'details')
+        user_ids: Only rewrite rank state/history for these players (None = everyone)
+    """
+    scope = None if user_ids is None else [str(u) for u in user_ids]
+    user_ids = scope if scope is not None else [str(u) for u in set(ranks_data) | set(rankhistory)]
+
+    playlist_rows = {}
+    history_rows = {}
+    for user_id in user_ids:
+        for playlist, pl in ranks_data.get(user_id, {}).get('playlists', {}).items():
+            playlist_rows[(user_id, playlist)] = (pl.get('rank'), pl.get('highest_rank'), pl.get('xp'),
+                                                  pl.get('wins'), pl.get('losses'), pl.get('games'))
+        for position, h in enumerate(rankhistory.get(user_id, {}).get('history', [])):
+            history_rows[(user_id, position)] = (h.get('timestamp'), h.get('source_file'), h.get('map'),
+                                                 h.get('gametype'), h.get('playlist'), h.get('xp_change'),
+                                                 h.get('xp_total'), h.get('rank_before'),
+                                                 h.get('rank_after'), h.get('result'))
+
+    game_rows = {}
+    for game in games:
+        details = game.get('details', {})
+        game_rows[(game.get('source_file'),)] = (game.get('playlist'), details.get('Start Time', ''),
+                                                 details.get('Map Name', ''), details.get('Variant Name', ''))
+
+    with transaction() as conn:
+        _sync_table(conn, "playlist_ranks", ("user_id", "playlist"),
+                    ("rank", "highest_rank", "xp", "wins", "losses", "games"),
+                    playlist_rows, "user_id", scope)
+        _sync_table(conn, "rank_history", ("user_id", "position"),
+                    ("timestamp", "source_file", "map", "gametype", "playlist", "xp_change",
+                     "xp_total", "rank_before", "rank_after", "result"),
+                    history_rows, "user_id", scope)
+        # Games are only ever added or updated here, never removed
+        _sync_table(conn, "games", ("source_file",), ("playlist", "timestamp", "map", "gametype"),
+                    game_rows, "source_file", [key[0] for key in game_rows])
+
+
+# ============ MATCH LOG (postgame) ============
+
+def record_match_event(history_file: str, section: str, entry: dict, counter: str = None):
+    """Store a match/game entry logged through match_log.append_event"""
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO match_log (history_file, section, counter, entry, logged_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (os.path.basename(history_file), section, counter, json.dumps(entry), _now()))
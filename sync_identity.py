@@ -14,22 +14,48 @@ Usage (as module):
 
 Usage (standalone):
     python sync_identity.py
+    python sync_identity.py --local /path/to/private   # local copy instead of SFTP
 
-The identity files contain MAC addresses. The filename (without .xlsx) IS the
-player's in-game profile name used in stats.
+Identity files (*_identity.xlsx) map in-game profile names to MAC addresses.
+Files that don't list player names fall back to the filename (without .xlsx)
+being the profile name.
+
+Each file's results are cached in identity_manifest.json by (size, mtime), so a
+sync only downloads and parses identity files that are new or changed.
 """
 
-import pandas as pd
+import openpyxl
+import argparse
 import json
 import os
 import io
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import stats_db
 
 # Server paths
 PRIVATE_STATS_PATH = "/home/carnagereport/stats/private/"
 
 # Local files
 PLAYERS_FILE = "players.json"
+IDENTITY_MANIFEST_FILE = "identity_manifest.json"  # Identity files already parsed (kept next to players.json)
+
+# Only these files in PRIVATE_STATS_PATH are identity files (the rest are game stats)
+IDENTITY_SUFFIX = "_identity.xlsx"
+
+# Column names that may hold a MAC address (lowercase substrings)
+MAC_COLUMN_HINTS = ['mac', 'hardware', 'identifier', 'address']
+
+# SSH session to the stats server
+SSH_CONNECT_TIMEOUT = 30      # Seconds for connect/handshake
+SSH_KEEPALIVE_SECONDS = 60    # Keepalive interval for the persistent session
+
+# Identity download pipeline
+IDENTITY_DOWNLOAD_WORKERS = 4   # Concurrent SFTP channels
+IDENTITY_EXTRACT_WORKERS = 2    # MAC extraction threads
+IDENTITY_MAX_INFLIGHT = 8       # Files downloaded but not yet parsed (bounds memory)
 
 def log(message):
     """Log with timestamp"""
@@ -37,17 +63,90 @@ def log(message):
     print(f"[IDENTITY] [{timestamp}] {message}")
 
 def load_players():
-    """Load players.json"""
+    """Load players (stats DB if enabled, else players.json)"""
+    if stats_db.is_enabled():
+        try:
+            players = stats_db.load_players()
+            if players:
+                return players
+        except Exception as e:
+            log(f"Could not read players from {stats_db.STATS_DB_PATH}: {e}")
     try:
         with open(PLAYERS_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
     except:
         return {}
 
-def save_players(players):
-    """Save players.json"""
-    with open(PLAYERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(players, f, indent=2, ensure_ascii=False)
+def save_players(players, user_ids):
+    """Save players to the stats DB (if enabled - only the `user_ids` that changed)
+    and players.json atomically (temp file + rename)"""
+    if stats_db.is_enabled():
+        stats_db.save_players(players, user_ids)
+    directory = os.path.dirname(os.path.abspath(PLAYERS_FILE))
+    fd, tmp_path = tempfile.mkstemp(prefix=".players.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(players, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, PLAYERS_FILE)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def open_workbook(file_data):
+    """Open an XLSX once in streaming (read-only) mode"""
+    file_data.seek(0)
+    return openpyxl.load_workbook(file_data, read_only=True, data_only=True)
+
+def looks_like_mac(value):
+    return ':' in value or '-' in value
+
+def find_mac_in_workbook(wb):
+    """
+    Find a player's MAC address in an open workbook.
+
+    Checks each sheet's MAC-related columns (first non-empty value, in column
+    order), then falls back to the first data cell of the first sheet. Rows
+    are streamed and reading stops as soon as those values are known, which
+    for identity files is the first data row.
+    """
+    first_cell = None
+    for index, ws in enumerate(wb.worksheets):
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            continue
+
+        # Look for MAC-related columns
+        mac_cols = [i for i, col in enumerate(header)
+                    if col is not None and any(p in str(col).lower() for p in MAC_COLUMN_HINTS)]
+        if not mac_cols and index > 0:
+            continue
+
+        first_values = {}
+        for row_number, row in enumerate(rows):
+            if index == 0 and row_number == 0 and len(row) > 0:
+                first_cell = row[0]
+            for i in mac_cols:
+                if i not in first_values and i < len(row) and row[i] is not None:
+                    first_values[i] = row[i]
+            if len(first_values) == len(mac_cols):
+                break
+
+        for i in mac_cols:
+            if i in first_values:
+                val = str(first_values[i]).strip()
+                if looks_like_mac(val):
+                    return val.upper().replace('-', ':')
+
+    # Check first cell if no column match
+    if first_cell is not None:
+        first_val = str(first_cell).strip()
+        if looks_like_mac(first_val):
+            return first_val.upper().replace('-', ':')
+
+    return None
 
 def extract_mac_from_xlsx(file_data):
     """
@@ -60,44 +159,199 @@ def extract_mac_from_xlsx(file_data):
         MAC address string (uppercase, colon-separated) or None
     """
     try:
-        xl = pd.ExcelFile(file_data)
-        mac_address = None
-
-        for sheet_name in xl.sheet_names:
-            df = pd.read_excel(file_data, sheet_name=sheet_name)
-            file_data.seek(0)
-
-            # Look for MAC-related columns
-            for col in df.columns:
-                col_lower = str(col).lower()
-                if any(p in col_lower for p in ['mac', 'hardware', 'identifier', 'address']):
-                    values = df[col].dropna()
-                    if len(values) > 0:
-                        val = str(values.iloc[0]).strip()
-                        if ':' in val or '-' in val:
-                            mac_address = val.upper().replace('-', ':')
-                            return mac_address
-
-        # Check first cell if no column match
-        file_data.seek(0)
-        df = pd.read_excel(file_data, sheet_name=0)
-        if len(df.columns) > 0 and len(df) > 0:
-            first_val = str(df.iloc[0, 0]).strip()
-            if ':' in first_val or '-' in first_val:
-                return first_val.upper().replace('-', ':')
-
-        return None
+        wb = open_workbook(file_data)
+        try:
+            return find_mac_in_workbook(wb)
+        finally:
+            wb.close()
 
     except Exception as e:
         log(f"Error extracting MAC: {e}")
         return None
 
+def normalize_mac(mac):
+    """MAC comparison key: separators stripped, uppercase"""
+    return mac.replace(':', '').replace('-', '').strip().upper()
+
+def get_manifest_file():
+    """identity_manifest.json lives next to players.json"""
+    return os.path.join(os.path.dirname(os.path.abspath(PLAYERS_FILE)), IDENTITY_MANIFEST_FILE)
+
+def load_manifest():
+    """
+    Load the identity manifest of files already parsed:
+        {filename: {"size": int, "mtime": int, "entries": [[profile_name, MAC], ...]}}
+    """
+    try:
+        with open(get_manifest_file(), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {}
+
+def save_manifest(manifest):
+    """Save the identity manifest atomically (temp file + rename)"""
+    manifest_file = get_manifest_file()
+    fd, tmp_path = tempfile.mkstemp(prefix=".identity_manifest.", suffix=".tmp",
+                                    dir=os.path.dirname(manifest_file))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_file)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+def extract_identity_entries(file_data, filename):
+    """
+    Get the (profile_name, MAC) pairs an identity file provides.
+
+    Identity files written by the stats server list every player in the game
+    ("Player Name" / "Machine Identifier" columns). Files that don't have
+    those columns fall back to the filename being the profile name and the
+    MAC found by find_mac_in_workbook(). The workbook is only opened once.
+
+    Returns:
+        List of [profile_name, MAC] pairs (MAC uppercase, colon-separated)
+    """
+    entries = []
+    try:
+        wb = open_workbook(file_data)
+    except Exception as e:
+        log(f"Error reading {filename}: {e}")
+        return entries
+
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True) if wb.worksheets else iter(())
+        header = [str(col).strip() if col is not None else '' for col in next(rows, None) or ()]
+        if 'Player Name' in header and 'Machine Identifier' in header:
+            name_col = header.index('Player Name')
+            mac_col = header.index('Machine Identifier')
+            for row in rows:
+                if max(name_col, mac_col) >= len(row):
+                    continue
+                player_name = str(row[name_col]).strip() if row[name_col] is not None else ''
+                mac = str(row[mac_col]).strip() if row[mac_col] is not None else ''
+                if player_name and mac:
+                    entries.append([player_name, mac.upper().replace('-', ':')])
+            return entries
+
+        mac_address = find_mac_in_workbook(wb)
+        if mac_address:
+            entries.append([os.path.splitext(filename)[0], mac_address])
+    except Exception as e:
+        log(f"Error reading {filename}: {e}")
+    finally:
+        wb.close()
+    return entries
+
+def open_worker_client(sftp):
+    """
+    Open another SFTP channel on the same SSH transport for a download worker,
+    so requests from different workers aren't queued behind each other.
+    Clients without a transport (LocalDirectory) are shared as-is.
+    """
+    if hasattr(sftp, 'get_channel'):
+        import paramiko
+        return paramiko.SFTPClient.from_transport(sftp.get_channel().get_transport())
+    return sftp
+
+def fetch_identity_entries(sftp, files):
+    """
+    Download and parse identity files concurrently.
+
+    Downloads run on IDENTITY_DOWNLOAD_WORKERS SFTP channels with read-ahead
+    (prefetch), and each file is handed to the extraction pool as soon as it
+    arrives. At most IDENTITY_MAX_INFLIGHT files are held in memory at once.
+    A file that fails to download or parse is logged and left out, so it is
+    retried on the next sync.
+
+    Args:
+        sftp: SFTP client (or LocalDirectory)
+        files: {filename: size} of files in PRIVATE_STATS_PATH to fetch
+
+    Returns:
+        {filename: [[profile_name, MAC], ...]} for files processed successfully
+    """
+    results = {}
+    if not files:
+        return results
+
+    slots = threading.BoundedSemaphore(IDENTITY_MAX_INFLIGHT)
+    worker = threading.local()
+    clients = []
+    lock = threading.Lock()
+    extractions = []
+
+    def get_client():
+        client = getattr(worker, 'client', None)
+        if client is None:
+            client = open_worker_client(sftp)
+            worker.client = client
+            with lock:
+                clients.append(client)
+        return client
+
+    def download(filename):
+        filepath = os.path.join(PRIVATE_STATS_PATH, filename)
+        with get_client().open(filepath, 'rb') as f:
+            if hasattr(f, 'prefetch'):
+                f.prefetch(files[filename])
+            return io.BytesIO(f.read())
+
+    def extract(filename, file_data):
+        try:
+            with lock:
+                results[filename] = extract_identity_entries(file_data, filename)
+        finally:
+            slots.release()
+
+    def downloaded(filename, future):
+        try:
+            file_data = future.result()
+        except Exception as e:
+            log(f"  Error downloading {filename}: {e}")
+            slots.release()
+            return
+        with lock:
+            extractions.append(extract_pool.submit(extract, filename, file_data))
+
+    extract_pool = ThreadPoolExecutor(max_workers=IDENTITY_EXTRACT_WORKERS)
+    try:
+        with ThreadPoolExecutor(max_workers=IDENTITY_DOWNLOAD_WORKERS) as download_pool:
+            for filename in files:
+                slots.acquire()  # Wait here while too many files are downloaded but unparsed
+                future = download_pool.submit(download, filename)
+                future.add_done_callback(lambda f, name=filename: downloaded(name, f))
+        for future in extractions:
+            try:
+                future.result()
+            except Exception as e:
+                log(f"  Error processing identity file: {e}")
+    finally:
+        extract_pool.shutdown(wait=True)
+        for client in clients:
+            if client is not sftp:
+                try:
+                    client.close()
+                except Exception:
+                    pass
+
+    return results
+
 def sync_player_profiles(sftp, players=None):
     """
     Sync identity files and update players with stats_profile.
 
+    Only *_identity.xlsx files that are new or changed (by size/mtime) since
+    the last sync are downloaded and parsed; results for the rest come from
+    the identity manifest.
+
     Args:
-        sftp: Paramiko SFTP client connected to the stats server
+        sftp: Paramiko SFTP client connected to the stats server (or a
+              LocalDirectory for testing against a local copy)
         players: Optional players dict. If None, loads from file.
 
     Returns:
@@ -110,105 +364,249 @@ def sync_player_profiles(sftp, players=None):
     mac_to_user = {}
     for user_id, data in players.items():
         for mac in data.get('mac_addresses', []):
-            mac_to_user[mac.upper()] = user_id
+            mac_to_user[normalize_mac(mac)] = user_id
 
     log(f"Found {len(mac_to_user)} MAC addresses in players.json")
 
-    # List identity files
+    # List identity files (with size/mtime, so unchanged ones can be skipped)
     try:
-        identity_files = [f for f in sftp.listdir(PRIVATE_STATS_PATH) if f.endswith('.xlsx')]
+        remote_files = {
+            attr.filename: attr for attr in sftp.listdir_attr(PRIVATE_STATS_PATH)
+            if attr.filename.endswith(IDENTITY_SUFFIX)
+        }
     except Exception as e:
         log(f"Error listing {PRIVATE_STATS_PATH}: {e}")
         return 0
 
-    log(f"Found {len(identity_files)} identity files")
+    manifest = load_manifest()
+    manifest_changed = False
+
+    # Forget files that are gone from the server
+    for filename in list(manifest):
+        if filename not in remote_files:
+            del manifest[filename]
+            manifest_changed = True
+
+    to_fetch = []
+    for filename, attr in remote_files.items():
+        cached = manifest.get(filename)
+        if (cached is None or cached.get('size') != attr.st_size
+                or cached.get('mtime') != int(attr.st_mtime or 0)):
+            to_fetch.append(filename)
+
+    log(f"Found {len(remote_files)} identity files ({len(to_fetch)} new or changed)")
+
+    fetched = fetch_identity_entries(
+        sftp, {filename: remote_files[filename].st_size for filename in to_fetch})
+    for filename, entries in fetched.items():
+        attr = remote_files[filename]
+        manifest[filename] = {
+            "size": attr.st_size,
+            "mtime": int(attr.st_mtime or 0),
+            "entries": entries
+        }
+        manifest_changed = True
+
+    # Go through every file's entries oldest first, so the newest identity wins
+    latest = {}
+    for filename in sorted(manifest):
+        for profile_name, mac_address in manifest[filename].get('entries', []):
+            user_id = mac_to_user.get(normalize_mac(mac_address))
+            if user_id is not None:
+                latest[user_id] = (profile_name, mac_address)
+
+    updated = []
+    for user_id, (profile_name, mac_address) in latest.items():
+        old_profile = players[user_id].get('stats_profile', '')
+
+        if old_profile != profile_name:
+            players[user_id]['stats_profile'] = profile_name
+            updated.append(user_id)
+            log(f"  {profile_name} -> user {user_id} (MAC: {mac_address})")
+
+    updated_count = len(updated)
+    if updated_count > 0:
+        save_players(players, updated)
+        log(f"Updated {updated_count} player profiles")
 
-    updated_count = 0
+    if manifest_changed:
+        save_manifest(manifest)
 
-    for filename in identity_files:
-        filepath = os.path.join(PRIVATE_STATS_PATH, filename)
-        profile_name = os.path.splitext(filename)[0]  # Filename IS the profile name
+    return updated_count
 
-        try:
-            # Read file
-            with sftp.file(filepath, 'rb') as f:
-                file_data = io.BytesIO(f.read())
+class LocalDirectory:
+    """
+    Stand-in for a paramiko SFTP client backed by a local directory, so the
+    sync can be run against a copy of the private stats folder.
+    Remote paths under PRIVATE_STATS_PATH map to files in `root`.
+    """
 
-            # Extract MAC
-            mac_address = extract_mac_from_xlsx(file_data)
+    def __init__(self, root):
+        self.root = root
 
-            if mac_address and mac_address in mac_to_user:
-                user_id = mac_to_user[mac_address]
-                old_profile = players[user_id].get('stats_profile', '')
+    def _local_path(self, path):
+        return os.path.join(self.root, os.path.relpath(path, PRIVATE_STATS_PATH))
 
-                if old_profile != profile_name:
-                    players[user_id]['stats_profile'] = profile_name
-                    updated_count += 1
-                    log(f"  {profile_name} -> user {user_id} (MAC: {mac_address})")
+    def listdir_attr(self, path="."):
+        attrs = []
+        for entry in os.scandir(self._local_path(path)):
+            if entry.is_file():
+                st = entry.stat()
+                attrs.append(LocalFileAttributes(entry.name, st.st_size, int(st.st_mtime)))
+        return attrs
 
-        except Exception as e:
-            log(f"  Error processing {filename}: {e}")
+    def open(self, path, mode='rb'):
+        return open(self._local_path(path), mode)
 
-    if updated_count > 0:
-        save_players(players)
-        log(f"Updated {updated_count} player profiles")
+    def close(self):
+        pass
 
-    return updated_count
+class LocalFileAttributes:
+    """The SFTPAttributes fields the sync uses"""
 
-def sync_from_server(host="104.207.143.249", user="root"):
-    """
-    Connect to server and sync identity data.
+    def __init__(self, filename, st_size, st_mtime):
+        self.filename = filename
+        self.st_size = st_size
+        self.st_mtime = st_mtime
 
-    Args:
-        host: Server hostname/IP
-        user: SSH username
+def sync_from_directory(path):
+    """
+    Sync identity data from a local copy of the private stats folder.
 
     Returns:
-        Number of players updated, or -1 on connection failure
+        Number of players updated
     """
-    import paramiko
+    return sync_player_profiles(LocalDirectory(path))
 
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+class SSHSessionManager:
+    """
+    Reusable SSH/SFTP session to the stats server.
 
-    # Try SSH keys
-    home = os.path.expanduser("~")
-    key_paths = [
-        os.path.join(home, ".ssh", "id_rsa"),
-        os.path.join(home, ".ssh", "id_ed25519"),
-    ]
+    Connects on first use and keeps the connection open (with keepalives)
+    between syncs. Before each use the session is health-checked with a cheap
+    SFTP round trip and reconnected if it has dropped. The private key is
+    found and loaded once. Calls are serialized with a lock, so it is safe to
+    use from executor threads.
+    """
 
-    key = None
-    for kp in key_paths:
-        if os.path.exists(kp):
-            try:
-                key = paramiko.RSAKey.from_private_key_file(kp)
-                break
-            except:
+    def __init__(self, host, user):
+        self.host = host
+        self.user = user
+        self._ssh = None
+        self._sftp = None
+        self._pkey = None
+        self._pkey_loaded = False
+        self._lock = threading.Lock()
+
+    def _load_key(self):
+        """Find the first usable key in ~/.ssh (only looked up once)"""
+        if self._pkey_loaded:
+            return self._pkey
+        import paramiko
+
+        home = os.path.expanduser("~")
+        key_types = [
+            (os.path.join(home, ".ssh", "id_rsa"), paramiko.RSAKey),
+            (os.path.join(home, ".ssh", "id_ed25519"), paramiko.Ed25519Key),
+        ]
+        for path, key_class in key_types:
+            if os.path.exists(path):
                 try:
-                    key = paramiko.Ed25519Key.from_private_key_file(kp)
+                    self._pkey = key_class.from_private_key_file(path)
                     break
-                except:
-                    pass
-
-    try:
+                except Exception as e:
+                    log(f"Could not load SSH key {path}: {e}")
+        self._pkey_loaded = True
+        return self._pkey
+
+    def _is_healthy(self):
+        if self._ssh is None or self._sftp is None:
+            return False
+        transport = self._ssh.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            self._sftp.normalize('.')
+            return True
+        except Exception:
+            return False
+
+    def _connect(self):
+        import paramiko
+
+        self._close()
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        key = self._load_key()
         if key:
-            ssh.connect(host, username=user, pkey=key, timeout=30)
+            ssh.connect(hostname=self.host, username=self.user, pkey=key, timeout=SSH_CONNECT_TIMEOUT)
         else:
-            ssh.connect(host, username=user, timeout=30)
+            ssh.connect(hostname=self.host, username=self.user, timeout=SSH_CONNECT_TIMEOUT)
+        ssh.get_transport().set_keepalive(SSH_KEEPALIVE_SECONDS)
+        self._ssh = ssh
+        self._sftp = ssh.open_sftp()
+        log(f"Connected to {self.host}")
+
+    def _close(self):
+        for conn in (self._sftp, self._ssh):
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        self._sftp = None
+        self._ssh = None
+
+    def run(self, func, *args, **kwargs):
+        """Call func(sftp, *args, **kwargs) on a healthy session (connecting if needed)"""
+        with self._lock:
+            if not self._is_healthy():
+                self._connect()
+            return func(self._sftp, *args, **kwargs)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def get_session(host, user):
+    """Get the shared session manager for a server"""
+    with _sessions_lock:
+        session = _sessions.get((host, user))
+        if session is None:
+            session = SSHSessionManager(host, user)
+            _sessions[(host, user)] = session
+        return session
 
-        sftp = ssh.open_sftp()
-        result = sync_player_profiles(sftp)
-        sftp.close()
-        ssh.close()
-        return result
+def sync_from_server(host="104.207.143.249", user="root"):
+    """
+    Sync identity data from the stats server over the shared SSH session.
+    Blocking - the bot runs this in an executor.
+
+    Args:
+        host: Server hostname/IP
+        user: SSH username
 
+    Returns:
+        Number of players updated, or -1 on connection failure
+    """
+    try:
+        return get_session(host, user).run(sync_player_profiles)
     except Exception as e:
         log(f"Connection failed: {e}")
         return -1
 
 if __name__ == '__main__':
-    result = sync_from_server()
+    parser = argparse.ArgumentParser(description="Sync identity XLSX files into players.json")
+    parser.add_argument("--local", metavar="DIR", help="Read identity files from a local directory instead of the server")
+    args = parser.parse_args()
+
+    if args.local:
+        result = sync_from_directory(args.local)
+    else:
+        result = sync_from_server()
     if result >= 0:
         print(f"Sync complete: {result} profiles updated")
     else:
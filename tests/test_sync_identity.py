@@ -0,0 +1,52 @@
+"""Tests for the keep-alive SSH session in sync_identity.py"""
+
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sync_identity
+
+
+def make_fake_paramiko():
+    """Stand-in paramiko module whose SSHClient is a mock"""
+    paramiko = types.ModuleType("paramiko")
+    paramiko.SSHClient = mock.MagicMock(name="SSHClient")
+    paramiko.AutoAddPolicy = mock.MagicMock(name="AutoAddPolicy")
+    paramiko.RSAKey = mock.MagicMock(name="RSAKey")
+    paramiko.Ed25519Key = mock.MagicMock(name="Ed25519Key")
+    return paramiko
+
+
+class SSHSessionConnectTest(unittest.TestCase):
+
+    def connect(self, key):
+        paramiko = make_fake_paramiko()
+        session = sync_identity.SSHSessionManager("stats.example", "carnagereport")
+        with mock.patch.dict(sys.modules, {"paramiko": paramiko}), \
+                mock.patch.object(session, "_load_key", return_value=key):
+            session._connect()
+        return paramiko.SSHClient.return_value
+
+    def test_connect_with_key_passes_hostname(self):
+        key = object()
+        client = self.connect(key)
+        client.connect.assert_called_once_with(
+            hostname="stats.example", username="carnagereport", pkey=key,
+            timeout=sync_identity.SSH_CONNECT_TIMEOUT)
+        client.get_transport.return_value.set_keepalive.assert_called_once_with(
+            sync_identity.SSH_KEEPALIVE_SECONDS)
+        client.open_sftp.assert_called_once_with()
+
+    def test_connect_without_key_passes_hostname(self):
+        client = self.connect(None)
+        client.connect.assert_called_once_with(
+            hostname="stats.example", username="carnagereport",
+            timeout=sync_identity.SSH_CONNECT_TIMEOUT)
+
+
+if __name__ == "__main__":
+    unittest.main()
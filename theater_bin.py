@@ -0,0 +1,480 @@
+"""
+theater_bin.py - Columnar Binary Theater Telemetry
+Converts theater CSVs (one row per player sample, ~100 ms apart) into a
+compact columnar file the theater viewer can load straight into typed arrays.
+
+File layout (little-endian):
+
+    "CRTB"                      4-byte magic
+    uint32 header_length
+    header                      JSON (utf-8), padded with spaces to a multiple of 4
+    column data                 one typed array per column, each 4-byte aligned
+
+Rows are sorted by player, then GameTimeMs. The header describes every
+column ({"name", "type", "encoding", "offset", "bytes"}; offsets are from the
+start of the file):
+
+    - "player": index into header["players"] - the per-player columns
+      (PlayerName, XboxIdentifier, Team, emblem/colours) stored once per player
+    - GameTimeMs: int32
+    - numeric columns (X, Y, Z, FacingYaw, FacingPitch, ...): float32, or
+      int16/int32 when every value is a whole number
+    - True/False columns: one bit each in the "flags" column (bit order in header["flags"])
+    - other text columns (CurrentWeapon, ...): index into the column's "values"
+
+The per-row Timestamp string is dropped: header["timestamp_origin"] is the
+wall-clock time at GameTimeMs 0 (to within 1 ms).
+
+Besides the full-rate file, downsampled levels (LOD_LEVELS) are written next
+to it - one sample per player per 1 s / 5 s bucket, the one closest to the
+middle of the bucket - for scrubbing and overview rendering. Every file
+records the full-rate time span (header["game_time_ms"]) and has a
+per-player time index (header["time_index"]):
+
+    {"chunk_ms": 10000, "players": [{"start", "rows", "first_chunk", "chunks"}]}
+
+chunks[k] is the first row at or after GameTimeMs (first_chunk + k) * chunk_ms,
+so a window of one player's samples is a contiguous row range in every column,
+which a client can fetch with HTTP Range requests (see window_rows/read_window).
+The theater viewer loads the 5 s level first, then fetches full-rate windows
+this way as playback reaches them.
+"""
+
+import bisect
+import csv
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from datetime import datetime, timedelta
+
+THEATER_BIN_MAGIC = b"CRTB"
+THEATER_BIN_VERSION = 2
+
+# Downsampled copies written next to the full-rate file (bucket size in ms)
+LOD_LEVELS = [1000, 5000]
+
+# Granularity of the per-player time index
+TIME_INDEX_CHUNK_MS = 10000
+
+# Columns that only change per player - stored once in header["players"]
+PLAYER_COLUMNS = [
+    'PlayerName', 'XboxIdentifier', 'MachineIdentifier', 'Team',
+    'EmblemForeground', 'EmblemBackground', 'EmblemFg', 'EmblemBg',
+    'PrimaryColor', 'SecondaryColor', 'TertiaryColor', 'QuaternaryColor',
+    'ColorPrimary', 'ColorSecondary', 'ColorTertiary', 'ColorQuaternary'
+]
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# array typecodes for header types
+TYPECODES = {
+    'uint8': 'B', 'uint16': 'H', 'uint32': 'I',
+    'int16': 'h', 'int32': 'i', 'float32': 'f'
+}
+
+
+def get_bin_path(csv_path: str) -> str:
+    """20251202_204558_theater.csv -> 20251202_204558_theater.bin"""
+    return os.path.splitext(csv_path)[0] + '.bin'
+
+
+def get_level_path(csv_path: str, bucket_ms: int) -> str:
+    """20251202_204558_theater.csv, 5000 -> 20251202_204558_theater.5s.bin"""
+    return f"{os.path.splitext(csv_path)[0]}.{bucket_ms // 1000}s.bin"
+
+
+def get_output_paths(csv_path: str) -> list:
+    """Full-rate .bin followed by every LOD level"""
+    return [get_bin_path(csv_path)] + [get_level_path(csv_path, ms) for ms in LOD_LEVELS]
+
+
+def index_type(count: int) -> str:
+    """Smallest unsigned type that can index `count` entries"""
+    if count <= 0x100:
+        return 'uint8'
+    if count <= 0x10000:
+        return 'uint16'
+    return 'uint32'
+
+
+def parse_number(value: str) -> float:
+    """Parse a numeric cell ('' and NaN both become NaN); raises ValueError for text"""
+    if value == '':
+        return math.nan
+    return float(value)
+
+
+def classify_column(values: list):
+    """
+    Work out how to store a column.
+
+    Returns:
+        ("flag", None), ("int16"/"int32"/"float32", parsed numbers) or ("dictionary", None)
+    """
+    if all(v in ('True', 'False') for v in values):
+        return 'flag', None
+    try:
+        numbers = [parse_number(v) for v in values]
+    except ValueError:
+        return 'dictionary', None
+    if all(not math.isnan(n) and not math.isinf(n) and n.is_integer() for n in numbers):
+        low, high = (min(numbers), max(numbers)) if numbers else (0, 0)
+        if -0x8000 <= low and high <= 0x7FFF:
+            return 'int16', [int(n) for n in numbers]
+        if -0x80000000 <= low and high <= 0x7FFFFFFF:
+            return 'int32', [int(n) for n in numbers]
+    return 'float32', numbers
+
+
+def get_timestamp_origin(rows: list):
+    """Wall-clock time at GameTimeMs 0, from the first row with a Timestamp"""
+    for row in rows:
+        try:
+            ts = datetime.strptime(row['Timestamp'], TIMESTAMP_FORMAT)
+            origin = ts - timedelta(milliseconds=int(row['GameTimeMs']))
+            return origin.strftime(TIMESTAMP_FORMAT)[:-3]
+        except (KeyError, TypeError, ValueError):
+            continue
+    return None
+
+
+def read_theater_csv(csv_path: str):
+    """Read a theater CSV: (column names, rows as dicts with stripped values)"""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader, [])]
+        rows = []
+        for values in reader:
+            if len(values) < len(header):
+                continue  # Truncated line (same as the viewer's CSV parser)
+            rows.append({name: values[i].strip() for i, name in enumerate(header)})
+    return header, rows
+
+
+def row_time(row: dict) -> int:
+    """A row's GameTimeMs as an int (0 if missing)"""
+    try:
+        return int(float(row.get('GameTimeMs') or 0))
+    except ValueError:
+        return 0
+
+
+def sort_rows(header: list, rows: list) -> list:
+    """Rows grouped by player (in order of first appearance), then by GameTimeMs"""
+    player_cols = [c for c in header if c in PLAYER_COLUMNS]
+    order = {}
+    for row in rows:
+        order.setdefault(tuple(row[c] for c in player_cols), len(order))
+    return sorted(rows, key=lambda row: (order[tuple(row[c] for c in player_cols)], row_time(row)))
+
+
+def downsample_rows(header: list, rows: list, bucket_ms: int) -> list:
+    """
+    One row per player per bucket_ms bucket: the sample closest to the middle
+    of the bucket. Real samples (not averages) keep positions on the map.
+    `rows` must already be sorted with sort_rows.
+    """
+    player_cols = [c for c in header if c in PLAYER_COLUMNS]
+    picked = []
+    current = None
+    best = None
+    best_distance = None
+    for row in rows:
+        t = row_time(row)
+        bucket = (tuple(row[c] for c in player_cols), t // bucket_ms)
+        distance = abs(t - (bucket[1] * bucket_ms + bucket_ms // 2))
+        if bucket != current:
+            if best is not None:
+                picked.append(best)
+            current, best, best_distance = bucket, row, distance
+        elif distance < best_distance:
+            best, best_distance = row, distance
+    if best is not None:
+        picked.append(best)
+    return picked
+
+
+def build_time_index(player_indices, times, player_count: int, chunk_ms: int = TIME_INDEX_CHUNK_MS) -> dict:
+    """Per-player time index over rows sorted by player then time (see module docstring)"""
+    entries = []
+    start = 0
+    for p in range(player_count):
+        end = start
+        while end < len(player_indices) and player_indices[end] == p:
+            end += 1
+        player_times = times[start:end]
+        first_chunk = player_times[0] // chunk_ms if player_times else 0
+        last_chunk = player_times[-1] // chunk_ms if player_times else -1
+        chunks = [start + bisect.bisect_left(player_times, k * chunk_ms)
+                  for k in range(first_chunk, last_chunk + 2)]
+        entries.append({'start': start, 'rows': end - start, 'first_chunk': first_chunk, 'chunks': chunks})
+        start = end
+    return {'chunk_ms': chunk_ms, 'players': entries}
+
+
+def window_rows(time_index: dict, player: int, start_ms: int, end_ms: int):
+    """
+    Row range [first, last) holding player's samples between start_ms and end_ms.
+    Chunk-granular - the range may include a few samples either side of the window.
+    """
+    entry = time_index['players'][player]
+    chunks = entry['chunks']
+    if not chunks:
+        return entry['start'], entry['start']
+    chunk_ms = time_index['chunk_ms']
+    lo = min(max(start_ms // chunk_ms - entry['first_chunk'], 0), len(chunks) - 1)
+    hi = min(max(end_ms // chunk_ms - entry['first_chunk'] + 1, 0), len(chunks) - 1)
+    return chunks[lo], max(chunks[lo], chunks[hi])
+
+
+def encode_columns(header: list, rows: list):
+    """
+    Build the typed columns for a theater file.
+
+    Returns:
+        (meta, columns) - meta holds the dictionaries/flags for the file header,
+        columns is a list of (column header dict, array)
+    """
+    meta = {}
+    columns = []
+
+    # Per-player columns -> one "player" index per row
+    player_cols = [c for c in header if c in PLAYER_COLUMNS]
+    players = []
+    player_index = {}
+    indices = []
+    for row in rows:
+        key = tuple(row[c] for c in player_cols)
+        idx = player_index.get(key)
+        if idx is None:
+            idx = player_index[key] = len(players)
+            players.append(dict(zip(player_cols, key)))
+        indices.append(idx)
+    meta['players'] = players
+    kind = index_type(len(players))
+    columns.append(({'name': 'player', 'type': kind, 'encoding': 'dictionary'},
+                    array(TYPECODES[kind], indices)))
+
+    # GameTimeMs stays absolute so any row range can be read on its own
+    times = [row_time(row) for row in rows]
+    if 'GameTimeMs' in header:
+        columns.append(({'name': 'GameTimeMs', 'type': 'int32', 'encoding': 'plain'},
+                        array('i', times)))
+    meta['time_index'] = build_time_index(indices, times, len(players))
+
+    flags = []
+    for name in header:
+        if name in PLAYER_COLUMNS or name in ('GameTimeMs', 'Timestamp'):
+            continue
+        values = [row[name] for row in rows]
+        kind, numbers = classify_column(values)
+        if kind == 'flag':
+            flags.append((name, values))
+        elif kind == 'dictionary':
+            dictionary = []
+            lookup = {}
+            codes = []
+            for v in values:
+                code = lookup.get(v)
+                if code is None:
+                    code = lookup[v] = len(dictionary)
+                    dictionary.append(v)
+                codes.append(code)
+            idx_kind = index_type(len(dictionary))
+            columns.append(({'name': name, 'type': idx_kind, 'encoding': 'dictionary', 'values': dictionary},
+                            array(TYPECODES[idx_kind], codes)))
+        else:
+            columns.append(({'name': name, 'type': kind, 'encoding': 'plain'},
+                            array(TYPECODES[kind], numbers)))
+
+    # True/False columns packed into bits
+    meta['flags'] = [name for name, _ in flags]
+    if flags:
+        kind = index_type(1 << len(flags)) if len(flags) <= 16 else 'uint32'
+        packed = [0] * len(rows)
+        for bit, (_, values) in enumerate(flags):
+            for i, v in enumerate(values):
+                if v == 'True':
+                    packed[i] |= 1 << bit
+        columns.append(({'name': 'flags', 'type': kind, 'encoding': 'bits'},
+                        array(TYPECODES[kind], packed)))
+
+    return meta, columns
+
+
+def write_columnar_file(path: str, header: dict, columns: list):
+    """
+    Write header + typed arrays in the CRTB layout atomically.
+    Fills in each column's "offset"/"bytes" in the header.
+    """
+    blobs = []
+    for col, data in columns:
+        if sys.byteorder != 'little':
+            data = array(data.typecode, data)
+            data.byteswap()
+        blob = data.tobytes()
+        blobs.append(blob + b'\0' * (-len(blob) % 4))
+        col['bytes'] = len(blob)
+    header['columns'] = [col for col, _ in columns]
+
+    # Offsets depend on the header length, which depends on the offsets -
+    # repeat until the length stops changing (offsets only ever grow)
+    header_length = 0
+    while True:
+        offset = 8 + header_length
+        for col, blob in zip(header['columns'], blobs):
+            col['offset'] = offset
+            offset += len(blob)
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        if len(header_bytes) <= header_length:
+            header_bytes += b' ' * (header_length - len(header_bytes))
+            break
+        header_length = len(header_bytes) + (-len(header_bytes) % 4)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".theater.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(THEATER_BIN_MAGIC)
+            f.write(struct.pack("<I", len(header_bytes)))
+            f.write(header_bytes)
+            for blob in blobs:
+                f.write(blob)
+        os.chmod(tmp_path, 0o644)  # Served as a static file
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def convert_theater_csv(csv_path: str) -> list:
+    """
+    Convert a theater CSV to the columnar binary format: the full-rate file
+    plus one file per LOD level.
+
+    Returns:
+        Paths of the written files (same order as get_output_paths)
+    """
+    header, rows = read_theater_csv(csv_path)
+    rows = sort_rows(header, rows)
+    levels = [{'bucket_ms': ms, 'file': os.path.basename(get_level_path(csv_path, ms))}
+              for ms in LOD_LEVELS]
+    times = [row_time(row) for row in rows]
+    game_time_ms = [min(times), max(times)] if times else [0, 0]
+
+    written = []
+    for bucket_ms, path in zip([0] + LOD_LEVELS, get_output_paths(csv_path)):
+        level_rows = downsample_rows(header, rows, bucket_ms) if bucket_ms else rows
+        meta, columns = encode_columns(header, level_rows)
+        file_header = {
+            'format': 'carnagereport-theater',
+            'version': THEATER_BIN_VERSION,
+            'source': os.path.basename(csv_path),
+            'bucket_ms': bucket_ms,  # 0 = every sample
+            'levels': levels,
+            'rows': len(level_rows),
+            'game_time_ms': game_time_ms,  # full-rate [first, last] - the level files span the same game
+            'csv_columns': header,
+            'timestamp_origin': get_timestamp_origin(rows),
+        }
+        file_header.update(meta)
+        write_columnar_file(path, file_header, columns)
+        written.append(path)
+    return written
+
+
+def convert_if_stale(csv_path: str):
+    """
+    Convert a theater CSV unless its .bin files are already up to date.
+
+    Returns:
+        The full-rate .bin filename (basename), or None if conversion failed
+    """
+    outputs = get_output_paths(csv_path)
+    try:
+        csv_mtime = os.path.getmtime(csv_path)
+        if any(not os.path.exists(path) or os.path.getmtime(path) < csv_mtime for path in outputs):
+            convert_theater_csv(csv_path)
+    except Exception as e:
+        print(f"  Warning: Could not convert {os.path.basename(csv_path)}: {e}")
+        return None
+    return os.path.basename(outputs[0])
+
+
+def read_header(f) -> dict:
+    """Read the JSON header from an open CRTB file"""
+    start = f.read(8)
+    if len(start) < 8 or start[:4] != THEATER_BIN_MAGIC:
+        raise ValueError(f"{getattr(f, 'name', 'file')} is not a theater .bin file")
+    header_length = struct.unpack('<I', start[4:])[0]
+    header = json.loads(f.read(header_length).decode('utf-8'))
+    if header.get('version') != THEATER_BIN_VERSION:
+        raise ValueError(f"Unsupported theater .bin version: {header.get('version')}")
+    return header
+
+
+def read_column(f, col: dict, first: int = 0, last: int = None):
+    """Rows [first, last) of one column as an array"""
+    values = array(TYPECODES[col['type']])
+    count = col['bytes'] // values.itemsize
+    last = count if last is None else min(last, count)
+    if last > first:
+        f.seek(col['offset'] + first * values.itemsize)
+        values.frombytes(f.read((last - first) * values.itemsize))
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def read_columnar_file(path: str):
+    """
+    Read a CRTB file.
+
+    Returns:
+        (header, {column name: array}) - dictionary columns as index arrays
+    """
+    with open(path, 'rb') as f:
+        header = read_header(f)
+        columns = {col['name']: read_column(f, col) for col in header['columns']}
+    return header, columns
+
+
+def read_window(path: str, player_name: str, start_ms: int, end_ms: int):
+    """
+    Read only one player's samples between start_ms and end_ms, seeking to the
+    row range from the time index instead of reading the whole file.
+
+    Returns:
+        (header, {column name: array}) - same shape as read_columnar_file
+    """
+    with open(path, 'rb') as f:
+        header = read_header(f)
+        time_index = header['time_index']
+        ranges = [window_rows(time_index, i, start_ms, end_ms)
+                  for i, p in enumerate(header['players'])
+                  if p.get('PlayerName') == player_name]
+
+        columns = {}
+        for col in header['columns']:
+            values = None
+            for first, last in ranges:
+                part = read_column(f, col, first, last)
+                values = part if values is None else values + part
+            columns[col['name']] = values if values is not None else array(TYPECODES[col['type']])
+
+    # Trim to the exact window (the index is chunk-granular)
+    times = columns.get('GameTimeMs')
+    if times is not None:
+        keep = [i for i, t in enumerate(times) if start_ms <= t <= end_ms]
+        columns = {name: array(values.typecode, (values[i] for i in keep)) for name, values in columns.items()}
+    return header, columns
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        for out in convert_theater_csv(path):
+            print(f"{path} ({os.path.getsize(path)} bytes) -> {out} ({os.path.getsize(out)} bytes)")
@@ -7,17 +7,23 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 from discord.ui import View, Button
+import asyncio
+import atexit
 import json
 import os
 import re
 import io
 import logging
+import shutil
+import tempfile
 from typing import Optional, List, Dict, Tuple
+import alias_index
+import stats_db
 
 # Optional imports for identity sync
 try:
     import paramiko
-    import pandas as pd
+    import openpyxl
     IDENTITY_SYNC_AVAILABLE = True
 except ImportError:
     IDENTITY_SYNC_AVAILABLE = False
@@ -48,15 +54,42 @@ STATS_SERVER_HOST = "104.207.143.249"
 STATS_SERVER_USER = "root"
 IDENTITY_PATH = "/home/carnagereport/stats/private/"
 
+# Seconds to batch rapid players.json edits before writing
+PLAYERS_SAVE_DELAY = 2.0
+
 # In-memory cache
 _PLAYERS_CACHE = None
+_PLAYERS_DIRTY = False
+_PLAYERS_FLUSH_HANDLE = None
+# Each player's data as last loaded/saved (JSON) - flush_players writes only
+# the players that differ from it to the stats DB
+_PLAYERS_SAVED = {}
+
+def _player_snapshot(players: Dict[str, Dict[str, str]]) -> Dict[str, str]:
+    return {user_id: json.dumps(data, sort_keys=True) for user_id, data in players.items()}
+
+def get_changed_players(players: Dict[str, Dict[str, str]]) -> set:
+    """IDs of players added, edited or removed since the last load/save"""
+    current = _player_snapshot(players)
+    return {user_id for user_id in current.keys() | _PLAYERS_SAVED.keys()
+            if current.get(user_id) != _PLAYERS_SAVED.get(user_id)}
 
 def load_players() -> Dict[str, Dict[str, str]]:
-    """Load players data from JSON with caching"""
-    global _PLAYERS_CACHE
+    """Load players data (stats DB if enabled, else players.json) with caching"""
+    global _PLAYERS_CACHE, _PLAYERS_SAVED
     
     if _PLAYERS_CACHE is not None:
         return _PLAYERS_CACHE
+
+    if stats_db.is_enabled():
+        try:
+            data = stats_db.load_players()
+            if data:
+                _PLAYERS_CACHE = data
+                _PLAYERS_SAVED = _player_snapshot(data)
+                return _PLAYERS_CACHE
+        except Exception:
+            logger.exception("Failed to load players from the stats DB; falling back to players.json")
     
     if not os.path.exists(PLAYERS_FILE):
         logger.info("players.json not found; starting with empty DB.")
@@ -69,37 +102,102 @@ def load_players() -> Dict[str, Dict[str, str]]:
         if not isinstance(data, dict):
             raise ValueError("players.json root must be an object")
         _PLAYERS_CACHE = data
-        return _PLAYERS_CACHE
     except Exception as e:
         logger.exception("Failed to load players.json")
         _PLAYERS_CACHE = {}
         return _PLAYERS_CACHE
 
+    if stats_db.is_enabled() and _PLAYERS_CACHE:
+        # First run with the backend - seed it from players.json
+        try:
+            stats_db.save_players(_PLAYERS_CACHE, _PLAYERS_CACHE.keys())
+        except Exception:
+            logger.exception("Failed to seed the stats DB from players.json")
+    _PLAYERS_SAVED = _player_snapshot(_PLAYERS_CACHE)
+    return _PLAYERS_CACHE
+
 def save_players(players: Dict[str, Dict[str, str]]):
-    """Save players data to JSON"""
-    global _PLAYERS_CACHE
+    """Save players data - written to disk (and queued for GitHub) after a short debounce"""
+    global _PLAYERS_CACHE, _PLAYERS_DIRTY, _PLAYERS_FLUSH_HANDLE
     _PLAYERS_CACHE = players
-    
+    _PLAYERS_DIRTY = True
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Not inside the bot's event loop - write straight away
+        flush_players()
+        return
+
+    if _PLAYERS_FLUSH_HANDLE is None:
+        _PLAYERS_FLUSH_HANDLE = loop.call_later(PLAYERS_SAVE_DELAY, flush_players)
+
+def flush_players() -> bool:
+    """Write pending players data now. players.json is replaced atomically, so a
+    crash mid-write leaves the previous file intact."""
+    global _PLAYERS_DIRTY, _PLAYERS_FLUSH_HANDLE, _PLAYERS_SAVED
+    if _PLAYERS_FLUSH_HANDLE is not None:
+        _PLAYERS_FLUSH_HANDLE.cancel()
+        _PLAYERS_FLUSH_HANDLE = None
+    if not _PLAYERS_DIRTY or _PLAYERS_CACHE is None:
+        return True
+
+    players = _PLAYERS_CACHE
+    # The index as maintained in place by the edits being flushed - players.json
+    # on disk hasn't changed yet, so this is only rebuilt if something else wrote it
+    index = alias_index.load_alias_index(PLAYERS_FILE, players)
+
+    # Players, aliases and MACs of the players edited here go to the stats DB in
+    # one transaction - everyone else's rows are left as the other process wrote them
+    if stats_db.is_enabled():
+        try:
+            stats_db.save_players(players, get_changed_players(players))
+        except Exception:
+            logger.exception("Failed to save players to the stats DB")
+            return False
+    _PLAYERS_SAVED = _player_snapshot(players)
+
     try:
-        # Backup previous file
+        # Keep a copy of the previous file (players.json itself stays in place)
         if os.path.exists(PLAYERS_FILE):
             try:
-                os.replace(PLAYERS_FILE, PLAYERS_BACKUP)
-            except:
-                pass
-        
-        with open(PLAYERS_FILE, "w", encoding="utf-8") as f:
-            json.dump(players, f, indent=2, ensure_ascii=False)
-        logger.info("Saved players.json")
-        
-        # Push to GitHub
+                shutil.copyfile(PLAYERS_FILE, PLAYERS_BACKUP)
+            except OSError as e:
+                logger.warning(f"Could not back up players.json: {e}")
+
+        directory = os.path.dirname(os.path.abspath(PLAYERS_FILE))
+        fd, tmp_path = tempfile.mkstemp(prefix=".players.", suffix=".tmp", dir=directory)
         try:
-            import github_webhook
-            github_webhook.update_players_on_github()
-        except Exception as e:
-            logger.warning(f"GitHub push failed for players.json: {e}")
-    except Exception as e:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(players, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, PLAYERS_FILE)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        _PLAYERS_DIRTY = False
+        logger.info("Saved players.json")
+    except Exception:
         logger.exception("Failed to save players.json")
+        return False
+
+    # Keep the alias index in step with what's now on disk
+    try:
+        alias_index.commit_alias_index(index, PLAYERS_FILE)
+    except Exception as e:
+        logger.warning(f"Could not update alias index: {e}")
+
+    # Push to GitHub (queued in the background)
+    try:
+        import github_webhook
+        github_webhook.update_players_on_github()
+    except Exception as e:
+        logger.warning(f"GitHub push failed for players.json: {e}")
+    return True
+
+# Write anything still pending when the bot shuts down
+atexit.register(flush_players)
 
 def extract_twitch_name(text: str) -> Optional[str]:
     """Extract and validate Twitch name from text or URL"""
@@ -129,6 +227,8 @@ def get_player_twitch(user_id: int) -> Optional[dict]:
 def set_player_twitch(user_id: int, twitch_name: str, display_name: Optional[str] = None):
     """Set a player's Twitch info"""
     players = load_players()
+    index = alias_index.load_alias_index(PLAYERS_FILE, players)
+    old_data = players.get(str(user_id))
     
     players[str(user_id)] = {
         "twitch_name": twitch_name,
@@ -138,13 +238,15 @@ def set_player_twitch(user_id: int, twitch_name: str, display_name: Optional[str
     if display_name:
         players[str(user_id)]["display_name"] = display_name
     
+    alias_index.update_player(index, str(user_id), old_data, players[str(user_id)])
     save_players(players)
 
 def remove_player_twitch(user_id: int) -> bool:
     """Remove a player's Twitch info"""
     players = load_players()
     if str(user_id) in players:
-        del players[str(user_id)]
+        index = alias_index.load_alias_index(PLAYERS_FILE, players)
+        alias_index.update_player(index, str(user_id), players.pop(str(user_id)), None)
         save_players(players)
         return True
     return False
@@ -485,7 +587,7 @@ def setup_twitch_commands(bot: commands.Bot):
         # Check if sync is available
         if not IDENTITY_SYNC_AVAILABLE:
             await interaction.response.send_message(
-                "❌ Identity sync not available. Missing paramiko or pandas.",
+                "❌ Identity sync not available. Missing paramiko or openpyxl.",
                 ephemeral=True
             )
             return
@@ -494,15 +596,32 @@ def setup_twitch_commands(bot: commands.Bot):
 
         try:
             # Import sync module
-            from sync_identity import sync_from_server
+            from sync_identity import sync_from_server, load_players as load_synced_players
 
-            # Run sync
-            result = sync_from_server(STATS_SERVER_HOST, STATS_SERVER_USER)
+            # Sync reads players.json from disk - write pending edits first
+            flush_players()
+
+            # Run sync off the event loop (SFTP calls block)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                None, sync_from_server, STATS_SERVER_HOST, STATS_SERVER_USER
+            )
 
             if result >= 0:
-                # Clear cache to reload updated data
-                global _PLAYERS_CACHE
-                _PLAYERS_CACHE = None
+                if result > 0:
+                    # The bot kept running during the sync, so merge the new
+                    # stats_profile values into the cache instead of dropping
+                    # edits made in the meantime
+                    synced = load_synced_players()
+                    players = load_players()
+                    index = alias_index.load_alias_index(PLAYERS_FILE, players)
+                    for user_id, data in synced.items():
+                        profile = data.get("stats_profile")
+                        if profile and user_id in players and players[user_id].get("stats_profile") != profile:
+                            old_data = dict(players[user_id])
+                            players[user_id]["stats_profile"] = profile
+                            alias_index.update_player(index, user_id, old_data, players[user_id])
+                    save_players(players)
 
                 await interaction.followup.send(
                     f"✅ Identity sync complete. Updated {result} player profile(s).",